@@ -0,0 +1,81 @@
+"""
+Cached authentication backend
+
+AuthenticationMiddleware normally loads the full CustomUser row on every
+request. CachedUserBackend instead keeps a compact snapshot of the user
+(id, email, names, flags and the session auth hash) in the cache and
+rebuilds the user from it as a model instance with every other field
+deferred. The rest of the row is only fetched if a view actually touches
+one of those fields.
+
+Snapshots are dropped whenever a CustomUser is saved or deleted (see
+accounts.signals), which covers profile edits, password changes and logins.
+That only reaches every worker if they all share the cache, so snapshots
+are off (AUTH_USER_CACHE_TIMEOUT = 0) unless CACHE_BACKEND is memcached;
+the short timeout bounds anything that changes users without a save, like
+QuerySet.update().
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import router
+
+
+# Bump when SNAPSHOT_FIELDS changes so old snapshots are ignored
+SNAPSHOT_VERSION = 1
+SNAPSHOT_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name',
+    'is_active', 'is_staff', 'is_superuser', 'is_admin_user',
+)
+
+
+def snapshot_key(user_id):
+    return f'auth:user:v{SNAPSHOT_VERSION}:{user_id}'
+
+
+def make_snapshot(user):
+    snapshot = {field: getattr(user, field) for field in SNAPSHOT_FIELDS}
+    snapshot['session_auth_hash'] = user.get_session_auth_hash()
+    return snapshot
+
+
+def user_from_snapshot(snapshot):
+    """Build a CustomUser with only the snapshot fields loaded"""
+    UserModel = get_user_model()
+    # from_db() expects values in model field order
+    field_names = [
+        field.attname for field in UserModel._meta.concrete_fields
+        if field.attname in SNAPSHOT_FIELDS
+    ]
+    user = UserModel.from_db(
+        router.db_for_read(UserModel),
+        field_names,
+        [snapshot[field] for field in field_names],
+    )
+    user._loaded_from_snapshot = True
+    user._session_auth_hash = snapshot['session_auth_hash']
+    return user
+
+
+def invalidate_user_snapshot(user_id):
+    cache.delete(snapshot_key(user_id))
+
+
+class CachedUserBackend(ModelBackend):
+    """ModelBackend whose get_user() is served from a cached snapshot"""
+
+    def get_user(self, user_id):
+        if settings.AUTH_USER_CACHE_TIMEOUT <= 0:
+            return super().get_user(user_id)
+        key = snapshot_key(user_id)
+        snapshot = cache.get(key)
+        if snapshot is not None:
+            user = user_from_snapshot(snapshot)
+            return user if self.user_can_authenticate(user) else None
+
+        user = super().get_user(user_id)
+        if user is not None:
+            cache.set(key, make_snapshot(user), settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
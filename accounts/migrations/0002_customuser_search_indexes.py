@@ -0,0 +1,41 @@
+# Generated by Django 4.2.9 on 2026-10-19 08:03
+
+from django.db import migrations
+
+
+# Trigram indexes for the admin user directory search. The expressions match
+# what Django emits for icontains/istartswith on PostgreSQL (UPPER(col::text)),
+# so both prefix and substring searches can use them.
+SEARCH_INDEXES = [
+    ('accounts_customuser_email_trgm', 'UPPER("email"::text) gin_trgm_ops'),
+    ('accounts_customuser_username_trgm', 'UPPER("username"::text) gin_trgm_ops'),
+    ('accounts_customuser_phone_trgm', '"phone" gin_trgm_ops'),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, expression in SEARCH_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON accounts_customuser USING gin ({expression})'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -15,9 +15,29 @@ class CustomUser(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    # Set on users rebuilt from the auth cache (see accounts.backends)
+    _loaded_from_snapshot = False
+    _session_auth_hash = None
+
     def __str__(self):
         return self.email
 
+    def get_session_auth_hash(self):
+        # Cached users carry the hash so the password column isn't loaded
+        return self._session_auth_hash or super().get_session_auth_hash()
+
+    def set_password(self, raw_password):
+        self._session_auth_hash = None
+        super().set_password(raw_password)
+
+    def refresh_from_db(self, using=None, fields=None):
+        # A cached user loads the rest of its row in one query, not one per field
+        if fields is not None and self._loaded_from_snapshot:
+            deferred = self.get_deferred_fields()
+            if deferred.issuperset(fields):
+                fields = list(deferred)
+        super().refresh_from_db(using=using, fields=fields)
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}".strip() or self.username
@@ -0,0 +1,27 @@
+"""
+Signal handlers for the accounts app
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.images import generate_variants, variants_missing
+
+from .backends import invalidate_user_snapshot
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def drop_cached_user(sender, instance, **kwargs):
+    """Any change to a user (profile, flags, password, last_login) drops its snapshot"""
+    invalidate_user_snapshot(instance.pk)
+
+
+@receiver(post_save, sender=CustomUser)
+def queue_profile_image_variants(sender, instance, **kwargs):
+    """Resize a newly uploaded profile image in the background"""
+    if kwargs.get('raw') or 'profile_image' in instance.get_deferred_fields():
+        return
+    if variants_missing(instance.profile_image):
+        generate_variants(instance.profile_image)
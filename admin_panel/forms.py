@@ -1,5 +1,6 @@
 from django import forms
 from core.models import Product, Category
+from core.product_actions import BULK_ACTION_CHOICES
 
 
 class ProductForm(forms.ModelForm):
@@ -20,6 +21,84 @@ class ProductForm(forms.ModelForm):
         }
 
 
+class ProductImportForm(forms.Form):
+    """Form for uploading a product catalog file"""
+    FORMAT_CHOICES = [
+        ('', 'Detect from file name'),
+        ('csv', 'CSV'),
+        ('json', 'JSON / JSON Lines'),
+    ]
+
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'admin-input', 'accept': '.csv,.json,.jsonl'}))
+    format = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'admin-select'})
+    )
+    batch_size = forms.IntegerField(
+        min_value=1,
+        max_value=5000,
+        required=False,
+        widget=forms.NumberInput(attrs={'class': 'admin-input', 'placeholder': 'Default'})
+    )
+    dry_run = forms.BooleanField(required=False)
+
+
+class ProductBulkActionForm(forms.Form):
+    """Form for applying one bulk action to many products"""
+    SCOPE_CHOICES = [
+        ('selected', 'Selected products'),
+        ('filtered', 'All products in the current list'),
+        ('category', 'All products in category'),
+    ]
+
+    action = forms.ChoiceField(choices=BULK_ACTION_CHOICES, widget=forms.Select(attrs={'class': 'admin-select'}))
+    scope = forms.ChoiceField(choices=SCOPE_CHOICES, widget=forms.Select(attrs={'class': 'admin-select'}))
+    product_ids = forms.Field(required=False, widget=forms.MultipleHiddenInput)
+    category = forms.ModelChoiceField(
+        queryset=Category.objects.all(),
+        required=False,
+        widget=forms.Select(attrs={'class': 'admin-select'})
+    )
+    percent = forms.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        min_value=-90,
+        max_value=500,
+        required=False,
+        widget=forms.NumberInput(attrs={'class': 'admin-input', 'step': '0.01', 'placeholder': '% e.g. 10 or -5'})
+    )
+    quantity = forms.IntegerField(
+        min_value=1,
+        required=False,
+        widget=forms.NumberInput(attrs={'class': 'admin-input', 'min': '1', 'placeholder': 'Qty'})
+    )
+    # Current list filters, used by the "filtered" scope
+    q = forms.CharField(required=False, widget=forms.HiddenInput)
+    filter_category = forms.SlugField(required=False, widget=forms.HiddenInput)
+
+    def clean_product_ids(self):
+        ids = self.cleaned_data.get('product_ids') or []
+        try:
+            return [int(product_id) for product_id in ids]
+        except (TypeError, ValueError):
+            raise forms.ValidationError('Invalid product selection.')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        action = cleaned_data.get('action')
+        scope = cleaned_data.get('scope')
+        if scope == 'selected' and not cleaned_data.get('product_ids'):
+            raise forms.ValidationError('Select at least one product.')
+        if scope == 'category' and not cleaned_data.get('category'):
+            raise forms.ValidationError('Choose a category.')
+        if action == 'adjust_price' and cleaned_data.get('percent') is None:
+            raise forms.ValidationError('Enter a percentage for the price change.')
+        if action == 'restock' and not cleaned_data.get('quantity'):
+            raise forms.ValidationError('Enter a quantity to restock.')
+        return cleaned_data
+
+
 class CategoryForm(forms.ModelForm):
     """Form for creating/editing categories"""
     class Meta:
@@ -14,6 +14,9 @@ urlpatterns = [
     # Products
     path('products/', views.products_list, name='products'),
     path('products/create/', views.product_create, name='product_create'),
+    path('products/import/', views.product_import, name='product_import'),
+    path('products/bulk/', views.product_bulk_action, name='product_bulk_action'),
+    path('products/report/', views.product_report, name='product_report'),
     path('products/<int:product_id>/edit/', views.product_edit, name='product_edit'),
     path('products/<int:product_id>/delete/', views.product_delete, name='product_delete'),
     
@@ -25,6 +28,7 @@ urlpatterns = [
     
     # Orders
     path('orders/', views.orders_list, name='orders'),
+    path('orders/events/', views.order_events, name='order_events'),
     path('orders/<int:order_id>/', views.order_detail, name='order_detail'),
     
     # Users
@@ -34,6 +38,7 @@ urlpatterns = [
     
     # Messages
     path('messages/', views.messages_list, name='messages'),
+    path('messages/bulk/', views.message_bulk_action, name='message_bulk_action'),
     path('messages/<int:message_id>/', views.message_detail, name='message_detail'),
     
     # Blocked Users (Spam Protection)
@@ -42,4 +47,12 @@ urlpatterns = [
     path('blocked-users/<int:block_id>/edit/', views.blocked_user_edit, name='blocked_user_edit'),
     path('blocked-users/<int:block_id>/delete/', views.blocked_user_delete, name='blocked_user_delete'),
     path('blocked-users/<int:block_id>/toggle/', views.blocked_user_toggle, name='blocked_user_toggle'),
+    
+    # Request Profiles
+    path('profiles/', views.profiles_list, name='profiles'),
+    path('profiles/<str:profile_id>/', views.profile_detail, name='profile_detail'),
+    path('profiles/<str:profile_id>/download/', views.profile_download, name='profile_download'),
+    
+    # Slow Queries
+    path('slow-queries/', views.slow_queries, name='slow_queries'),
 ]
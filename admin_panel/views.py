@@ -1,16 +1,38 @@
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.contrib.auth import login, logout, authenticate
 from django.contrib import messages
-from django.db.models import Sum, Count
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponseForbidden
+from django.views.decorators.http import require_POST
+from django.core.paginator import Paginator
+from django.db.models import Sum, Count, Max, Q, F
 from django.utils import timezone
-from datetime import timedelta
 
 from .decorators import admin_required
-from .forms import ProductForm, CategoryForm, AdminUserPasswordChangeForm
+from .forms import (
+    ProductForm, ProductImportForm, ProductBulkActionForm, CategoryForm, AdminUserPasswordChangeForm
+)
 from core.models import Product, Category, Order, ContactMessage
+from core.db_routing import read_from_replica
 from accounts.models import CustomUser
 
 
+def paginate(request, queryset, per_page):
+    """
+    Return (page, query_string) for the ?page= parameter of the request.
+    query_string holds the other GET parameters so page links keep filters.
+    """
+    page_obj = Paginator(queryset, per_page).get_page(request.GET.get('page'))
+    params = request.GET.copy()
+    params.pop('page', None)
+    return page_obj, params.urlencode()
+
+
 def admin_login(request):
     """Admin login view"""
     if request.user.is_authenticated:
@@ -43,69 +65,136 @@ def admin_logout(request):
     return redirect('admin_panel:login')
 
 
+@read_from_replica
 @admin_required
 def dashboard(request):
     """Admin dashboard with analytics"""
-    # Get date range
-    today = timezone.now()
-    last_30_days = today - timedelta(days=30)
-    
-    # Statistics
-    total_revenue = Order.objects.filter(
-        status='delivered'
-    ).aggregate(Sum('total'))['total__sum'] or 0
-    
-    total_orders = Order.objects.count()
-    pending_orders = Order.objects.filter(status='pending').count()
-    total_products = Product.objects.count()
-    total_users = CustomUser.objects.filter(is_admin_user=False, is_superuser=False).count()
-    
-    # Recent data
-    recent_orders = Order.objects.all()[:10]
-    new_messages = ContactMessage.objects.filter(is_read=False).count()
-    
-    # Orders by status
-    orders_by_status = Order.objects.values('status').annotate(count=Count('id'))
-    
-    context = {
-        'total_revenue': total_revenue,
-        'total_orders': total_orders,
-        'pending_orders': pending_orders,
-        'total_products': total_products,
-        'total_users': total_users,
-        'recent_orders': recent_orders,
-        'new_messages': new_messages,
-        'orders_by_status': orders_by_status,
-    }
+    from core.caching import get_or_compute
+    from core.catalog import CATALOG_VERSION_KEY, ORDERS_VERSION_KEY
+    from core.inbox import get_unread_count
+
+    def order_stats():
+        return {
+            'total_revenue': Order.objects.filter(
+                status='delivered'
+            ).aggregate(Sum('total'))['total__sum'] or 0,
+            'total_orders': Order.objects.count(),
+            'pending_orders': Order.objects.filter(status='pending').count(),
+            'total_products': Product.objects.count(),
+            'total_users': CustomUser.objects.filter(is_admin_user=False, is_superuser=False).count(),
+            'orders_by_status': list(Order.objects.values('status').annotate(count=Count('id'))),
+            'recent_orders': list(Order.objects.all()[:10]),
+        }
+
+    # Statistics, cached until an order or the catalog changes (user count may lag 5 minutes)
+    context = dict(get_or_compute(
+        'dashboard:stats', order_stats, 300, versions=[ORDERS_VERSION_KEY, CATALOG_VERSION_KEY],
+        read_primary=True,
+    ))
+    context['new_messages'] = get_unread_count()
     return render(request, 'admin_panel/dashboard.html', context)
 
 
 # Product Management
+def filter_products(products, category=None, search=None):
+    """Apply the product list filters (category slug, name search)"""
+    if category:
+        products = products.filter(category__slug=category)
+    if search:
+        products = products.filter(name__icontains=search)
+    return products
+
+
+PRODUCT_SORTS = {
+    'newest': ('-created_at',),
+    'name': ('name',),
+    'revenue': (F('revenue').desc(nulls_last=True), 'name'),
+    'units': (F('units_sold').desc(nulls_last=True), 'name'),
+    'orders': (F('order_count').desc(nulls_last=True), 'name'),
+}
+
+
+def report_window(request):
+    """The ?days= reporting window, restricted to the supported values"""
+    from core.reports import DEFAULT_REPORT_WINDOW, REPORT_WINDOWS
+
+    try:
+        days = int(request.GET.get('days', DEFAULT_REPORT_WINDOW))
+    except ValueError:
+        days = DEFAULT_REPORT_WINDOW
+    return days if days in REPORT_WINDOWS else DEFAULT_REPORT_WINDOW
+
+
+@read_from_replica
 @admin_required
 def products_list(request):
-    """List all products"""
-    products = Product.objects.all()
+    """List all products, with sales over the selected window"""
+    from core.reports import REPORT_WINDOWS, annotate_sales
+
     categories = Category.objects.all()
-    
-    # Filter by category
     category = request.GET.get('category')
-    if category:
-        products = products.filter(category__slug=category)
-    
-    # Search
     search = request.GET.get('q')
-    if search:
-        products = products.filter(name__icontains=search)
+    sort = request.GET.get('sort')
+    if sort not in PRODUCT_SORTS:
+        sort = 'newest'
+    days = report_window(request)
+    products = filter_products(Product.objects.select_related('category'), category, search)
+    products = annotate_sales(products, days).order_by(*PRODUCT_SORTS[sort])
     
     context = {
         'products': products,
         'categories': categories,
         'current_category': category,
         'search_query': search,
+        'current_sort': sort,
+        'days': days,
+        'report_windows': REPORT_WINDOWS,
+        'bulk_form': ProductBulkActionForm(initial={'q': search, 'filter_category': category}),
     }
     return render(request, 'admin_panel/products.html', context)
 
 
+@admin_required
+@require_POST
+def product_bulk_action(request):
+    """Apply one set-based action to the selected/filtered products"""
+    from core.product_actions import apply_bulk_action
+
+    form = ProductBulkActionForm(request.POST)
+    list_filters = {
+        key: request.POST[key] for key in ('q', 'filter_category') if request.POST.get(key)
+    }
+    if 'filter_category' in list_filters:
+        list_filters['category'] = list_filters.pop('filter_category')
+    list_url = reverse('admin_panel:products')
+    if list_filters:
+        list_url = f'{list_url}?{urlencode(list_filters)}'
+
+    if not form.is_valid():
+        for errors in form.errors.values():
+            messages.error(request, errors[0])
+        return redirect(list_url)
+
+    data = form.cleaned_data
+    scope = data['scope']
+    if scope == 'selected':
+        products = Product.objects.filter(id__in=data['product_ids'])
+    elif scope == 'category':
+        products = Product.objects.filter(category=data['category'])
+    else:
+        products = filter_products(Product.objects.all(), data['filter_category'], data['q'])
+
+    updated = apply_bulk_action(
+        products,
+        data['action'],
+        percent=data['percent'],
+        quantity=data['quantity'],
+    )
+    action_label = dict(form.fields['action'].choices)[data['action']]
+    messages.success(request, f'{action_label}: {updated} product(s) updated.')
+    return redirect(list_url)
+
+
 @admin_required
 def product_create(request):
     """Create a new product"""
@@ -121,6 +210,35 @@ def product_create(request):
     return render(request, 'admin_panel/product_form.html', {'form': form, 'title': 'Add Product'})
 
 
+@admin_required
+def product_import(request):
+    """Bulk import products from a CSV/JSON upload"""
+    from core.catalog_import import detect_format, import_products
+
+    report = None
+    if request.method == 'POST':
+        form = ProductImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            report = import_products(
+                upload,
+                fmt=form.cleaned_data['format'] or detect_format(upload.name),
+                batch_size=form.cleaned_data['batch_size'],
+                dry_run=form.cleaned_data['dry_run'],
+            )
+            summary = f'{report.created} created, {report.updated} updated'
+            if report.dry_run:
+                messages.info(request, f'Dry run: {summary}. Nothing was saved.')
+            elif report.ok:
+                messages.success(request, f'Import complete: {summary}.')
+            else:
+                messages.warning(request, f'Import finished with {len(report.errors)} error(s): {summary}.')
+    else:
+        form = ProductImportForm()
+
+    return render(request, 'admin_panel/product_import.html', {'form': form, 'report': report})
+
+
 @admin_required
 def product_edit(request, product_id):
     """Edit an existing product"""
@@ -148,11 +266,29 @@ def product_delete(request, product_id):
     return redirect('admin_panel:products')
 
 
+@read_from_replica
+@admin_required
+def product_report(request):
+    """Top sellers: units, revenue, orders and revenue share per product and category"""
+    from core.reports import REPORT_WINDOWS, product_performance
+
+    days = report_window(request)
+    report = product_performance(days)
+    context = {
+        'days': days,
+        'report_windows': REPORT_WINDOWS,
+        'product_rows': report['products'],
+        'category_rows': report['categories'],
+        'total_revenue': report['total_revenue'],
+    }
+    return render(request, 'admin_panel/product_report.html', context)
+
+
 # Category Management
 @admin_required
 def categories_list(request):
     """List all categories"""
-    categories = Category.objects.annotate(product_count=Count('products'))
+    categories = Category.objects.all()
     return render(request, 'admin_panel/categories.html', {'categories': categories})
 
 
@@ -199,6 +335,7 @@ def category_delete(request, category_id):
 
 
 # Order Management
+@read_from_replica
 @admin_required
 def orders_list(request):
     """List all orders"""
@@ -209,10 +346,46 @@ def orders_list(request):
     if status:
         orders = orders.filter(status=status)
     
-    context = {'orders': orders, 'current_status': status}
+    context = {
+        'orders': orders,
+        'current_status': status,
+        'latest_order_id': Order.objects.aggregate(latest=Max('id'))['latest'] or 0,
+    }
     return render(request, 'admin_panel/orders.html', context)
 
 
+async def order_events(request):
+    """
+    New orders and status changes for the order list: a Server-Sent Events
+    stream, or with ?poll=1 a long poll. ?since=<order id> also reports
+    orders placed after it.
+    """
+    from core.events import event_stream_response, long_poll_response, order_event
+
+    def is_admin():
+        user = request.user
+        return user.is_authenticated and (user.is_admin_user or user.is_superuser)
+
+    if not await sync_to_async(is_admin)():
+        return HttpResponseForbidden()
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        since = 0
+
+    async def placed_since():
+        if not since:
+            return []
+        return [
+            order_event(order, 'created')
+            async for order in Order.objects.filter(pk__gt=since).order_by('pk')[:50]
+        ]
+
+    if request.GET.get('poll'):
+        return await long_poll_response(['orders'], placed_since)
+    return event_stream_response(['orders'], placed_since)
+
+
 @admin_required
 def order_detail(request, order_id):
     """View order details"""
@@ -226,6 +399,14 @@ def order_detail(request, order_id):
             order.save()
             messages.success(request, f'Order status updated to {order.get_status_display()}')
             
+            # Cancelled orders don't count towards sales or recommendations
+            if (new_status == 'cancelled') != (old_status == 'cancelled'):
+                from core.recommendations import record_order_copurchases
+                from core.reports import record_order_sales
+                sign = -1 if new_status == 'cancelled' else 1
+                record_order_sales(order, sign=sign)
+                record_order_copurchases.delay(order_id=order.pk, sign=sign)
+            
             # Check cancellation threshold if order was cancelled
             if new_status == 'cancelled' and old_status != 'cancelled':
                 from core.spam_protection import check_cancellation_threshold
@@ -240,48 +421,177 @@ def order_detail(request, order_id):
 
 
 # User Management
+USERS_PER_PAGE = 50
+USER_ORDERS_PER_PAGE = 20
+
+
+def search_users(users, search):
+    """
+    Filter users by email, username or phone. Short terms are matched as a
+    prefix, longer ones as a substring (served by the trigram indexes).
+    """
+    search = search.strip()
+    if len(search) < 3:
+        return users.filter(
+            Q(email__istartswith=search) |
+            Q(username__istartswith=search) |
+            Q(phone__startswith=search)
+        )
+    return users.filter(
+        Q(email__icontains=search) |
+        Q(username__icontains=search) |
+        Q(phone__contains=search)
+    )
+
+
+def order_stats_by_user(user_ids):
+    """Order count, last order date and lifetime spend per user, in one grouped query"""
+    rows = (
+        Order.objects.filter(user_id__in=user_ids)
+        .order_by()
+        .values('user_id')
+        .annotate(
+            order_count=Count('id'),
+            last_order_at=Max('created_at'),
+            lifetime_spend=Sum('total', filter=Q(status='delivered')),
+        )
+    )
+    return {row.pop('user_id'): row for row in rows}
+
+
+@read_from_replica
 @admin_required
 def users_list(request):
-    """List all users"""
-    users = CustomUser.objects.filter(is_admin_user=False, is_superuser=False)
+    """Paginated customer directory with order statistics"""
+    users = CustomUser.objects.filter(is_admin_user=False, is_superuser=False).only(
+        'id', 'email', 'username', 'first_name', 'last_name', 'phone', 'date_joined'
+    ).order_by('-id')
     
     # Search
-    search = request.GET.get('q')
+    search = request.GET.get('q', '').strip()
     if search:
-        users = users.filter(email__icontains=search) | users.filter(username__icontains=search)
+        users = search_users(users, search)
+    
+    page_obj, query_string = paginate(request, users, USERS_PER_PAGE)
+    stats = order_stats_by_user([user.id for user in page_obj])
+    for user in page_obj:
+        user_stats = stats.get(user.id, {})
+        user.order_count = user_stats.get('order_count', 0)
+        user.last_order_at = user_stats.get('last_order_at')
+        user.lifetime_spend = user_stats.get('lifetime_spend') or 0
     
-    context = {'users': users, 'search_query': search}
+    context = {
+        'users': page_obj,
+        'page_obj': page_obj,
+        'query_string': query_string,
+        'search_query': search,
+    }
     return render(request, 'admin_panel/users.html', context)
 
 
 @admin_required
 def user_detail(request, user_id):
-    """View user details"""
+    """View user details with paginated order history"""
     user = get_object_or_404(CustomUser, id=user_id)
-    orders = Order.objects.filter(user=user)
-    context = {'user_obj': user, 'orders': orders}
+    orders = Order.objects.filter(user=user).only(
+        'id', 'order_number', 'total', 'status', 'created_at'
+    )
+    page_obj, query_string = paginate(request, orders, USER_ORDERS_PER_PAGE)
+    stats = order_stats_by_user([user.id]).get(user.id, {})
+    context = {
+        'user_obj': user,
+        'orders': page_obj,
+        'page_obj': page_obj,
+        'query_string': query_string,
+        'order_count': stats.get('order_count', 0),
+        'last_order_at': stats.get('last_order_at'),
+        'lifetime_spend': stats.get('lifetime_spend') or 0,
+    }
     return render(request, 'admin_panel/user_detail.html', context)
 
 
 # Messages
+MESSAGES_PER_PAGE = 50
+MESSAGE_BULK_ACTIONS = {
+    'mark_read': 'Marked as read',
+    'archive': 'Archived',
+}
+
+
+def filter_contact_messages(unread=None, archived=None):
+    """Inbox queryset for the list filters, without the message body"""
+    contact_messages = ContactMessage.objects.only(*ContactMessage.LIST_FIELDS)
+    contact_messages = contact_messages.filter(is_archived=bool(archived))
+    if unread:
+        contact_messages = contact_messages.filter(is_read=False)
+    return contact_messages
+
+
 @admin_required
 def messages_list(request):
-    """List all contact messages"""
-    contact_messages = ContactMessage.objects.all()
+    """Paginated contact inbox"""
+    from core.inbox import get_unread_count
+
     unread = request.GET.get('unread')
-    if unread:
-        contact_messages = contact_messages.filter(is_read=False)
+    archived = request.GET.get('archived')
+    contact_messages = filter_contact_messages(unread, archived)
+    page_obj, query_string = paginate(request, contact_messages, MESSAGES_PER_PAGE)
     
-    return render(request, 'admin_panel/messages.html', {'contact_messages': contact_messages})
+    context = {
+        'contact_messages': page_obj,
+        'page_obj': page_obj,
+        'query_string': query_string,
+        'unread_count': get_unread_count(),
+        'bulk_actions': MESSAGE_BULK_ACTIONS,
+    }
+    return render(request, 'admin_panel/messages.html', context)
+
+
+@admin_required
+@require_POST
+def message_bulk_action(request):
+    """Mark read or archive the selected messages (or the whole filtered inbox) in one UPDATE"""
+    from core import inbox
+
+    action = request.POST.get('action')
+    list_filters = {key: request.POST[key] for key in ('unread', 'archived') if request.POST.get(key)}
+    list_url = reverse('admin_panel:messages')
+    if list_filters:
+        list_url = f'{list_url}?{urlencode(list_filters)}'
+
+    if action not in MESSAGE_BULK_ACTIONS:
+        messages.error(request, 'Choose an action.')
+        return redirect(list_url)
+
+    if request.POST.get('scope') == 'filtered':
+        contact_messages = filter_contact_messages(list_filters.get('unread'), list_filters.get('archived'))
+    else:
+        try:
+            ids = [int(message_id) for message_id in request.POST.getlist('message_ids')]
+        except ValueError:
+            ids = []
+        if not ids:
+            messages.error(request, 'Select at least one message.')
+            return redirect(list_url)
+        contact_messages = ContactMessage.objects.filter(id__in=ids)
+
+    if action == 'mark_read':
+        updated = inbox.mark_read(contact_messages)
+    else:
+        updated = inbox.archive(contact_messages)
+    messages.success(request, f'{MESSAGE_BULK_ACTIONS[action]}: {updated} message(s).')
+    return redirect(list_url)
 
 
 @admin_required
 def message_detail(request, message_id):
     """View message details"""
+    from core.inbox import mark_message_read
+
     message = get_object_or_404(ContactMessage, id=message_id)
     if not message.is_read:
+        mark_message_read(message.id)
         message.is_read = True
-        message.save()
     return render(request, 'admin_panel/message_detail.html', {'message': message})
 
 
@@ -331,7 +641,6 @@ def blocked_users_list(request):
     # Search
     search = request.GET.get('q')
     if search:
-        from django.db.models import Q
         blocked_users = blocked_users.filter(
             Q(phone__icontains=search) |
             Q(ip_address__icontains=search) |
@@ -438,3 +747,86 @@ def blocked_user_toggle(request, block_id):
     messages.success(request, f'Block {status} successfully!')
     return redirect('admin_panel:blocked_users')
 
+
+
+# Request Profiles
+@admin_required
+def profiles_list(request):
+    """Stored request profiles, and a form that makes profile links"""
+    from core.profiling import MODES, list_profiles, profile_link
+    
+    link = None
+    if request.method == 'POST':
+        path = request.POST.get('path', '').strip()
+        mode = request.POST.get('mode')
+        if not path.startswith('/') or path.startswith('//') or mode not in MODES:
+            messages.error(request, 'Enter a path on this site, like /products/.')
+        else:
+            link = profile_link(request.user, path, mode)
+    
+    context = {
+        'profiles': list_profiles(),
+        'profile_link': link,
+        'sample_rate': settings.PROFILE_SAMPLE_RATE,
+        'keep': settings.PROFILE_KEEP,
+        'link_max_age_minutes': settings.PROFILE_LINK_MAX_AGE // 60,
+        'asgi': settings.SERVER_MODE == 'asgi',
+    }
+    return render(request, 'admin_panel/profiles.html', context)
+
+
+@admin_required
+def profile_detail(request, profile_id):
+    """Flame graph and cProfile statistics of one profile"""
+    from core.profiling import flame_graph, load_profile, pstats_text
+    
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise Http404('No such profile.')
+    sort = 'tottime' if request.GET.get('sort') == 'tottime' else 'cumulative'
+    flame = flame_graph(profile_id)
+    context = {
+        'profile': profile,
+        'flame': flame,
+        'flame_height': (max((row['depth'] for row in flame), default=0) + 1) * 18,
+        'stats': pstats_text(profile_id, sort=sort),
+        'sort': sort,
+    }
+    return render(request, 'admin_panel/profile_detail.html', context)
+
+
+@admin_required
+def profile_download(request, profile_id):
+    """The cProfile file, for snakeviz or python -m pstats"""
+    from core.profiling import pstats_path
+    
+    path = pstats_path(profile_id)
+    if path is None:
+        raise Http404('No such profile.')
+    return FileResponse(path.open('rb'), as_attachment=True, filename=f'{profile_id}.prof')
+
+
+# Slow Queries
+SLOW_QUERY_WINDOWS = [1, 7, 30]
+
+
+@admin_required
+def slow_queries(request):
+    """The slowest query shapes over ?days=, grouped by fingerprint, with their plans"""
+    from core.slow_queries import slow_query_report
+
+    try:
+        days = int(request.GET.get('days', 1))
+    except ValueError:
+        days = 1
+    if days not in SLOW_QUERY_WINDOWS:
+        days = 1
+
+    context = {
+        'days': days,
+        'windows': SLOW_QUERY_WINDOWS,
+        'queries': slow_query_report(timezone.now() - timedelta(days=days)),
+        'threshold_ms': settings.SLOW_QUERY_MS,
+        'max_rows': settings.SLOW_QUERY_MAX_ROWS,
+    }
+    return render(request, 'admin_panel/slow_queries.html', context)
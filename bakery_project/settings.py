@@ -19,6 +19,13 @@ DEBUG = os.environ.get('DEBUG', 'True').lower() == 'true'
 
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
 
+# Peers whose X-Forwarded-For is believed (see core/spam_protection.py):
+# nginx on the compose/k8s network. The app port itself must not be
+# reachable from those ranges by anything but the proxy.
+TRUSTED_PROXIES = os.environ.get(
+    'TRUSTED_PROXIES', '127.0.0.1/32,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16'
+).split(',')
+
 # Application definition
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -36,12 +43,18 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.StaticFilesMiddleware',  # WhiteNoise, async-capable
+    'core.metrics.MetricsMiddleware',  # Prometheus request metrics
+    'core.instrumentation.RequestTimingMiddleware',  # Server-Timing for sampled requests
+    'core.slow_queries.SlowQueryMiddleware',  # names the view in the slow query log
+    'core.page_cache.PageCacheMiddleware',  # anonymous full-page cache, before sessions
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',  # admin profile links, sampled profiles
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.db_routing.ReplicaRoutingMiddleware',  # keeps writers on the primary briefly
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'core.middleware.IPTrackingMiddleware',  # IP tracking for spam protection
 ]
@@ -66,6 +79,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'bakery_project.wsgi.application'
+ASGI_APPLICATION = 'bakery_project.asgi.application'
+
+# wsgi: sync gunicorn workers; asgi: uvicorn workers and async views (see gunicorn.conf.py).
+# Live order streams (core/events.py) need asgi; under wsgi pages poll every 15 s.
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
 
 # Database
 DATABASES = {
@@ -79,9 +97,93 @@ DATABASES = {
     }
 }
 
+# Connection handling (see core/db_pool):
+#   persistent  - each worker thread keeps its connection for DB_CONN_MAX_AGE
+#                 seconds, health-checked before the first query of a request
+#   pooled      - threads borrow from a bounded per-process pool (DB_POOL_*)
+#   per_request - connect and disconnect on every request
+# Under ASGI, sync code runs in short-lived executor threads whose persistent
+# connections are never reused, so the pool is the default there.
+DB_CONN_MODE = os.environ.get('DB_CONN_MODE', 'pooled' if SERVER_MODE == 'asgi' else 'persistent')
+DB_POOL = {
+    'MAX_SIZE': int(os.environ.get('DB_POOL_SIZE', '10')),
+    'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', '5')),
+    'CHECK_AFTER': float(os.environ.get('DB_POOL_CHECK_AFTER', '30')),
+    'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', '300')),
+    'MAX_LIFETIME': float(os.environ.get('DB_POOL_MAX_LIFETIME', '1800')),
+}
+if DB_CONN_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '600'))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+elif DB_CONN_MODE == 'pooled':
+    DATABASES['default']['ENGINE'] = 'core.db_pool'
+    DATABASES['default']['POOL'] = DB_POOL
+
+# Read replicas: DB_REPLICA_HOSTS=host[:port],... (see core/db_routing.py).
+# Replicas share the primary's name and credentials; tests mirror them to it
+# (see bakery_project/test_settings.py).
+for number, replica in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    host, _, port = replica.strip().partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.db_routing.ReplicaRouter']
+# Seconds a visitor reads from the primary after a POST, to see their own writes
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '10'))
+
+# Cache
+# The shared cache (L2) holds everything that must agree across workers:
+# version keys, counters, rate limits, page cache, user snapshots.
+# core.caching adds a small per-process L1 in front of it for computed values.
+#   memcached - CACHE_LOCATION=host:port; what docker-compose and k8s run.
+#               Atomic add()/incr(), shared by every container.
+#   file      - development default: one host only, add()/incr() aren't
+#               atomic across processes (rate limits and single-flight locks
+#               can be beaten) and every set() lists the cache directory
+#   locmem    - per process; for tests and runserver
+# `manage.py check --deploy` warns when DEBUG is off without memcached.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'file')
+CACHE_BACKENDS = {
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.environ.get('CACHE_LOCATION', {
+            'file': '/tmp/bakery_cache',
+            'memcached': '127.0.0.1:11211',
+            'locmem': 'bakery',
+        }[CACHE_BACKEND]),
+        'TIMEOUT': 300,
+    },
+}
+if CACHE_BACKEND != 'memcached':
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': 20000}
+CACHE_L1_MAX_ENTRIES = int(os.environ.get('CACHE_L1_MAX_ENTRIES', '256'))
+CACHE_L1_MAX_TTL = int(os.environ.get('CACHE_L1_MAX_TTL', '30'))
+
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
+# Logged-in users are served from a cached snapshot (see accounts/backends.py).
+# ModelBackend stays listed for sessions that were created under it.
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.CachedUserBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+# Snapshots are only safe in a cache every process shares, where a user's
+# change invalidates them everywhere at once: off (0) for the file and
+# locmem backends
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get(
+    'AUTH_USER_CACHE_TIMEOUT', '300' if CACHE_BACKEND == 'memcached' else '0',
+))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -116,3 +218,82 @@ LOGOUT_REDIRECT_URL = '/'
 
 # CSRF Trusted Origins (for forms)
 CSRF_TRUSTED_ORIGINS = os.environ.get('CSRF_TRUSTED_ORIGINS', 'http://localhost:8000,http://127.0.0.1:8000').split(',')
+
+# Catalog import
+CATALOG_IMPORT_BATCH_SIZE = int(os.environ.get('CATALOG_IMPORT_BATCH_SIZE', '500'))
+
+# Bulk product actions post one field per selected product
+DATA_UPLOAD_MAX_NUMBER_FIELDS = int(os.environ.get('DATA_UPLOAD_MAX_NUMBER_FIELDS', '10000'))
+
+# Contact form ingestion (see core/contact_ingest.py)
+CONTACT_RATE_LIMIT = int(os.environ.get('CONTACT_RATE_LIMIT', '5'))
+CONTACT_RATE_WINDOW = int(os.environ.get('CONTACT_RATE_WINDOW', '600'))
+CONTACT_DEDUPE_WINDOW = int(os.environ.get('CONTACT_DEDUPE_WINDOW', '86400'))
+
+# Image derivatives (see core/images.py); 0 generates them inline
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '2'))
+
+# Anonymous full-page cache (see core/page_cache.py)
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', '600'))
+PAGE_CACHE_NGINX_TIMEOUT = int(os.environ.get('PAGE_CACHE_NGINX_TIMEOUT', '30'))
+
+# Background jobs (see core/jobs.py); JOB_INLINE runs them after commit in
+# the web process instead, for development without `run_workers`
+JOB_INLINE = os.environ.get('JOB_INLINE', 'False').lower() == 'true'
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '5'))
+JOB_RETRY_DELAY = float(os.environ.get('JOB_RETRY_DELAY', '10'))
+JOB_RETRY_MAX_DELAY = float(os.environ.get('JOB_RETRY_MAX_DELAY', '3600'))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '1'))
+JOB_LOCK_TIMEOUT = int(os.environ.get('JOB_LOCK_TIMEOUT', '600'))
+JOB_KEEP_DONE_DAYS = int(os.environ.get('JOB_KEEP_DONE_DAYS', '7'))
+
+# Email (customer notifications are sent by job workers)
+EMAIL_BACKEND = os.environ.get(
+    'EMAIL_BACKEND',
+    'django.core.mail.backends.console.EmailBackend' if DEBUG else 'django.core.mail.backends.smtp.EmailBackend',
+)
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'False').lower() == 'true'
+EMAIL_TIMEOUT = int(os.environ.get('EMAIL_TIMEOUT', '10'))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'Bake with Love <noreply@bakewithlove.withaspire.in>')
+
+# Per-request timing (see core/instrumentation.py): the fraction of requests
+# timed, with a Server-Timing header and a log line; 0 turns it off
+REQUEST_TIMING_SAMPLE_RATE = float(os.environ.get('REQUEST_TIMING_SAMPLE_RATE', '0'))
+# Identical queries in one request at which an N+1 is reported
+REQUEST_TIMING_REPEAT_THRESHOLD = int(os.environ.get('REQUEST_TIMING_REPEAT_THRESHOLD', '5'))
+
+# Prometheus metrics at /metrics (see core/metrics.py); scrapes send
+# `Authorization: Bearer <METRICS_TOKEN>`, and without one only DEBUG serves them
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Request profiling (see core/profiling.py)
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '/tmp/bakery-profiles')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', '0.002'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '100'))
+PROFILE_LINK_MAX_AGE = int(os.environ.get('PROFILE_LINK_MAX_AGE', '3600'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core': {'handlers': ['console'], 'level': os.environ.get('LOG_LEVEL', 'INFO')},
+    },
+}
+
+# Slow query log (see core/slow_queries.py): queries slower than this many
+# milliseconds are recorded with their plan; off (0) unless set, e.g. 200
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '0'))
+SLOW_QUERY_BUFFER_SIZE = int(os.environ.get('SLOW_QUERY_BUFFER_SIZE', '1000'))
+SLOW_QUERY_FLUSH_INTERVAL = float(os.environ.get('SLOW_QUERY_FLUSH_INTERVAL', '10'))
+# Seconds before the same query shape is EXPLAINed again
+SLOW_QUERY_EXPLAIN_INTERVAL = int(os.environ.get('SLOW_QUERY_EXPLAIN_INTERVAL', '600'))
+SLOW_QUERY_MAX_ROWS = int(os.environ.get('SLOW_QUERY_MAX_ROWS', '20000'))
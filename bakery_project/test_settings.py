@@ -0,0 +1,33 @@
+"""
+Settings for the test suite: `python manage.py test --settings=bakery_project.test_settings`
+
+SQLite instead of PostgreSQL, with a second alias mirroring the primary so
+replica routing (core/db_routing.py) runs against two connections. The
+cache is per process, image variants are made inline and the slow query log
+is off.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHE_BACKENDS
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    'replica_1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_REPLICAS = ['replica_1']
+
+CACHE_BACKEND = 'locmem'
+CACHES = {'default': {'BACKEND': CACHE_BACKENDS['locmem'], 'LOCATION': 'tests'}}
+AUTH_USER_CACHE_TIMEOUT = 0
+
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+IMAGE_WORKERS = 0
+JOB_INLINE = False
+SLOW_QUERY_MS = 0
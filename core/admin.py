@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product, Cart, CartItem, Order, OrderItem, ContactMessage
+from .models import Category, Product, Cart, CartItem, Order, OrderItem, ContactMessage, Job
 
 
 @admin.register(Category)
@@ -47,11 +47,24 @@ class OrderAdmin(admin.ModelAdmin):
 
 @admin.register(ContactMessage)
 class ContactMessageAdmin(admin.ModelAdmin):
-    list_display = ['name', 'email', 'subject', 'is_read', 'created_at']
-    list_filter = ['is_read', 'created_at']
+    list_display = ['name', 'email', 'subject', 'is_read', 'is_archived', 'created_at']
+    list_filter = ['is_read', 'is_archived', 'created_at']
     search_fields = ['name', 'email', 'subject']
 
 
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'task', 'queue', 'status', 'attempts', 'run_at', 'wait_ms', 'run_ms', 'finished_at']
+    list_filter = ['status', 'queue', 'task']
+    readonly_fields = ['locked_by', 'locked_at', 'wait_ms', 'run_ms', 'created_at', 'finished_at']
+    actions = ['requeue_jobs']
+
+    @admin.action(description='Retry selected dead jobs')
+    def requeue_jobs(self, request, queryset):
+        from .jobs import requeue
+        self.message_user(request, f'Requeued {requeue(queryset)} job(s).')
+
+
 # Spam Protection Models
 from .spam_protection import BlockedUser, OrderRateLimit
 
@@ -5,3 +5,9 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     verbose_name = 'Bakery Core'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+        from .slow_queries import install
+        # Here rather than in a middleware: job workers and commands query too
+        install()
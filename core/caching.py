@@ -0,0 +1,224 @@
+"""
+Two-tier cache for computed values
+
+    from core.caching import get_or_compute
+
+    index = get_or_compute(
+        'facets:index', FacetIndex.build, timeout=3600,
+        versions=[CATALOG_VERSION_KEY],
+    )
+
+- L1 is a small LRU inside each worker process. It stores objects by
+  reference (no pickling), so cached values must be treated as read-only.
+  Entries live at most CACHE_L1_MAX_TTL seconds.
+- L2 is the shared Django cache (settings.CACHES['default']).
+- `versions` appends the current value of version keys (core.catalog) to
+  the key, so bumping a version invalidates both tiers in every process at
+  once. Prefer this to invalidate(), which can only clear this process's L1.
+- Only one thread per process, and one process per L2, recomputes a
+  missing value; the others wait briefly or keep serving the old value.
+  Across processes this relies on an atomic cache.add(), which memcached
+  has and FileBasedCache doesn't: there, two processes may both recompute.
+- Values are refreshed a little early, with a probability that grows as
+  expiry nears and with how long the value takes to compute (XFetch), so
+  popular keys don't all expire and stampede at the same moment.
+- read_primary=True computes from the primary database even in a view
+  that reads from replicas, for values that must include the change that
+  bumped their version (see core.db_routing).
+
+Hits, misses and recomputes are counted per namespace (the part of the key
+before the first colon); see cache_stats(), and bakery_cache_events_total
+in core/metrics.py for all worker processes together.
+"""
+
+import math
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .catalog import get_version
+from .db_routing import primary
+from .metrics import record_cache
+
+LOCK_TIMEOUT = 30           # seconds a recompute may hold the L2 lock
+LOCK_WAIT = 2.0             # seconds to wait for another worker's result
+LOCK_POLL_INTERVAL = 0.05
+EARLY_REFRESH_BETA = 1.0    # >1 refreshes earlier, <1 later
+STALE_GRACE = 60            # L2 keeps values this long past expiry, for serving while refreshing
+
+
+class LocalLRU:
+    """Thread-safe in-process LRU with per-entry expiry"""
+
+    def __init__(self, max_entries, max_ttl):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, timeout=None):
+        ttl = self.max_ttl if timeout is None else min(timeout, self.max_ttl)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_cache = LocalLRU(settings.CACHE_L1_MAX_ENTRIES, settings.CACHE_L1_MAX_TTL)
+
+_stats = defaultdict(lambda: defaultdict(int))
+# Per-key locks, only for keys being recomputed: a thread waiting on
+# another worker's result mustn't hold up recomputes of unrelated keys
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+
+
+def _count(namespace, event):
+    _stats[namespace][event] += 1
+    record_cache(namespace, event)
+
+
+def cache_stats():
+    """{namespace: {'l1_hits', 'l2_hits', 'misses', 'recomputes', ...}} for this process"""
+    return {namespace: dict(events) for namespace, events in _stats.items()}
+
+
+@contextmanager
+def _key_lock(key):
+    with _key_locks_guard:
+        entry = _key_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        # Drop the lock with its last user so the dict stays small
+        with _key_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _key_locks[key]
+
+
+def versioned_key(key, versions=()):
+    """Key with the current value of each version key appended"""
+    if not versions:
+        return key
+    return f"{key}@{'.'.join(str(get_version(version)) for version in versions)}"
+
+
+def _should_refresh(envelope):
+    """XFetch: recompute early with rising probability as expiry approaches"""
+    _, duration, expires_at = envelope
+    if expires_at is None:
+        return False
+    return time.time() - duration * EARLY_REFRESH_BETA * math.log(random.random() or 1e-12) >= expires_at
+
+
+def get_or_compute(key, compute, timeout=300, versions=(), namespace=None, read_primary=False):
+    """
+    Return the cached value for key, computing and storing it if needed.
+    `compute` takes no arguments. timeout=None caches until invalidated.
+    """
+    namespace = namespace or key.split(':', 1)[0]
+    if read_primary:
+        compute = _on_primary(compute)
+    full_key = versioned_key(key, versions)
+
+    envelope = local_cache.get(full_key)
+    if envelope is not None and not _should_refresh(envelope):
+        _count(namespace, 'l1_hits')
+        return envelope[0]
+
+    stale = envelope
+    envelope = cache.get(full_key)
+    if envelope is not None:
+        if not _should_refresh(envelope):
+            _count(namespace, 'l2_hits')
+            local_cache.set(full_key, envelope, timeout)
+            return envelope[0]
+        stale = envelope
+
+    _count(namespace, 'misses' if stale is None else 'early_refreshes')
+    with _key_lock(full_key):
+        # Another thread may have finished while we waited for the lock
+        envelope = local_cache.get(full_key)
+        if envelope is not None and (stale is None or envelope[2] != stale[2]):
+            return envelope[0]
+        return _compute_single_flight(full_key, compute, timeout, namespace, stale)
+
+
+def _on_primary(compute):
+    def compute_on_primary():
+        with primary():
+            return compute()
+    return compute_on_primary
+
+
+def _compute_single_flight(full_key, compute, timeout, namespace, stale):
+    lock_key = f'lock:{full_key}'
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        # Someone else is recomputing: serve the old value if there is one
+        if stale is not None:
+            _count(namespace, 'stale_served')
+            return stale[0]
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            envelope = cache.get(full_key)
+            if envelope is not None:
+                _count(namespace, 'lock_waits')
+                local_cache.set(full_key, envelope, timeout)
+                return envelope[0]
+        # Took too long; compute it ourselves rather than fail the request
+        lock_key = None
+
+    try:
+        started = time.time()
+        value = compute()
+        duration = time.time() - started
+        expires_at = None if timeout is None else time.time() + timeout
+        envelope = (value, duration, expires_at)
+        l2_timeout = None if timeout is None else timeout + min(timeout, STALE_GRACE)
+        cache.set(full_key, envelope, l2_timeout)
+        local_cache.set(full_key, envelope, timeout)
+        _count(namespace, 'recomputes')
+        return value
+    finally:
+        if lock_key:
+            cache.delete(lock_key)
+
+
+def invalidate(key, versions=()):
+    """
+    Drop a cached value from L2 and this process's L1. Other processes may
+    keep their L1 copy for up to CACHE_L1_MAX_TTL; use version keys when
+    that matters.
+    """
+    full_key = versioned_key(key, versions)
+    local_cache.delete(full_key)
+    cache.delete(full_key)
@@ -0,0 +1,111 @@
+"""
+Cache versioning
+
+Everything we cache about the catalog (listings, search results, reports)
+is keyed by the current catalog version. Bumping the version invalidates
+all of those entries at once, without having to know which keys exist.
+Other cached data (e.g. sales reports) uses its own named version, and
+each shopping cart has a version so pages showing the cart badge can be
+revalidated cheaply.
+"""
+
+import random
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+CATALOG_VERSION_KEY = 'catalog:version'
+SALES_VERSION_KEY = 'sales:version'
+CATALOG_MODIFIED_KEY = 'catalog:modified'
+RECOMMENDATIONS_VERSION_KEY = 'recommendations:version'
+ORDERS_VERSION_KEY = 'orders:version'
+BLOCKS_VERSION_KEY = 'blocks:version'
+
+
+def get_version(key):
+    """Return the current value of a version key, initialising it if needed"""
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a cache flush never reuses an old version
+        version = int(time.time())
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    """
+    Invalidate every cache entry keyed by this version immediately. The new
+    version is random rather than incr()-ed: two bumps racing on a backend
+    whose incr isn't atomic (FileBasedCache) would both land on the same
+    number, and an entry computed between them would look current.
+    """
+    version = random.getrandbits(48)
+    cache.set_many({key: version, _bumped_key(key): time.time()}, None)
+    return version
+
+
+def _bumped_key(key):
+    return f'{key}:bumped'
+
+
+def bumped_since(keys, since):
+    """Whether any of the version keys was bumped after `since` (a time.time())"""
+    bumped = cache.get_many([_bumped_key(key) for key in keys])
+    return any(at > since for at in bumped.values())
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    cache.set(CATALOG_MODIFIED_KEY, time.time(), None)
+    return bump_version(CATALOG_VERSION_KEY)
+
+
+def get_catalog_modified():
+    """Timestamp of the last catalog change seen by this cache, or None"""
+    return cache.get(CATALOG_MODIFIED_KEY)
+
+
+def invalidate_catalog():
+    """Bump the catalog version once the current transaction commits"""
+    transaction.on_commit(bump_catalog_version)
+
+
+def invalidate_sales():
+    """Bump the sales version once the current transaction commits"""
+    invalidate_version(SALES_VERSION_KEY)
+
+
+def invalidate_version(key):
+    """Bump any named version once the current transaction commits"""
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def cart_version_key(user_id=None, session_key=None):
+    """Version key of the cart owned by a user or an anonymous session"""
+    if user_id:
+        return f'cart:version:user:{user_id}'
+    return f'cart:version:session:{session_key}'
+
+
+def get_cart_version(request):
+    """Version of the current visitor's cart; 0 for a visitor with no session"""
+    if request.user.is_authenticated:
+        return get_version(cart_version_key(user_id=request.user.pk))
+    session_key = request.session.session_key
+    if not session_key:
+        return 0
+    return get_version(cart_version_key(session_key=session_key))
+
+
+def invalidate_cart(user_id=None, session_key=None):
+    """Bump a cart's version once the current transaction commits"""
+    if not (user_id or session_key):
+        return
+    key = cart_version_key(user_id, session_key)
+    transaction.on_commit(lambda: bump_version(key))
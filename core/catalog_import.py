@@ -0,0 +1,286 @@
+"""
+Bulk Product Catalog Import
+
+Imports products from CSV or JSON (array or JSON Lines) files:
+- Rows are parsed and validated one at a time, so large files stream
+- Categories are resolved by slug from a single prefetch
+- Products are upserted by slug with bulk_create/bulk_update in batches
+- The whole import runs in one transaction and invalidates the catalog once
+- Images are names of files already in media storage; rows naming a
+  missing file or a path outside it are rejected
+- bulk_create/bulk_update skip post_save, so image variants for new or
+  changed images are made here, once the import commits
+"""
+
+import csv
+import io
+import json
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.core.files.utils import validate_file_name
+from django.db import transaction
+from django.utils import timezone
+
+from .images import generate_variants
+from .models import Category, Product
+from .signals import catalog_bulk_changed
+
+
+IMPORT_FORMATS = ('csv', 'json')
+
+# Fields that must be present when a row creates a new product
+REQUIRED_FOR_CREATE = ('name', 'category', 'price', 'description', 'image')
+
+
+class ImportBooleanField(forms.NullBooleanField):
+    """Boolean column accepting the usual spreadsheet spellings"""
+    widget = forms.TextInput
+    TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+    FALSE_VALUES = {'0', 'false', 'no', 'n'}
+
+    def to_python(self, value):
+        if value in (None, '') or isinstance(value, bool):
+            return value if value != '' else None
+        value = str(value).strip().lower()
+        if value in self.TRUE_VALUES:
+            return True
+        if value in self.FALSE_VALUES:
+            return False
+        raise forms.ValidationError('Enter yes or no.')
+
+
+class ProductImportRowForm(forms.Form):
+    """Validates a single import row. Only `slug` is always required."""
+    slug = forms.SlugField(max_length=50)
+    name = forms.CharField(max_length=200, required=False)
+    category = forms.SlugField(required=False)
+    price = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    description = forms.CharField(required=False)
+    image = forms.CharField(max_length=100, required=False)
+    weight = forms.CharField(max_length=50, required=False)
+    rating = forms.DecimalField(max_digits=2, decimal_places=1, min_value=0, max_value=5, required=False)
+    is_featured = ImportBooleanField(required=False)
+    is_special = ImportBooleanField(required=False)
+    is_available = ImportBooleanField(required=False)
+    stock = forms.IntegerField(min_value=0, required=False)
+
+    def clean_image(self):
+        name = self.cleaned_data['image']
+        if not name:
+            return name
+        try:
+            validate_file_name(name, allow_relative_path=True)
+        except SuspiciousFileOperation:
+            raise forms.ValidationError('Use a path inside the media folder, e.g. products/cake.jpg.')
+        if not default_storage.exists(name):
+            raise forms.ValidationError(f"No uploaded file '{name}'.")
+        return name
+
+
+class ImportReport:
+    """Outcome of an import run"""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []  # list of (row_number, message)
+        self.dry_run = False
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    @property
+    def processed(self):
+        return self.created + self.updated
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+def detect_format(filename):
+    """Guess the import format from a file name"""
+    name = (filename or '').lower()
+    if name.endswith('.json') or name.endswith('.jsonl'):
+        return 'json'
+    return 'csv'
+
+
+def iter_rows(stream, fmt):
+    """
+    Yield (row_number, row_dict) pairs from a binary or text stream.
+    CSV and JSON Lines are read lazily; a JSON array is parsed in one go.
+    """
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        # Row 1 is the header line
+        for row_number, row in enumerate(reader, start=2):
+            yield row_number, row
+        return
+
+    first = stream.read(1)
+    while first and first.isspace():
+        first = stream.read(1)
+
+    if first == '[':
+        rows = json.loads(first + stream.read())
+        for row_number, row in enumerate(rows, start=1):
+            yield row_number, row
+        return
+
+    for row_number, line in enumerate(_prepend(first, stream), start=1):
+        line = line.strip()
+        if line:
+            yield row_number, json.loads(line)
+
+
+def _prepend(first, stream):
+    """Iterate over stream lines, re-attaching a character already consumed"""
+    lines = iter(stream)
+    yield first + next(lines, '')
+    yield from lines
+
+
+def clean_row(row):
+    """
+    Validate a raw row. Returns (values, errors), where values only holds
+    the fields that were actually supplied so updates leave the rest alone.
+    """
+    if not isinstance(row, dict):
+        return None, ['Row must be an object']
+
+    supplied = {
+        key.strip(): value for key, value in row.items()
+        if key and value is not None and value != ''
+    }
+    form = ProductImportRowForm(data=supplied)
+    if not form.is_valid():
+        errors = [
+            f"{field}: {' '.join(messages)}" if field != '__all__' else ' '.join(messages)
+            for field, messages in form.errors.items()
+        ]
+        return None, errors
+
+    values = {
+        field: form.cleaned_data[field]
+        for field in form.fields if field in supplied
+    }
+    return values, []
+
+
+def import_products(stream, fmt='csv', batch_size=None, dry_run=False):
+    """
+    Import products from a stream and return an ImportReport.
+    Invalid rows are reported and skipped; valid rows are upserted by slug.
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+    batch_size = batch_size or settings.CATALOG_IMPORT_BATCH_SIZE
+    report = ImportReport()
+    report.dry_run = dry_run
+    categories = Category.objects.in_bulk(field_name='slug')
+    seen_slugs = set()
+    changed_ids = []
+    changed_fields = set()
+    new_images = []
+    batch = []
+
+    with transaction.atomic():
+        try:
+            for row_number, row in iter_rows(stream, fmt):
+                values, errors = clean_row(row)
+                if errors:
+                    for message in errors:
+                        report.add_error(row_number, message)
+                    continue
+
+                slug = values['slug']
+                if slug in seen_slugs:
+                    report.add_error(row_number, f"Duplicate slug '{slug}' in file")
+                    continue
+                seen_slugs.add(slug)
+
+                if 'category' in values:
+                    category = categories.get(values['category'])
+                    if category is None:
+                        report.add_error(row_number, f"Unknown category '{values['category']}'")
+                        continue
+                    values['category'] = category
+
+                batch.append((row_number, values))
+                if len(batch) >= batch_size:
+                    _flush_batch(batch, report, changed_ids, changed_fields, new_images)
+                    batch = []
+        except (ValueError, csv.Error) as exc:
+            # Malformed CSV/JSON or undecodable bytes: nothing after this point can be read
+            report.add_error(None, f"Could not parse file: {exc}")
+
+        if batch:
+            _flush_batch(batch, report, changed_ids, changed_fields, new_images)
+
+        if dry_run:
+            transaction.set_rollback(True)
+        elif report.processed:
+            catalog_bulk_changed.send(
+                sender=Product,
+                product_ids=changed_ids,
+                fields=sorted(changed_fields),
+            )
+            # Outside the import's transaction: a bad image can't undo the import
+            transaction.on_commit(lambda: _generate_variants(new_images))
+
+    return report
+
+
+def _generate_variants(images):
+    for image in images:
+        generate_variants(image)
+
+
+def _flush_batch(batch, report, changed_ids, changed_fields, new_images):
+    """Upsert one batch of validated rows"""
+    existing = Product.objects.in_bulk([values['slug'] for _, values in batch], field_name='slug')
+    to_create = []
+    to_update = []
+    update_fields = {'updated_at'}
+    now = timezone.now()
+
+    for row_number, values in batch:
+        product = existing.get(values['slug'])
+        if product is None:
+            missing = [field for field in REQUIRED_FOR_CREATE if field not in values]
+            if missing:
+                report.add_error(row_number, f"New product is missing: {', '.join(missing)}")
+                continue
+            product = Product(**{
+                field: value for field, value in values.items() if value is not None
+            })
+            to_create.append(product)
+            new_images.append(product.image)
+        else:
+            old_image = product.image.name
+            for field, value in values.items():
+                if value is not None and field != 'slug':
+                    setattr(product, field, value)
+                    update_fields.add(field)
+            if product.image.name != old_image:
+                new_images.append(product.image)
+            product.updated_at = now
+            to_update.append(product)
+
+    if to_create:
+        Product.objects.bulk_create(to_create, batch_size=len(to_create))
+        report.created += len(to_create)
+        changed_fields.update(field.name for field in Product._meta.concrete_fields)
+    if to_update:
+        Product.objects.bulk_update(to_update, sorted(update_fields), batch_size=len(to_update))
+        report.updated += len(to_update)
+        changed_fields.update(update_fields)
+    changed_ids.extend(product.pk for product in to_create + to_update)
@@ -0,0 +1,53 @@
+"""
+Denormalized per-category product counters
+
+Category.product_count and Category.available_product_count are adjusted
+with F() updates as products are saved or deleted, and recomputed in one
+grouped query after bulk changes or by `manage.py refresh_category_counts`.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+
+from .models import Category, Product
+
+
+def adjust_category_counts(category_id, total=0, available=0):
+    """Add deltas to one category's counters"""
+    if not category_id or not (total or available):
+        return
+    Category.objects.filter(pk=category_id).update(
+        product_count=Greatest(F('product_count') + total, 0),
+        available_product_count=Greatest(F('available_product_count') + available, 0),
+    )
+
+
+@transaction.atomic
+def refresh_category_counts(category_ids=None):
+    """
+    Recompute counters from the product table. Returns the number of
+    categories whose counters were wrong.
+    """
+    categories = Category.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(pk__in=category_ids)
+
+    counts = {
+        row['category_id']: row
+        for row in Product.objects.order_by().values('category_id').annotate(
+            total=Count('id'),
+            available=Count('id', filter=Q(is_available=True)),
+        )
+    }
+
+    stale = []
+    for category in categories.select_for_update().only('id', *Category.COUNTER_FIELDS):
+        row = counts.get(category.id, {'total': 0, 'available': 0})
+        if (category.product_count, category.available_product_count) != (row['total'], row['available']):
+            category.product_count = row['total']
+            category.available_product_count = row['available']
+            stale.append(category)
+
+    Category.objects.bulk_update(stale, Category.COUNTER_FIELDS)
+    return len(stale)
@@ -0,0 +1,55 @@
+"""
+System checks
+
+    manage.py check --deploy
+"""
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Rate limits, locks and version keys need atomic add()/incr() shared by every process"""
+    if settings.DEBUG or settings.CACHE_BACKEND == 'memcached':
+        return []
+    return [Warning(
+        f"CACHE_BACKEND is '{settings.CACHE_BACKEND}'.",
+        hint=(
+            "Use CACHE_BACKEND=memcached in production: the file and locmem backends "
+            "aren't shared by every container and their add()/incr() aren't atomic, so rate "
+            "limits, single-flight locks and counters can be beaten (see core/caching.py)."
+        ),
+        id='core.W001',
+    )]
+
+
+@register(deploy=True)
+def check_server_mode(app_configs, **kwargs):
+    """Live order updates only stream under ASGI workers"""
+    if settings.DEBUG or settings.SERVER_MODE == 'asgi':
+        return []
+    return [Warning(
+        f"SERVER_MODE is '{settings.SERVER_MODE}'.",
+        hint=(
+            "Use SERVER_MODE=asgi in production: sync workers can't hold live order streams "
+            "open, so every open order page reconnects every 15 seconds, a full request each "
+            "(see core/events.py)."
+        ),
+        id='core.W002',
+    )]
+
+
+@register(deploy=True)
+def check_metrics_token(app_configs, **kwargs):
+    """/metrics refuses every scrape in production until a token is set"""
+    if settings.DEBUG or not settings.METRICS_ENABLED or settings.METRICS_TOKEN:
+        return []
+    return [Warning(
+        'METRICS_TOKEN is not set.',
+        hint=(
+            "/metrics answers 403 until METRICS_TOKEN is set; give Prometheus the same "
+            "token as a bearer token (see core/metrics.py)."
+        ),
+        id='core.W003',
+    )]
@@ -0,0 +1,125 @@
+"""
+Conditional GET for storefront pages
+
+Catalog pages only change when the catalog (or, for product pages, sales
+and the co-purchase recommendations) changes, or when something personal on the page
+does: the logged-in user or the cart badge. The ETag is built from those
+versions alone, so a matching If-None-Match is answered with 304 before
+the view runs a single query.
+
+Anonymous visitors without a session (so without a cart) also get a
+Last-Modified date on pages only the catalog can alter (not product pages). Pages with
+pending flash messages are never answered with 304.
+
+A page sent with a validator is rendered from the primary database, even
+in a view that reads from replicas, while the versions in its ETag were
+bumped less than REPLICA_PIN_SECONDS ago: the ETag already names the new
+version, and a body from a replica that hasn't caught up would be kept
+under it until the next change. Outside that window the replicas hold the
+change and serve the page (see core.db_routing).
+
+Async views are supported: the validators (which touch the session and the
+cache) are computed in one sync_to_async call.
+"""
+
+import hashlib
+from contextlib import nullcontext
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .catalog import (
+    CATALOG_VERSION_KEY, RECOMMENDATIONS_VERSION_KEY, SALES_VERSION_KEY, get_cart_version,
+    get_catalog_modified, get_version,
+)
+from .db_routing import primary, replica_may_lag
+
+
+def _has_pending_messages(request):
+    # Default FallbackStorage: cookie first, then session
+    return bool(request.COOKIES.get('messages')) or '_messages' in request.session
+
+
+def _is_personalized(request):
+    # A session may hold a cart; without one only the catalog can change
+    return request.user.is_authenticated or request.session.session_key is not None
+
+
+def _page_etag(request, versions):
+    if _has_pending_messages(request):
+        return None
+    parts = [get_version(key) for key in versions]
+    parts.append(request.user.pk or request.session.session_key or '-')
+    parts.append(get_cart_version(request))
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def _page_last_modified(request, versions):
+    if tuple(versions) != (CATALOG_VERSION_KEY,):
+        return None
+    if _has_pending_messages(request) or _is_personalized(request):
+        return None
+    modified = get_catalog_modified()
+    if modified is None:
+        return None
+    return int(modified)
+
+
+def _validators(request, versions):
+    """
+    (quoted ETag or None, Last-Modified timestamp or None, whether a body
+    rendered now must come from the primary to match them)
+    """
+    etag = _page_etag(request, versions)
+    last_modified = _page_last_modified(request, versions)
+    on_primary = bool(etag or last_modified) and replica_may_lag(versions)
+    return (quote_etag(etag) if etag else None), last_modified, on_primary
+
+
+def _finish(request, response, etag, last_modified):
+    if request.method in ('GET', 'HEAD'):
+        if last_modified and not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(last_modified)
+        if etag:
+            response.headers.setdefault('ETag', etag)
+        # Private: pages embed the visitor's CSRF token and cart badge
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def catalog_page(view=None, versions=(CATALOG_VERSION_KEY,)):
+    """
+    Decorate a catalog page view with ETag/Last-Modified handling. The
+    browser keeps its copy but must revalidate on every use.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                etag, last_modified, on_primary = await sync_to_async(_validators)(request, versions)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    with primary() if on_primary else nullcontext():
+                        response = await view_func(request, *args, **kwargs)
+                return _finish(request, response, etag, last_modified)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            etag, last_modified, on_primary = _validators(request, versions)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                with primary() if on_primary else nullcontext():
+                    response = view_func(request, *args, **kwargs)
+            return _finish(request, response, etag, last_modified)
+        return wrapper
+
+    if view is not None:
+        return decorator(view)
+    return decorator
+
+
+# Related products come from co-purchase counts, refreshed by a background job
+product_page = catalog_page(versions=(CATALOG_VERSION_KEY, SALES_VERSION_KEY, RECOMMENDATIONS_VERSION_KEY))
@@ -0,0 +1,53 @@
+"""
+Contact Form Ingestion
+
+Protects the ContactMessage table from floods:
+- Per-IP rate limit (CONTACT_RATE_LIMIT messages per CONTACT_RATE_WINDOW
+  seconds)
+- Identical (email, subject, message) submissions within
+  CONTACT_DEDUPE_WINDOW seconds are dropped
+
+Accepted messages are saved before the response goes out, so a worker
+that is killed or recycled can't lose one the visitor was thanked for.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ContactMessage
+from .spam_protection import within_rate_limit
+
+
+ACCEPTED = 'accepted'
+DUPLICATE = 'duplicate'
+RATE_LIMITED = 'rate_limited'
+
+
+def message_fingerprint(email, subject, message):
+    """Hash of the normalized message content"""
+    normalized = '\x1f'.join(
+        ' '.join(part.split()).lower() for part in (email, subject, message)
+    )
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def submit_contact_message(ip_address, name, email, subject, message):
+    """
+    Run a validated contact submission through throttling and dedupe.
+    Returns ACCEPTED, DUPLICATE or RATE_LIMITED.
+    """
+    if not within_rate_limit(
+        f'contact:{ip_address or "unknown"}',
+        limit=settings.CONTACT_RATE_LIMIT,
+        window=settings.CONTACT_RATE_WINDOW,
+    ):
+        return RATE_LIMITED
+
+    fingerprint = message_fingerprint(email, subject, message)
+    if not cache.add(f'contact:seen:{fingerprint}', 1, settings.CONTACT_DEDUPE_WINDOW):
+        return DUPLICATE
+
+    ContactMessage.objects.create(name=name, email=email, subject=subject, message=message)
+    return ACCEPTED
@@ -1,21 +1,35 @@
-from .models import Cart
+from django.db.models import Sum
 
+from .caching import get_or_compute
+from .catalog import cart_version_key
+from .models import CartItem
 
-def cart_count(request):
-    """Context processor to add cart count to all templates"""
-    count = 0
+
+CART_COUNT_TIMEOUT = 60 * 60
+
+
+def get_cart_count(request):
+    """Items in the visitor's cart, cached until the cart changes"""
     if request.user.is_authenticated:
-        try:
-            cart = Cart.objects.get(user=request.user)
-            count = cart.item_count
-        except Cart.DoesNotExist:
-            pass
+        items = CartItem.objects.filter(cart__user=request.user)
+        owner = f'user:{request.user.pk}'
+        version_key = cart_version_key(user_id=request.user.pk)
     else:
         session_key = request.session.session_key
-        if session_key:
-            try:
-                cart = Cart.objects.get(session_key=session_key)
-                count = cart.item_count
-            except Cart.DoesNotExist:
-                pass
-    return {'cart_count': count}
+        if not session_key:
+            return 0
+        items = CartItem.objects.filter(cart__session_key=session_key)
+        owner = f'session:{session_key}'
+        version_key = cart_version_key(session_key=session_key)
+    return get_or_compute(
+        f'cart:count:{owner}',
+        lambda: items.aggregate(count=Sum('quantity'))['count'] or 0,
+        CART_COUNT_TIMEOUT,
+        versions=[version_key],
+        read_primary=True,
+    )
+
+
+def cart_count(request):
+    """Context processor to add cart count to all templates"""
+    return {'cart_count': get_cart_count(request)}
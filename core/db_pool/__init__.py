@@ -0,0 +1,202 @@
+"""
+In-process PostgreSQL connection pool
+
+Used as a database ENGINE (settings DB_CONN_MODE=pooled):
+
+    DATABASES['default']['ENGINE'] = 'core.db_pool'
+    DATABASES['default']['POOL'] = {'MAX_SIZE': 10, 'TIMEOUT': 5, ...}
+
+Django still opens a connection on the first query of a request and closes
+it when the request ends (CONN_MAX_AGE=0), but "open" borrows an idle
+connection from the process's pool and "close" hands it back, so threads
+share a bounded set of connections instead of each holding its own.
+
+- At most MAX_SIZE connections per process and alias. A thread that finds
+  them all checked out waits up to TIMEOUT seconds, then gets an
+  OperationalError.
+- A returned connection is rolled back and runs RESET ALL, so settings a
+  borrower changed with SET (statement_timeout, search_path, role...)
+  don't leak to the next one. Django sets the time zone again on checkout.
+- A connection idle for more than CHECK_AFTER seconds runs SELECT 1 before
+  it is handed out; broken ones are replaced.
+- Idle connections are closed after MAX_IDLE seconds, and every connection
+  after MAX_LIFETIME, so the pool shrinks when traffic drops and server
+  side state doesn't build up forever.
+
+pool_stats() reports size, checked out and idle connections, waits and
+timeouts per alias.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of DB-API connections; `create` opens a new one"""
+
+    def __init__(self, max_size=10, timeout=5.0, check_after=30.0, max_idle=300.0, max_lifetime=1800.0):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.idle = deque()       # (connection, created_at, released_at), most recent on the right
+        self.created_at = {}      # checked-out connection -> created_at
+        self.size = 0             # idle + checked out + being created
+        self.condition = threading.Condition()
+        self.counters = {'created': 0, 'closed': 0, 'waits': 0, 'timeouts': 0, 'wait_seconds': 0.0}
+
+    def acquire(self, create):
+        started = time.monotonic()
+        with self.condition:
+            if not self.idle and self.size >= self.max_size:
+                self.counters['waits'] += 1
+                while not self.idle and self.size >= self.max_size:
+                    remaining = started + self.timeout - time.monotonic()
+                    if remaining <= 0:
+                        self.counters['timeouts'] += 1
+                        raise PoolTimeout(
+                            f'No database connection free after {self.timeout}s '
+                            f'({self.max_size} checked out)'
+                        )
+                    self.condition.wait(remaining)
+                self.counters['wait_seconds'] += time.monotonic() - started
+            if self.idle:
+                # Newest first: keeps a warm core and lets the rest idle out
+                connection, created_at, released_at = self.idle.pop()
+            else:
+                connection = None
+                self.size += 1
+
+        if connection is not None:
+            if self._is_reusable(connection, created_at, released_at):
+                with self.condition:
+                    self.created_at[connection] = created_at
+                return connection
+            self._close(connection)
+
+        # The slot is ours: either a fresh one or the discarded connection's
+        try:
+            connection = create()
+        except BaseException:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.counters['created'] += 1
+            self.created_at[connection] = time.monotonic()
+        return connection
+
+    def release(self, connection):
+        now = time.monotonic()
+        with self.condition:
+            created_at = self.created_at.pop(connection, None)
+        reusable = created_at is not None and now - created_at < self.max_lifetime
+        if reusable:
+            try:
+                # Ends whatever transaction the borrower left open
+                connection.rollback()
+                self._reset(connection)
+            except Exception:
+                reusable = False
+
+        expired = []
+        with self.condition:
+            if reusable:
+                self.idle.append((connection, created_at, now))
+            else:
+                self.size -= 1
+                expired.append(connection)
+            while self.idle and now - self.idle[0][2] > self.max_idle:
+                expired.append(self.idle.popleft()[0])
+                self.size -= 1
+            self.condition.notify()
+        for connection in expired:
+            self._close(connection)
+
+    def close_all(self):
+        """Close idle connections; checked-out ones close when released"""
+        with self.condition:
+            idle, self.idle = self.idle, deque()
+            self.size -= len(idle)
+            self.condition.notify_all()
+        for connection, _, _ in idle:
+            self._close(connection)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'size': self.size,
+                'max_size': self.max_size,
+                'checked_out': self.size - len(self.idle),
+                'idle': len(self.idle),
+                **self.counters,
+            }
+
+    def _is_reusable(self, connection, created_at, released_at):
+        now = time.monotonic()
+        if getattr(connection, 'closed', False) or now - created_at >= self.max_lifetime:
+            return False
+        if now - released_at < self.check_after:
+            return True
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute('SELECT 1')
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _reset(self, connection):
+        cursor = connection.cursor()
+        try:
+            cursor.execute('RESET ALL')
+        finally:
+            cursor.close()
+        # Outside autocommit the RESET opened a transaction; a no-op otherwise
+        connection.commit()
+
+    def _close(self, connection):
+        with self.condition:
+            self.counters['closed'] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, options=None):
+    """The pool for a database alias, created from its POOL options on first use"""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(
+                **{name.lower(): value for name, value in (options or {}).items()}
+            )
+        return pool
+
+
+def pool_stats():
+    """{alias: {'size', 'checked_out', 'idle', 'waits', 'timeouts', ...}} for this process"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+def close_pool(alias):
+    with _pools_lock:
+        pool = _pools.pop(alias, None)
+    if pool is not None:
+        pool.close_all()
@@ -0,0 +1,137 @@
+"""
+Read-replica routing
+
+With DB_REPLICA_HOSTS set, settings add one `replica_N` database per host
+and ReplicaRouter spreads reads across them. Reads only go to a replica
+when the view opted in with @read_from_replica (catalog pages, admin
+dashboards and reports); everything else, including cart, checkout and
+spam checks, reads from the primary. All writes go to the primary.
+
+Replicas lag a little behind the primary, so reads also stay on the
+primary:
+- for REPLICA_PIN_SECONDS after a visitor's last POST (a short-lived
+  cookie), so they see their own changes;
+- inside transactions, and for sessions and user accounts;
+- while rebuilding values cached under version keys (`primary()`), so a
+  lagging replica can't be frozen into them;
+- for pages stored in the shared page cache or sent with an ETag, but only
+  within REPLICA_PIN_SECONDS of a bump of the versions they depend on
+  (`replica_may_lag()`, see core.conditional). Otherwise the replicas
+  already hold the change and catalog pages render from them.
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .catalog import CATALOG_VERSION_KEY, bumped_since
+
+
+PIN_COOKIE = 'db_pin'
+# Apps whose rows are read right after they are written, often by another request
+PRIMARY_ONLY_APPS = {'sessions', 'accounts', 'auth', 'contenttypes'}
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_may_lag(version_keys):
+    """Whether replicas may still miss the change behind the last bump of one of version_keys"""
+    if not settings.DATABASE_REPLICAS:
+        return False
+    return bumped_since(version_keys, time.time() - settings.REPLICA_PIN_SECONDS)
+
+
+def _replica_allowed(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.COOKIES.get(PIN_COOKIE)
+        and not (getattr(request, 'page_cache', False) and replica_may_lag([CATALOG_VERSION_KEY]))
+    )
+
+
+def read_from_replica(view_func):
+    """Let a read-only view (sync or async) read from a replica. Apply outermost."""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            token = _use_replica.set(_replica_allowed(request))
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _use_replica.reset(token)
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        token = _use_replica.set(_replica_allowed(request))
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside the block, whatever the view allows"""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    """Reads from a random replica when allowed, writes to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or not _use_replica.get():
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Pin a visitor to the primary for a while after each POST"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.pin(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.pin(request, await self.get_response(request))
+
+    def pin(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
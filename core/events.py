@@ -0,0 +1,298 @@
+"""
+Live order events
+
+Order changes are published to named channels once their transaction
+commits:
+- `order:<id>`  status changes of one order (the customer's order page)
+- `orders`      new orders and status changes (the admin order list)
+
+Browsers follow them over Server-Sent Events, or long polling where
+EventSource isn't available, instead of reloading pages.
+
+Between processes, events travel over PostgreSQL LISTEN/NOTIFY: publish()
+sends a NOTIFY, and each worker process runs one listener thread that hands
+notifications to its local subscribers. On other databases (SQLite in
+development) events go straight to the in-process broker, so only
+subscribers in the publishing process see them.
+
+Subscribers are bounded asyncio queues: under ASGI an idle stream is a
+suspended coroutine holding no thread and no database connection (the
+connection the request used so far is closed, or handed back to the pool,
+before it starts waiting; otherwise Django would keep it until the response
+closes, up to STREAM_MAX_SECONDS later). Sync
+(WSGI) workers can't afford to hold a request open, so there a stream sends
+the current state and asks the browser to reconnect after
+STREAM_RETRY_WSGI, and long polls return at once: each open page then costs
+a full request every 15 seconds. Run SERVER_MODE=asgi in production
+(`manage.py check --deploy` warns otherwise).
+"""
+
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import add_never_cache_headers
+
+from .metrics import EVENT_STREAMS
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'bakery_events'
+QUEUE_SIZE = 100             # events buffered per subscriber; the oldest are dropped
+STREAM_HEARTBEAT = 15        # seconds between keep-alive comments
+STREAM_MAX_SECONDS = 300     # streams end and the browser reconnects
+STREAM_RETRY = 3000          # ms before the browser reconnects a dropped stream
+STREAM_RETRY_WSGI = 15000    # ms between one-shot streams under sync workers
+LONG_POLL_SECONDS = 25
+
+
+class Subscription:
+    """Events for a set of channels, delivered to the subscriber's event loop"""
+
+    def __init__(self, channels, loop):
+        self.channels = channels
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def deliver(self, event):
+        # Runs on the subscriber's loop
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        """The next event, or None after timeout seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broker:
+    """In-process fan-out from channels to subscriptions"""
+
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, channels):
+        subscription = Subscription(tuple(channels), asyncio.get_running_loop())
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscriptions[channel].discard(subscription)
+                if not self.subscriptions[channel]:
+                    del self.subscriptions[channel]
+
+    def dispatch(self, channel, event):
+        """Deliver an event to this process's subscribers; callable from any thread"""
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(subscription)
+
+    def subscriber_count(self):
+        with self.lock:
+            return len({sub for subs in self.subscriptions.values() for sub in subs})
+
+
+broker = Broker()
+
+
+def _uses_notify():
+    return connections[DEFAULT_DB_ALIAS].vendor == 'postgresql'
+
+
+def publish(channel, event):
+    """Publish an event (a JSON-serializable dict) once the current transaction commits"""
+    def send():
+        if not _uses_notify():
+            broker.dispatch(channel, event)
+            return
+        payload = json.dumps({'channel': channel, 'event': event})
+        try:
+            with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+                cursor.execute('SELECT pg_notify(%s, %s)', [NOTIFY_CHANNEL, payload])
+        except Exception:
+            # Live updates are best effort; the page is still right on reload
+            logger.exception('Could not publish %s event', channel)
+
+    transaction.on_commit(send)
+
+
+def order_event(order, kind):
+    return {
+        'type': kind,
+        'id': order.pk,
+        'order_number': order.order_number,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+    }
+
+
+def publish_order(order, kind):
+    """Tell the order's customer and the admins about a new order or status change"""
+    event = order_event(order, kind)
+    publish(f'order:{order.pk}', event)
+    publish('orders', event)
+
+
+# PostgreSQL listener: one thread and one connection per process, started
+# by the first subscriber.
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _ensure_listener():
+    global _listener
+    if not _uses_notify():
+        return
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = threading.Thread(target=_listen, name='order-events', daemon=True)
+            _listener.start()
+
+
+def _listen():
+    wrapper = connections[DEFAULT_DB_ALIAS]
+    params = wrapper.get_connection_params()
+    while True:
+        connection = None
+        try:
+            connection = wrapper.Database.connect(**params)
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {NOTIFY_CHANNEL}')
+            while True:
+                if select.select([connection], [], [], STREAM_HEARTBEAT) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    try:
+                        message = json.loads(notify.payload)
+                    except ValueError:
+                        continue
+                    broker.dispatch(message['channel'], message['event'])
+        except Exception:
+            logger.exception('Order event listener failed; reconnecting')
+            time.sleep(5)
+        finally:
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+
+def subscribe(*channels):
+    """Subscribe the running event loop to channels; close with unsubscribe()"""
+    _ensure_listener()
+    EVENT_STREAMS.inc()
+    return broker.subscribe(channels)
+
+
+def unsubscribe(subscription):
+    EVENT_STREAMS.dec()
+    broker.unsubscribe(subscription)
+
+
+def streaming_allowed():
+    """Whether requests may stay open: only async workers can afford it"""
+    return settings.SERVER_MODE == 'asgi'
+
+
+async def _release_connections():
+    # The request's queries ran in its thread-sensitive executor thread, so
+    # close its connections there
+    await sync_to_async(connections.close_all)()
+
+
+def _sse(event):
+    return f"event: order\ndata: {json.dumps(event)}\n\n"
+
+
+def event_stream_response(channels, initial):
+    """
+    A text/event-stream response sending the events returned by `initial`
+    (an async callable, run after subscribing so nothing falls in between),
+    then everything published to channels for up to STREAM_MAX_SECONDS.
+    """
+    async def stream():
+        if not streaming_allowed():
+            yield f'retry: {STREAM_RETRY_WSGI}\n\n'
+            for event in await initial():
+                yield _sse(event)
+            return
+
+        subscription = subscribe(*channels)
+        try:
+            yield f'retry: {STREAM_RETRY}\n\n'
+            for event in await initial():
+                yield _sse(event)
+            await _release_connections()
+            # Bounded so a stream whose client went away quietly still ends
+            deadline = time.monotonic() + STREAM_MAX_SECONDS
+            while time.monotonic() < deadline:
+                event = await subscription.get(STREAM_HEARTBEAT)
+                yield ': ping\n\n' if event is None else _sse(event)
+        finally:
+            unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    add_never_cache_headers(response)
+    # nginx would otherwise buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def long_poll(channels, pending, timeout=LONG_POLL_SECONDS):
+    """
+    Events for a long-polling client: whatever `pending` (an async callable)
+    says the client has missed, else the next events published to channels
+    within timeout seconds, else [].
+    """
+    if not streaming_allowed():
+        return await pending()
+    subscription = subscribe(*channels)
+    try:
+        events = await pending()
+        if events:
+            return events
+        await _release_connections()
+        event = await subscription.get(timeout)
+        if event is None:
+            return []
+        events = [event]
+        # Collect anything published in the same burst
+        while not subscription.queue.empty():
+            events.append(subscription.queue.get_nowait())
+        return events
+    finally:
+        unsubscribe(subscription)
+
+
+async def long_poll_response(channels, pending):
+    """JSON for long_poll(), with how long the client should wait before polling again"""
+    events = await long_poll(channels, pending)
+    response = JsonResponse({'events': events, 'retry': 0 if streaming_allowed() else STREAM_RETRY_WSGI})
+    add_never_cache_headers(response)
+    return response
@@ -0,0 +1,172 @@
+"""
+Faceted Catalog Filtering
+
+The storefront filters available products by price band, rating, weight,
+featured/special and stock. Instead of one COUNT query per facet value,
+a FacetIndex is built over all available products once per catalog
+version:
+
+- every product gets a bit position (in the listing's default order)
+- every facet value gets a bitmap (a Python int) of the products it matches
+- filters combine with & (across facets) and | (within a facet), and a
+  count is just the popcount of a bitmap
+
+The index is small enough to cache whole, so a filtered listing costs one
+cache read plus a primary-key query for the products on the page.
+"""
+
+from decimal import Decimal
+
+from .caching import get_or_compute
+from .catalog import CATALOG_VERSION_KEY
+from .models import Product
+
+
+# (value, label, min price inclusive, max price exclusive)
+PRICE_BANDS = [
+    ('0-100', 'Under ₹100', None, Decimal('100')),
+    ('100-250', '₹100 – ₹250', Decimal('100'), Decimal('250')),
+    ('250-500', '₹250 – ₹500', Decimal('250'), Decimal('500')),
+    ('500-', '₹500 & above', Decimal('500'), None),
+]
+RATING_LEVELS = [4, 3]
+FLAGS = [
+    ('featured', 'Featured'),
+    ('special', 'Specials'),
+    ('in_stock', 'In stock'),
+]
+
+# Query string parameter -> sidebar heading, in sidebar order
+FACET_TITLES = {
+    'price': 'Price',
+    'rating': 'Rating',
+    'weight': 'Size',
+    'flag': 'Show only',
+}
+FACET_PARAMS = list(FACET_TITLES)
+
+FACET_CACHE_TIMEOUT = 60 * 60
+
+
+def _bits(positions):
+    bitmap = 0
+    for position in positions:
+        bitmap |= 1 << position
+    return bitmap
+
+
+def _positions(bitmap):
+    # bin() is linear in the bitmap size; shifting bit by bit would be quadratic
+    return [position for position, bit in enumerate(reversed(bin(bitmap)[2:])) if bit == '1']
+
+
+class FacetIndex:
+    """Bitmaps of available products per category and per facet value"""
+
+    def __init__(self, ids, categories, postings, labels):
+        self.ids = ids                # bit position -> product id
+        self.categories = categories  # category id -> bitmap
+        self.postings = postings      # facet -> {value: bitmap}
+        self.labels = labels          # facet -> [(value, label)] in display order
+        self.all = (1 << len(ids)) - 1
+
+    @classmethod
+    def build(cls):
+        rows = list(
+            Product.objects.filter(is_available=True)
+            .values_list('id', 'category_id', 'price', 'rating', 'weight', 'is_featured', 'is_special', 'stock')
+        )
+        ids = [row[0] for row in rows]
+        categories = {}
+        postings = {facet: {} for facet in FACET_PARAMS}
+        weights = {}
+
+        def add(facet, value, position):
+            postings[facet][value] = postings[facet].get(value, 0) | (1 << position)
+
+        for position, (_, category_id, price, rating, weight, featured, special, stock) in enumerate(rows):
+            categories[category_id] = categories.get(category_id, 0) | (1 << position)
+            for value, _, low, high in PRICE_BANDS:
+                if (low is None or price >= low) and (high is None or price < high):
+                    add('price', value, position)
+            for level in RATING_LEVELS:
+                if rating >= level:
+                    add('rating', str(level), position)
+            if weight and weight.strip():
+                value = weight.strip().lower()
+                weights.setdefault(value, weight.strip())
+                add('weight', value, position)
+            if featured:
+                add('flag', 'featured', position)
+            if special:
+                add('flag', 'special', position)
+            if stock > 0:
+                add('flag', 'in_stock', position)
+
+        labels = {
+            'price': [(value, label) for value, label, _, _ in PRICE_BANDS],
+            'rating': [(str(level), f'{level}★ & up') for level in RATING_LEVELS],
+            'weight': sorted(weights.items(), key=lambda item: item[1].lower()),
+            'flag': FLAGS,
+        }
+        return cls(ids, categories, postings, labels)
+
+    def bitmap_for_ids(self, product_ids):
+        """Bitmap of the given product ids (e.g. the matches of a text search)"""
+        wanted = set(product_ids)
+        return _bits(position for position, pk in enumerate(self.ids) if pk in wanted)
+
+    def _facet_mask(self, facet, values):
+        """Products matching any of the selected values of one facet"""
+        bitmap = 0
+        for value in values:
+            bitmap |= self.postings[facet].get(value, 0)
+        return bitmap
+
+    def apply(self, selected, base=None):
+        """
+        Filter with {facet: [values]} on top of a base bitmap. Returns
+        (matching product ids in listing order, facets for display), where
+        each facet value's count is computed with the other facets' filters
+        applied but not its own, so choices within a facet stay visible.
+        """
+        base = self.all if base is None else base
+        masks = {
+            facet: self._facet_mask(facet, values)
+            for facet, values in selected.items() if values
+        }
+        result = base
+        for mask in masks.values():
+            result &= mask
+
+        facets = []
+        for facet in FACET_PARAMS:
+            others = base
+            for other, mask in masks.items():
+                if other != facet:
+                    others &= mask
+            chosen = set(selected.get(facet, ()))
+            options = [
+                {
+                    'value': value,
+                    'label': label,
+                    'count': (others & self.postings[facet].get(value, 0)).bit_count(),
+                    'selected': value in chosen,
+                }
+                for value, label in self.labels[facet]
+            ]
+            facets.append({'param': facet, 'title': FACET_TITLES[facet], 'options': options})
+        return [self.ids[position] for position in _positions(result)], facets
+
+
+def get_facet_index():
+    """The FacetIndex for the current catalog version, built on first use"""
+    return get_or_compute(
+        'facets:index', FacetIndex.build, FACET_CACHE_TIMEOUT, versions=[CATALOG_VERSION_KEY],
+        read_primary=True,
+    )
+
+
+def selected_facets(querydict):
+    """{facet: [values]} from request.GET"""
+    return {param: querydict.getlist(param) for param in FACET_PARAMS if querydict.getlist(param)}
@@ -0,0 +1,9 @@
+from django import forms
+
+
+class ContactForm(forms.Form):
+    """Contact page submission"""
+    name = forms.CharField(max_length=100)
+    email = forms.EmailField()
+    subject = forms.CharField(max_length=200)
+    message = forms.CharField(max_length=5000)
@@ -0,0 +1,188 @@
+"""
+Image Derivatives
+
+Uploaded product, category and profile images are resized into a few
+fixed-width variants, each saved as WebP plus a JPEG fallback:
+
+    <MEDIA_ROOT>/derived/<original path without extension>/<variant>.<webp|jpg>
+
+The paths are deterministic and nginx serves them straight from /media/.
+Variants are generated in a process pool after upload (or by
+`manage.py generate_image_variants`); until they exist, templates fall
+back to the original file.
+
+Which variants exist is kept in the cache (image_variants()): set when
+generation finishes, and otherwise looked up on disk once per image and
+remembered, for a short while if some are still missing. Templates never
+stat files per render.
+"""
+
+import hashlib
+import logging
+import os
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+# name -> target width in pixels
+IMAGE_VARIANTS = {
+    'thumb': 160,
+    'card': 480,
+    'detail': 960,
+}
+IMAGE_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+DERIVED_DIR = 'derived'
+# Seconds a variant listing stays cached: complete, or with variants missing
+VARIANTS_CACHE_TIMEOUT = 24 * 60 * 60
+PENDING_VARIANTS_CACHE_TIMEOUT = 60
+
+
+def variant_name(original_name, variant, ext):
+    """Storage name of one derivative of an uploaded image"""
+    base, _ = posixpath.splitext(original_name)
+    return posixpath.join(DERIVED_DIR, base, f'{variant}.{ext}')
+
+
+def render_variants(source_path, media_root, original_name):
+    """
+    Write every variant of one image. Runs in a worker process, so it only
+    touches the filesystem and Pillow (no ORM). Returns the files written.
+    """
+    from PIL import Image, ImageOps
+
+    written = []
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        for variant, width in IMAGE_VARIANTS.items():
+            resized = image.copy()
+            # Never upscale: small uploads just get recompressed
+            if resized.width > width:
+                height = round(resized.height * width / resized.width)
+                resized = resized.resize((width, height), Image.LANCZOS)
+            for ext, options in IMAGE_FORMATS.items():
+                target = os.path.join(media_root, variant_name(original_name, variant, ext))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if ext == 'webp' and has_alpha:
+                    frame = resized.convert('RGBA')
+                else:
+                    frame = _flatten(resized)
+                # Write then rename so readers never see a half-written file
+                partial = f'{target}.part'
+                frame.save(partial, **options)
+                os.replace(partial, target)
+                written.append(target)
+    return written
+
+
+def _flatten(image):
+    """RGB copy of an image, with transparency composited onto white"""
+    from PIL import Image
+
+    if image.mode == 'RGB':
+        return image
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS)
+    return _executor
+
+
+def _on_rendered(original_name):
+    def callback(future):
+        exc = future.exception()
+        if exc is not None:
+            logger.warning('Image variant generation failed for %s: %s', original_name, exc)
+        else:
+            variants_generated(original_name)
+    return callback
+
+
+def generate_variants(field_file, background=True):
+    """
+    Create the variants for an ImageField value. With background=True the
+    work is queued on the process pool once the current transaction commits.
+    """
+    if not field_file or not field_file.name:
+        return
+    try:
+        source_path = field_file.path
+    except NotImplementedError:
+        # Remote storage: nothing nginx could serve locally anyway
+        return
+
+    args = (source_path, str(settings.MEDIA_ROOT), field_file.name)
+    if not background or settings.IMAGE_WORKERS < 1:
+        try:
+            written = render_variants(*args)
+        except (OSError, ValueError) as exc:
+            # Missing or unreadable upload: templates keep using the original
+            logger.warning('Image variant generation failed for %s: %s', field_file.name, exc)
+            return []
+        variants_generated(field_file.name)
+        return written
+
+    def submit():
+        _get_executor().submit(render_variants, *args).add_done_callback(_on_rendered(field_file.name))
+
+    transaction.on_commit(submit)
+
+
+def variants_missing(field_file):
+    """True if an image has no generated variants yet"""
+    if not field_file or not field_file.name:
+        return False
+    largest = max(IMAGE_VARIANTS, key=IMAGE_VARIANTS.get)
+    return not default_storage.exists(variant_name(field_file.name, largest, 'jpg'))
+
+
+def _variants_key(image_name):
+    return f'images:variants:{hashlib.sha1(image_name.encode()).hexdigest()}'
+
+
+def _listing(image_name, exists=None):
+    """{ext: [(variant, width, url)]} of the variants for which exists(name) holds"""
+    listing = {ext: [] for ext in IMAGE_FORMATS}
+    for ext, found in listing.items():
+        for variant, width in IMAGE_VARIANTS.items():
+            name = variant_name(image_name, variant, ext)
+            if exists is None or exists(name):
+                found.append((variant, width, default_storage.url(name)))
+    return listing
+
+
+def variants_generated(image_name):
+    """Record that every variant of an image now exists"""
+    cache.set(_variants_key(image_name), _listing(image_name), VARIANTS_CACHE_TIMEOUT)
+
+
+def image_variants(image_name):
+    """{'webp': [(variant, width, url)], 'jpg': [...]} for the variants that exist"""
+    key = _variants_key(image_name)
+    listing = cache.get(key)
+    if listing is None:
+        listing = _listing(image_name, default_storage.exists)
+        complete = all(len(found) == len(IMAGE_VARIANTS) for found in listing.values())
+        cache.set(key, listing, VARIANTS_CACHE_TIMEOUT if complete else PENDING_VARIANTS_CACHE_TIMEOUT)
+    return listing
@@ -0,0 +1,77 @@
+"""
+Contact Inbox Helpers
+
+Keeps a cached count of unread (unarchived) contact messages so the admin
+dashboard doesn't run a COUNT on every load. The counter is adjusted in
+place when messages are created or marked read, and recomputed from the
+partial unread index whenever it is missing (bulk actions simply drop it).
+It also expires after UNREAD_COUNT_TIMEOUT, so an adjustment lost to a
+backend without atomic incr (FileBasedCache) is corrected by a recount.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import ContactMessage
+
+
+UNREAD_COUNT_KEY = 'inbox:unread_count'
+UNREAD_COUNT_TIMEOUT = 5 * 60
+
+
+def unread_messages():
+    return ContactMessage.objects.filter(is_read=False, is_archived=False)
+
+
+def get_unread_count():
+    """Return the number of unread messages, from cache when possible"""
+    count = cache.get(UNREAD_COUNT_KEY)
+    if count is None:
+        count = unread_messages().count()
+        cache.set(UNREAD_COUNT_KEY, count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def adjust_unread_count(delta):
+    """Apply a delta to the cached counter (after the transaction commits)"""
+    if not delta:
+        return
+
+    def apply():
+        try:
+            if cache.incr(UNREAD_COUNT_KEY, delta) < 0:
+                cache.delete(UNREAD_COUNT_KEY)
+        except ValueError:
+            # Not cached: the next read recomputes it
+            pass
+
+    transaction.on_commit(apply)
+
+
+def reset_unread_count():
+    transaction.on_commit(lambda: cache.delete(UNREAD_COUNT_KEY))
+
+
+def mark_message_read(message_id):
+    """Flip a single message to read without a full-row save"""
+    if unread_messages().filter(pk=message_id).update(is_read=True):
+        adjust_unread_count(-1)
+        return True
+    # Archived or already read: no effect on the counter
+    return bool(ContactMessage.objects.filter(pk=message_id, is_read=False).update(is_read=True))
+
+
+def mark_read(messages):
+    """Mark a queryset of messages read with one UPDATE. Returns rows changed."""
+    updated = messages.filter(is_read=False).update(is_read=True)
+    if updated:
+        reset_unread_count()
+    return updated
+
+
+def archive(messages):
+    """Archive a queryset of messages with one UPDATE. Returns rows changed."""
+    updated = messages.filter(is_archived=False).update(is_archived=True)
+    if updated:
+        reset_unread_count()
+    return updated
@@ -0,0 +1,266 @@
+"""
+Per-request timing
+
+With REQUEST_TIMING_SAMPLE_RATE above 0, RequestTimingMiddleware times
+that fraction of requests:
+- database queries (count and time, every alias), through an execute
+  wrapper added to each new connection;
+- template rendering;
+- the view, from URL resolution until the response is returned.
+
+A timed response gets a Server-Timing header, which browser dev tools show
+in the network panel:
+
+    Server-Timing: db;dur=12.1;desc="9 queries", tpl;dur=4.0, view;dur=25.3, total;dur=27.9
+
+and one JSON log line on the `core.instrumentation` logger.
+
+The same SQL repeated REQUEST_TIMING_REPEAT_THRESHOLD times or more in one
+request is usually an N+1: a query per row of a loop, such as
+`{{ order.items.count }}` in a list template. Such shapes are logged as a
+warning with the count and where the repeated query came from: the
+project line that ran it and the template being rendered. The header only
+says how many times each was repeated: every visitor and cache in between
+can read it, and file paths and template names aren't for them.
+
+The hooks (an execute wrapper per connection and a patched Template.render)
+are shared with core.metrics: MetricsMiddleware, on unless METRICS_ENABLED
+is off, installs them too and times every request, counting queries but not
+looking for repeats. With the rate at 0 this middleware removes itself;
+it costs nothing more than the metrics already do. Requests timed by
+neither pay one context variable lookup per query and per template render.
+"""
+
+import json
+import logging
+import random
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_timings', default=None)
+
+# `IN (%s, %s, ...)` lists vary in length between otherwise identical queries
+_IN_LIST = re.compile(r'\((?:%s, )*%s\)')
+_PROJECT_DIR = str(Path(settings.BASE_DIR).resolve())
+# Modules with execute wrappers: their frames are never where a query came from
+_wrapper_files = {__file__}
+
+
+class RequestTimings:
+    """What one sampled request spent its time on"""
+
+    def __init__(self, detect_repeats=True):
+        self.detect_repeats = detect_repeats
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.rendering = []     # names of the templates being rendered, innermost last
+        self.shapes = Counter()
+        self.repeated = {}      # SQL shape -> where it was repeated from
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.db += duration
+        if not self.detect_repeats:
+            return
+        shape = _IN_LIST.sub('(...)', sql)
+        self.shapes[shape] += 1
+        if self.shapes[shape] == settings.REQUEST_TIMING_REPEAT_THRESHOLD:
+            self.repeated[shape] = query_origin()
+
+    def summary(self, request, response):
+        now = time.perf_counter()
+        match = getattr(request, 'resolver_match', None)
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round((now - self.started) * 1000, 1),
+            'view_ms': round((now - self.view_started) * 1000, 1) if self.view_started else None,
+            'db_ms': round(self.db * 1000, 1),
+            'queries': self.queries,
+            'template_ms': round(self.template * 1000, 1),
+            'repeated': [
+                {'count': self.shapes[shape], 'sql': shape[:300], 'origin': origin}
+                for shape, origin in self.repeated.items()
+            ],
+        }
+
+
+def skip_in_origins(filename):
+    """Leave frames of filename, a module with an execute wrapper, out of query_origin()"""
+    _wrapper_files.add(filename)
+
+
+def query_origin():
+    """
+    Where the running query comes from: the project line that ran it and/or
+    the template being rendered
+    """
+    origin = template = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code is _template_render.__code__:
+            # Reached the innermost template render: the template itself ran the query
+            rendered = frame.f_locals['self'].origin
+            template = f'template {rendered.template_name or rendered.name}'
+            break
+        filename = frame.f_code.co_filename
+        if '/asgiref/' in filename:
+            # Run by sync_to_async: the frames further out are the caller's
+            # thread waiting, not the async view that asked for the query
+            break
+        if (filename.startswith(_PROJECT_DIR) and filename not in _wrapper_files
+                and 'site-packages' not in filename):
+            origin = f'{filename[len(_PROJECT_DIR) + 1:]}:{frame.f_lineno} in {frame.f_code.co_name}'
+            break
+        frame = frame.f_back
+    if template is None:
+        timings = _current.get()
+        if timings is not None and timings.rendering:
+            template = f'template {timings.rendering[-1]}'
+    if origin and template:
+        return f'{origin} ({template})'
+    return origin or template or 'unknown'
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(sql, time.perf_counter() - started)
+
+
+def _add_wrapper(connection):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _add_wrapper(connection)
+
+
+_template_render = Template.render
+
+
+def _timed_render(self, context):
+    timings = _current.get()
+    if timings is None:
+        return _template_render(self, context)
+    timings.rendering.append(self.origin.template_name or self.origin.name)
+    started = time.perf_counter()
+    try:
+        return _template_render(self, context)
+    finally:
+        timings.rendering.pop()
+        # Included templates render inside their parent: count the outermost only
+        if not timings.rendering:
+            timings.template += time.perf_counter() - started
+
+
+def install():
+    """Time queries on every connection and template renders; idempotent"""
+    connection_created.connect(_on_connection_created, dispatch_uid='request_timing')
+    for connection in connections.all(initialized_only=True):
+        _add_wrapper(connection)
+    Template.render = _timed_render
+
+
+@contextmanager
+def timed(detect_repeats=False):
+    """
+    The current request's RequestTimings, started here unless an outer
+    middleware (core.metrics) already did
+    """
+    timings = _current.get()
+    if timings is not None:
+        timings.detect_repeats = timings.detect_repeats or detect_repeats
+        yield timings
+        return
+    token = _current.set(RequestTimings(detect_repeats))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def server_timing(summary):
+    metrics = [
+        f"db;dur={summary['db_ms']};desc=\"{summary['queries']} queries\"",
+        f"tpl;dur={summary['template_ms']}",
+    ]
+    if summary['view_ms'] is not None:
+        metrics.append(f"view;dur={summary['view_ms']}")
+    metrics.append(f"total;dur={summary['total_ms']}")
+    for repeated in summary['repeated']:
+        metrics.append(f"repeated;desc=\"{repeated['count']}x\"")
+    return ', '.join(metrics)
+
+
+class RequestTimingMiddleware:
+    """Time a sample of requests; see the module docstring"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.REQUEST_TIMING_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        with timed(detect_repeats=True) as timings:
+            return self.report(request, self.get_response(request), timings)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        with timed(detect_repeats=True) as timings:
+            return self.report(request, await self.get_response(request), timings)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = _current.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+
+    @staticmethod
+    def sampled():
+        rate = settings.REQUEST_TIMING_SAMPLE_RATE
+        return rate >= 1 or random.random() < rate
+
+    def report(self, request, response, timings):
+        summary = timings.summary(request, response)
+        response['Server-Timing'] = server_timing(summary)
+        if summary['repeated']:
+            logger.warning('Repeated queries in %s: %s', summary['view'] or summary['path'], json.dumps(summary))
+        else:
+            logger.info('%s', json.dumps(summary))
+        return response
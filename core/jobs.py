@@ -0,0 +1,293 @@
+"""
+Background jobs
+
+Work that doesn't have to finish before the response (customer emails, so
+far) is stored as Job rows and run by `manage.py run_workers`:
+
+    @job(queue='email')
+    def send_order_confirmation(order_id): ...
+
+    send_order_confirmation.delay(order_id=order.pk)
+
+delay() inserts the row in the caller's transaction, so the job exists
+exactly when the change that caused it commits. Arguments are stored as
+JSON: pass ids, not model instances.
+
+Workers claim due jobs in batches. On PostgreSQL the claim is
+SELECT ... FOR UPDATE SKIP LOCKED, so workers never wait on each other's
+rows; on databases without it (SQLite in development) each job is claimed
+with a conditional UPDATE, and a worker that loses the race moves on. Idle
+workers poll every JOB_POLL_INTERVAL seconds.
+
+A job that raises is retried after JOB_RETRY_DELAY seconds, doubled for
+every further attempt up to JOB_RETRY_MAX_DELAY. After max_attempts it is
+marked dead and kept for inspection; requeue() runs it again. Jobs left
+running by a worker that died are requeued after JOB_LOCK_TIMEOUT.
+
+Each job records how long it waited before its first run (wait_ms) and how
+long its last attempt took (run_ms); job_stats() sums them up per task.
+"""
+
+import functools
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections, transaction
+from django.db.models import Avg, Count, F, Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+class Task:
+    """A function that can run in a worker; created by @job"""
+
+    def __init__(self, func, queue, max_attempts, around):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.around = around
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def delay(self, **kwargs):
+        """Queue a run with these keyword arguments"""
+        if settings.JOB_INLINE:
+            transaction.on_commit(functools.partial(self._run_inline, kwargs))
+            return None
+        return Job.objects.create(
+            task=self.name,
+            kwargs=kwargs,
+            queue=self.queue,
+            max_attempts=self.max_attempts or settings.JOB_MAX_ATTEMPTS,
+        )
+
+    def _run_inline(self, kwargs):
+        try:
+            with self.around() if self.around else nullcontext():
+                self.func(**kwargs)
+        except Exception:
+            logger.exception('Job %s failed', self.name)
+
+
+def job(queue='default', max_attempts=None, around=None):
+    """
+    Register a function as a background task. `around` is a context manager
+    factory entered once around all the jobs of a batch that name it, for a
+    resource they can share (see core.notifications.mail_connection).
+    """
+    def decorator(func):
+        task = Task(func, queue, max_attempts, around)
+        _tasks[task.name] = task
+        return task
+    return decorator
+
+
+def get_task(name):
+    """The registered task called name, importing its module if needed"""
+    if name not in _tasks:
+        try:
+            import_string(name)
+        except ImportError:
+            return None
+    return _tasks.get(name)
+
+
+def retry_delay(attempts):
+    """Seconds before another try, after `attempts` failed ones"""
+    delay = min(settings.JOB_RETRY_DELAY * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_DELAY)
+    # Jitter, so jobs that failed together don't all retry together
+    return delay * random.uniform(1, 1.2)
+
+
+def claim(worker, queues=None, limit=10):
+    """Mark up to limit due jobs as running by worker, and return them"""
+    now = timezone.now()
+    due = Job.objects.filter(status='queued', run_at__lte=now).order_by('run_at', 'pk')
+    if queues:
+        due = due.filter(queue__in=queues)
+    running = {'status': 'running', 'locked_by': worker, 'locked_at': now, 'attempts': F('attempts') + 1}
+
+    if connections[DEFAULT_DB_ALIAS].features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            if ids:
+                Job.objects.filter(pk__in=ids).update(**running)
+    else:
+        ids = [
+            pk for pk in due.values_list('pk', flat=True)[:limit]
+            if Job.objects.filter(pk=pk, status='queued').update(**running)
+        ]
+    if not ids:
+        return []
+    return list(Job.objects.filter(pk__in=ids).order_by('run_at', 'pk'))
+
+
+def finish(job, run_ms, error=None):
+    """Record a run: done, retried later, or dead once out of attempts"""
+    now = timezone.now()
+    fields = {'run_ms': run_ms, 'locked_by': '', 'locked_at': None}
+    if job.wait_ms is None and job.locked_at:
+        fields['wait_ms'] = (job.locked_at - job.created_at).total_seconds() * 1000
+
+    if error is None:
+        Job.objects.filter(pk=job.pk).update(status='done', finished_at=now, last_error='', **fields)
+        logger.info('Job %s #%s done in %.0f ms', job.task, job.pk, run_ms)
+    elif job.attempts >= job.max_attempts:
+        Job.objects.filter(pk=job.pk).update(status='dead', finished_at=now, last_error=error, **fields)
+        logger.error('Job %s #%s failed %d times, giving up:\n%s', job.task, job.pk, job.attempts, error)
+    else:
+        delay = retry_delay(job.attempts)
+        Job.objects.filter(pk=job.pk).update(
+            status='queued', run_at=now + timedelta(seconds=delay), last_error=error, **fields,
+        )
+        logger.warning('Job %s #%s failed (attempt %d), retrying in %.0fs:\n%s',
+                       job.task, job.pk, job.attempts, delay, error)
+
+
+def requeue_stale():
+    """Put back jobs whose worker died mid-run; returns how many"""
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status='running', locked_at__lt=now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT),
+    )
+    error = 'The worker stopped while running this job'
+    unlocked = {'locked_by': '', 'locked_at': None, 'last_error': error}
+    dead = stale.filter(attempts__gte=F('max_attempts')).update(status='dead', finished_at=now, **unlocked)
+    requeued = stale.update(status='queued', run_at=now, **unlocked)
+    if dead or requeued:
+        logger.warning('Requeued %d and buried %d jobs left running', requeued, dead)
+    return requeued + dead
+
+
+def requeue(jobs=None):
+    """Give dead jobs (all of them, or the given queryset) a fresh set of attempts"""
+    if jobs is None:
+        jobs = Job.objects.all()
+    return jobs.filter(status='dead').update(
+        status='queued', attempts=0, run_at=timezone.now(), finished_at=None,
+    )
+
+
+def purge_finished():
+    """Delete done jobs older than JOB_KEEP_DONE_DAYS; dead ones stay"""
+    cutoff = timezone.now() - timedelta(days=settings.JOB_KEEP_DONE_DAYS)
+    deleted, _ = Job.objects.filter(status='done', finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def job_stats(since=None):
+    """
+    {task: {'queued', 'running', 'done', 'dead', 'finished', 'avg_wait_ms',
+    'max_wait_ms', 'avg_run_ms', 'max_run_ms'}}, timings over jobs finished
+    since `since` (default: the last hour)
+    """
+    if since is None:
+        since = timezone.now() - timedelta(hours=1)
+    stats = {}
+    for row in Job.objects.values('task', 'status').annotate(count=Count('pk')).order_by():
+        task = stats.setdefault(row['task'], {'queued': 0, 'running': 0, 'done': 0, 'dead': 0})
+        task[row['status']] = row['count']
+    timings = (
+        Job.objects.filter(status='done', finished_at__gte=since)
+        .values('task')
+        .annotate(
+            finished=Count('pk'),
+            avg_wait_ms=Avg('wait_ms'), max_wait_ms=Max('wait_ms'),
+            avg_run_ms=Avg('run_ms'), max_run_ms=Max('run_ms'),
+        )
+        .order_by()
+    )
+    for row in timings:
+        stats.setdefault(row.pop('task'), {}).update(row)
+    return stats
+
+
+class Worker:
+    """Claims and runs jobs until stop is set; one per thread"""
+
+    def __init__(self, name, queues=None, batch_size=10, stop=None):
+        self.name = name
+        self.queues = queues
+        self.batch_size = batch_size
+        self.stop = stop or threading.Event()
+
+    def run(self):
+        logger.info('Worker %s started (queues: %s)', self.name, ', '.join(self.queues or ['all']))
+        while not self.stop.is_set():
+            try:
+                jobs = claim(self.name, self.queues, self.batch_size)
+                if jobs:
+                    self.run_batch(jobs)
+            except Exception:
+                logger.exception('Worker %s could not claim jobs', self.name)
+                jobs = []
+            finally:
+                # Drops connections that broke or outlived CONN_MAX_AGE
+                close_old_connections()
+            if not jobs:
+                self.stop.wait(settings.JOB_POLL_INTERVAL)
+        connections.close_all()
+        logger.info('Worker %s stopped', self.name)
+
+    def run_batch(self, jobs):
+        """Run claimed jobs, entering each shared `around` resource once per batch"""
+        batches = {}
+        for job in jobs:
+            task = get_task(job.task)
+            if task is None:
+                finish(job, 0, f'Unknown task {job.task}')
+            else:
+                batches.setdefault(task.around, []).append((task, job))
+        for around, pending in batches.items():
+            try:
+                with around() if around else nullcontext():
+                    while pending:
+                        self.run_job(*pending.pop(0))
+            except Exception:
+                # Setting up the shared resource failed; the jobs are retried
+                error = traceback.format_exc()
+                for _, job in pending:
+                    finish(job, 0, error)
+
+    def run_job(self, task, job):
+        started = time.perf_counter()
+        try:
+            task.func(**job.kwargs)
+            error = None
+        except Exception:
+            error = traceback.format_exc()
+        finish(job, (time.perf_counter() - started) * 1000, error)
+
+
+def run_worker_threads(count, queues=None, batch_size=10, stop=None):
+    """Run count workers in threads of this process until stop is set"""
+    stop = stop or threading.Event()
+    prefix = f'{socket.gethostname()}:{os.getpid()}'
+    threads = [
+        threading.Thread(
+            target=Worker(f'{prefix}:{number}', queues, batch_size, stop).run,
+            name=f'job-worker-{number}',
+        )
+        for number in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
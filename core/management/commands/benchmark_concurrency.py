@@ -0,0 +1,109 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a running server with rising concurrency and report throughput and latency. '
+        'Run once against GUNICORN_WORKERS=1 SERVER_MODE=wsgi and once with SERVER_MODE=asgi '
+        'to compare how many requests one worker serves at a time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/products/', help='Page to request')
+        parser.add_argument('--concurrency', default='1,4,16,64', help='Comma-separated concurrency levels')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per concurrency level')
+        parser.add_argument('--timeout', type=float, default=10.0, help='Seconds before a request counts as failed')
+        parser.add_argument('--slow-clients', type=int, default=0,
+                            help='Extra connections that trickle their request headers during each run')
+        parser.add_argument('--slow-seconds', type=float, default=2.0,
+                            help='How long each slow client takes to send its headers')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http':
+            raise CommandError('Only http:// URLs are supported')
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency takes comma-separated integers')
+
+        self.stdout.write(f"{options['url']}, {options['requests']} requests per level, "
+                          f"{options['slow_clients']} slow client(s)")
+        self.stdout.write(f"{'concurrency':>11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for level in levels:
+            result = asyncio.run(self.run_level(url, level, options))
+            self.stdout.write(
+                f"{level:>11} {result['throughput']:>8.1f} {result['p50']:>8.1f} {result['p95']:>8.1f} "
+                f"{result['p99']:>8.1f} {result['errors']:>7}"
+            )
+
+    async def run_level(self, url, concurrency, options):
+        host, port = url.hostname, url.port or 80
+        path = (url.path or '/') + (f'?{url.query}' if url.query else '')
+        request = f'GET {path} HTTP/1.1\r\nHost: {url.netloc}\r\nConnection: close\r\n\r\n'.encode()
+        remaining = [options['requests']]
+        latencies = []
+        errors = [0]
+
+        async def fetch():
+            reader, writer = await asyncio.open_connection(host, port)
+            try:
+                writer.write(request)
+                await writer.drain()
+                status_line = await reader.readline()
+                await reader.read()
+            finally:
+                writer.close()
+            if not status_line.startswith(b'HTTP/1.1 2') and not status_line.startswith(b'HTTP/1.0 2'):
+                raise ValueError(status_line)
+
+        async def client():
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                started = time.perf_counter()
+                try:
+                    await asyncio.wait_for(fetch(), options['timeout'])
+                    latencies.append(time.perf_counter() - started)
+                except (OSError, ValueError, asyncio.TimeoutError):
+                    errors[0] += 1
+
+        async def slow_client():
+            # Holds a connection while sending the request a line at a time
+            lines = request.split(b'\r\n')[:-1]
+            pause = options['slow_seconds'] / len(lines)
+            while remaining[0] > 0:
+                try:
+                    reader, writer = await asyncio.open_connection(host, port)
+                    for line in lines:
+                        writer.write(line + b'\r\n')
+                        await writer.drain()
+                        await asyncio.sleep(pause)
+                    await reader.read()
+                    writer.close()
+                except OSError:
+                    await asyncio.sleep(pause)
+
+        slow = [asyncio.create_task(slow_client()) for _ in range(options['slow_clients'])]
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        for task in slow:
+            task.cancel()
+        await asyncio.gather(*slow, return_exceptions=True)
+
+        if len(latencies) > 1:
+            quantiles = statistics.quantiles(latencies, n=100)
+        else:
+            quantiles = (latencies or [0.0]) * 99
+        return {
+            'throughput': len(latencies) / elapsed,
+            'p50': quantiles[49] * 1000,
+            'p95': quantiles[94] * 1000,
+            'p99': quantiles[98] * 1000,
+            'errors': errors[0],
+        }
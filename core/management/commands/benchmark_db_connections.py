@@ -0,0 +1,126 @@
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.backends.signals import connection_created
+from django.db.utils import ConnectionHandler
+
+from core.db_pool import close_pool, get_pool
+
+MODES = ('per_request', 'persistent', 'pooled')
+
+# A typical catalog page query
+QUERY = 'SELECT id, name, price FROM core_product WHERE is_available ORDER BY created_at DESC LIMIT 12'
+
+
+class Command(BaseCommand):
+    help = 'Compare request latency and connection churn across DB_CONN_MODE settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Simulated requests per mode')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent request threads')
+        parser.add_argument('--queries', type=int, default=3, help='Queries per request')
+        parser.add_argument('--pool-size', type=int, default=settings.DB_POOL['MAX_SIZE'],
+                            help='Pool size for pooled mode (default: DB_POOL_SIZE)')
+        parser.add_argument('--modes', default=','.join(MODES), help='Comma-separated modes to run')
+
+    def database(self, mode, pool_size):
+        base = {
+            key: value for key, value in settings.DATABASES['default'].items()
+            if key not in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'POOL')
+        }
+        base['ENGINE'] = 'django.db.backends.postgresql'
+        if mode == 'persistent':
+            return {**base, 'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True}
+        if mode == 'pooled':
+            return {**base, 'ENGINE': 'core.db_pool', 'POOL': {**settings.DB_POOL, 'MAX_SIZE': pool_size}}
+        return {**base, 'CONN_MAX_AGE': 0}
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown mode(s): {', '.join(sorted(unknown))}")
+
+        self.stdout.write(
+            f"{options['requests']} requests x {options['queries']} queries, {options['threads']} threads"
+        )
+        self.stdout.write(f"{'mode':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'connects':>9} {'waits':>6}")
+        for mode in modes:
+            result = self.run_mode(mode, options)
+            self.stdout.write(
+                f"{mode:<12} {result['throughput']:>8.0f} {result['p50']:>8.2f} {result['p95']:>8.2f} "
+                f"{result['p99']:>8.2f} {result['connects']:>9} {result['waits']:>6}"
+            )
+
+    def run_mode(self, mode, options):
+        alias = f'benchmark_{mode}'
+        # A separate handler so each mode gets fresh per-thread connections
+        handler = ConnectionHandler({
+            DEFAULT_DB_ALIAS: {'ENGINE': 'django.db.backends.dummy'},
+            alias: self.database(mode, options['pool_size']),
+        })
+        per_thread = -(-options['requests'] // options['threads'])
+        latencies = []
+        errors = []
+        connects = [0]
+        lock = threading.Lock()
+
+        def count_connect(sender, connection, **kwargs):
+            if connection.alias == alias:
+                with lock:
+                    connects[0] += 1
+
+        def worker():
+            connection = handler[alias]
+            timings = []
+            try:
+                for _ in range(per_thread):
+                    started = time.perf_counter()
+                    with connection.cursor() as cursor:
+                        for _ in range(options['queries']):
+                            cursor.execute(QUERY)
+                            cursor.fetchall()
+                    # What the request_finished signal does at the end of a request
+                    connection.close_if_unusable_or_obsolete()
+                    timings.append(time.perf_counter() - started)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(timings)
+
+        connection_created.connect(count_connect)
+        started = time.perf_counter()
+        try:
+            threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            connection_created.disconnect(count_connect)
+        elapsed = time.perf_counter() - started
+
+        if errors:
+            raise CommandError(f'{mode}: {errors[0]}')
+        waits = 0
+        if mode == 'pooled':
+            # Every borrow counts as a connect to Django; the pool knows the real number
+            stats = get_pool(alias).stats()
+            connects[0], waits = stats['created'], stats['waits']
+            close_pool(alias)
+
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        return {
+            'throughput': len(latencies) / elapsed,
+            'p50': quantiles[49] * 1000,
+            'p95': quantiles[94] * 1000,
+            'p99': quantiles[98] * 1000,
+            'connects': connects[0],
+            'waits': waits,
+        }
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Rebuild co-purchase counts and per-product recommendations from order items'
+
+    def handle(self, *args, **options):
+        pairs, products = build_recommendations()
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {pairs} co-purchase pair(s) and recommendations for {products} product(s)"
+        ))
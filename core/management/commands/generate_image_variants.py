@@ -0,0 +1,51 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.models import CustomUser
+from core.images import render_variants, variants_generated, variants_missing
+from core.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG variants for product, category and profile images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate variants that already exist')
+        parser.add_argument('--workers', type=int, default=settings.IMAGE_WORKERS or 1,
+                            help='Worker processes (default: IMAGE_WORKERS)')
+
+    def iter_images(self):
+        sources = [
+            (Product.objects.exclude(image=''), 'image'),
+            (Category.objects.exclude(image='').exclude(image__isnull=True), 'image'),
+            (CustomUser.objects.exclude(profile_image='').exclude(profile_image__isnull=True), 'profile_image'),
+        ]
+        for queryset, field in sources:
+            for obj in queryset.only('id', field).iterator():
+                yield getattr(obj, field)
+
+    def handle(self, *args, **options):
+        jobs = []
+        for image in self.iter_images():
+            if not (options['force'] or variants_missing(image)):
+                continue
+            try:
+                jobs.append((image.path, str(settings.MEDIA_ROOT), image.name))
+            except NotImplementedError:
+                continue
+
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            futures = {executor.submit(render_variants, *job): job[2] for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    variants_generated(futures[future])
+                    done += 1
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"{futures[future]}: {exc}")
+
+        self.stdout.write(self.style.SUCCESS(f"Generated variants for {done} image(s), {failed} failed"))
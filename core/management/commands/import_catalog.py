@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.catalog_import import IMPORT_FORMATS, detect_format, import_products
+
+
+class Command(BaseCommand):
+    help = 'Bulk import/update products from a CSV or JSON file (upsert by slug)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV, JSON array or JSON Lines file')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, help='Rows per bulk_create/bulk_update batch')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report without saving')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or detect_format(path)
+
+        try:
+            with open(path, 'rb') as stream:
+                report = import_products(
+                    stream,
+                    fmt=fmt,
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                )
+        except OSError as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+
+        for row_number, message in report.errors:
+            location = f"Row {row_number}" if row_number else 'File'
+            self.stderr.write(f"{location}: {message}")
+
+        prefix = '[dry run] ' if report.dry_run else ''
+        summary = (
+            f"{prefix}{report.created} created, {report.updated} updated, "
+            f"{len(report.errors)} error(s)"
+        )
+        if report.ok:
+            self.stdout.write(self.style.SUCCESS(summary))
+        else:
+            self.stdout.write(self.style.WARNING(summary))
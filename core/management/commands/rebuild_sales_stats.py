@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.reports import rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-product daily sales aggregate from order items'
+
+    def handle(self, *args, **options):
+        rows = rebuild_daily_sales()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily sales row(s)"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.category_counts import refresh_category_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized product counters on every category'
+
+    def handle(self, *args, **options):
+        fixed = refresh_category_counts()
+        self.stdout.write(self.style.SUCCESS(f"Repaired {fixed} category counter(s)"))
@@ -0,0 +1,103 @@
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from core.jobs import job_stats, purge_finished, requeue, requeue_stale, run_worker_threads
+
+# Seconds between requeueing stale jobs and purging old ones
+HOUSEKEEPING_INTERVAL = 60
+
+
+def _run_process(threads, queues, batch_size):
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stop.set())
+    run_worker_threads(threads, queues, batch_size, stop)
+
+
+class Command(BaseCommand):
+    help = (
+        'Run background job workers (see core/jobs.py) until interrupted: --processes '
+        'processes of --threads worker threads each.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Worker threads per process')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Worker processes; more than 1 forks child processes')
+        parser.add_argument('--queues', default='', help='Comma-separated queues to work on (default: all)')
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs a worker claims at a time')
+        parser.add_argument('--stats', action='store_true', help='Print per-task job statistics and exit')
+        parser.add_argument('--requeue-dead', action='store_true', help='Retry all dead jobs and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            return self.print_stats()
+        if options['requeue_dead']:
+            self.stdout.write(f'Requeued {requeue()} dead job(s)')
+            return
+
+        queues = [queue for queue in options['queues'].split(',') if queue] or None
+        threads, processes = max(options['threads'], 1), max(options['processes'], 1)
+        stop = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *args: stop.set())
+
+        self.stdout.write(f'Starting {processes} process(es) x {threads} worker thread(s), '
+                          f'queues: {", ".join(queues or ["all"])}')
+        if processes == 1:
+            workers = [threading.Thread(
+                target=run_worker_threads, args=(threads, queues, options['batch_size'], stop),
+            )]
+        else:
+            # Children must not inherit open database connections
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            workers = [
+                context.Process(target=_run_process, args=(threads, queues, options['batch_size']))
+                for _ in range(processes)
+            ]
+        for worker in workers:
+            worker.start()
+
+        while not stop.is_set():
+            try:
+                requeue_stale()
+                purge_finished()
+            except Exception as exc:
+                self.stderr.write(f'Housekeeping failed: {exc}')
+            finally:
+                close_old_connections()
+            stop.wait(HOUSEKEEPING_INTERVAL)
+
+        self.stdout.write('Stopping: finishing the current batches')
+        for worker in workers:
+            if isinstance(worker, multiprocessing.process.BaseProcess):
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+
+    def print_stats(self):
+        stats = job_stats()
+        if not stats:
+            self.stdout.write('No jobs')
+            return
+        self.stdout.write(
+            f"{'task':<45} {'queued':>7} {'running':>7} {'done':>7} {'dead':>5} "
+            f"{'last hour':>9} {'avg wait':>9} {'avg run':>8} {'max run':>8}"
+        )
+        for task, row in sorted(stats.items()):
+            self.stdout.write(
+                f"{task:<45} {row.get('queued', 0):>7} {row.get('running', 0):>7} {row.get('done', 0):>7} "
+                f"{row.get('dead', 0):>5} {row.get('finished', 0):>9} {self.ms(row.get('avg_wait_ms')):>9} "
+                f"{self.ms(row.get('avg_run_ms')):>8} {self.ms(row.get('max_run_ms')):>8}"
+            )
+        self.stdout.write(f'Email backend: {settings.EMAIL_BACKEND}')
+
+    @staticmethod
+    def ms(value):
+        return '-' if value is None else f'{value:.0f}ms'
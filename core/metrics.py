@@ -0,0 +1,180 @@
+"""
+Prometheus metrics
+
+GET /metrics returns the Prometheus text format:
+- bakery_http_requests_total{view, method, status}
+- bakery_http_request_duration_seconds{view, method}       histogram
+- bakery_http_requests_in_progress                         all workers
+- bakery_db_queries_per_request{view}                      histogram
+- bakery_db_time_per_request_seconds{view}                 histogram
+- bakery_cache_events_total{namespace, event}              l1_hits, l2_hits, misses, ...
+- bakery_checkouts_total{outcome}                          placed, blocked, rate_limited
+- bakery_cart_operations_total{operation}                  add, update, remove
+- bakery_event_streams_open                                SSE streams and long polls, all workers
+- bakery_jobs{task, status}                                read from the job table at scrape time
+
+`view` is the URL name (`core:product_detail`), so labels stay bounded
+however many products there are; pages served from the page cache before
+URL resolution count as `page_cache`, and unknown URLs as `unmatched`.
+Pages nginx serves from its own cache never reach Django and aren't
+counted here.
+
+Under gunicorn every worker process writes its samples to memory-mapped
+files in PROMETHEUS_MULTIPROC_DIR (set up by gunicorn.conf.py), and a
+scrape of any worker adds them all up, so one scrape gives numbers for the
+whole node. In-progress gauges only count live processes. Without the
+directory (runserver, shell) the metrics are this process's own.
+
+Scrapes must send `Authorization: Bearer <METRICS_TOKEN>`. Without a
+token /metrics only answers with DEBUG on: the app port is reachable
+without nginx's `deny`, and every scrape counts the job table. Prometheus
+scrapes the app directly.
+"""
+
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from .instrumentation import install, timed
+
+REQUESTS = Counter(
+    'bakery_http_requests_total', 'Requests handled', ['view', 'method', 'status'],
+)
+LATENCY = Histogram(
+    'bakery_http_request_duration_seconds', 'Time to produce a response', ['view', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+IN_PROGRESS = Gauge(
+    'bakery_http_requests_in_progress', 'Requests being handled', multiprocess_mode='livesum',
+)
+DB_QUERIES = Histogram(
+    'bakery_db_queries_per_request', 'Database queries run by one request', ['view'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+DB_TIME = Histogram(
+    'bakery_db_time_per_request_seconds', 'Time one request spent in database queries', ['view'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+CACHE_EVENTS = Counter(
+    'bakery_cache_events_total', 'get_or_compute lookups by outcome', ['namespace', 'event'],
+)
+CHECKOUTS = Counter(
+    'bakery_checkouts_total', 'Checkout attempts by outcome', ['outcome'],
+)
+CART_OPERATIONS = Counter(
+    'bakery_cart_operations_total', 'Cart changes', ['operation'],
+)
+EVENT_STREAMS = Gauge(
+    'bakery_event_streams_open', 'Open order event streams and long polls', multiprocess_mode='livesum',
+)
+
+
+def record_cache(namespace, event):
+    CACHE_EVENTS.labels(namespace, event).inc()
+
+
+def record_checkout(outcome):
+    CHECKOUTS.labels(outcome).inc()
+
+
+def record_cart(operation):
+    CART_OPERATIONS.labels(operation).inc()
+
+
+def _view_label(request, response):
+    match = getattr(request, 'resolver_match', None)
+    if match is not None:
+        return match.view_name
+    if response.get('X-Page-Cache') == 'hit':
+        return 'page_cache'
+    return 'unmatched'
+
+
+class MetricsMiddleware:
+    """Count and time every request; first in MIDDLEWARE after static files"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path == '/metrics':
+            return self.get_response(request)
+        with timed() as timings, IN_PROGRESS.track_inprogress():
+            response = self.get_response(request)
+            self.observe(request, response, timings)
+        return response
+
+    async def __acall__(self, request):
+        if request.path == '/metrics':
+            return await self.get_response(request)
+        with timed() as timings, IN_PROGRESS.track_inprogress():
+            response = await self.get_response(request)
+            self.observe(request, response, timings)
+        return response
+
+    def observe(self, request, response, timings):
+        view = _view_label(request, response)
+        REQUESTS.labels(view, request.method, str(response.status_code)).inc()
+        LATENCY.labels(view, request.method).observe(time.perf_counter() - timings.started)
+        DB_QUERIES.labels(view).observe(timings.queries)
+        DB_TIME.labels(view).observe(timings.db)
+
+
+class JobCollector:
+    """Jobs by task and status, counted in the database at scrape time"""
+
+    def describe(self):
+        # Registering must not query: metrics is imported during django.setup(),
+        # before `migrate` has created the Job table
+        return []
+
+    def collect(self):
+        from django.db.models import Count
+
+        from .models import Job
+
+        family = GaugeMetricFamily('bakery_jobs', 'Background jobs by status', labels=['task', 'status'])
+        for row in Job.objects.values('task', 'status').annotate(count=Count('pk')).order_by():
+            family.add_metric([row['task'], row['status']], row['count'])
+        yield family
+
+
+_scrape_registry = CollectorRegistry(auto_describe=True)
+_scrape_registry.register(JobCollector())
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseForbidden('Set METRICS_TOKEN to enable /metrics')
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(
+        generate_latest(registry) + generate_latest(_scrape_registry), content_type=CONTENT_TYPE_LATEST,
+    )
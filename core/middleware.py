@@ -2,27 +2,69 @@
 Custom Middleware for the Bakery Application
 """
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that also runs natively in an async (ASGI) middleware chain.
+    The stock middleware is sync-only, which under ASGI would hold a thread
+    for the whole of every request passing through it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
 
 class IPTrackingMiddleware:
     """
     Middleware to attach client IP address to the request object.
     This makes it easy to access the IP from any view.
     """
+
+    sync_capable = True
+    async_capable = True
     
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
     
     def __call__(self, request):
-        # Get client IP, handling proxies (like nginx)
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            # X-Forwarded-For can contain multiple IPs; take the first one
-            ip = x_forwarded_for.split(',')[0].strip()
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.track(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self.track(request)
+        return await self.get_response(request)
+
+    def track(self, request):
+        from .spam_protection import get_client_ip
+
+        # Client IP behind nginx; see get_client_ip for which hop is used
+        ip = get_client_ip(request)
+
         # Attach IP to request for easy access
         request.client_ip = ip
-        
-        response = self.get_response(request)
-        return response
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.9 on 2026-10-19 08:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlockedUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(blank=True, db_index=True, max_length=20)),
+                ('ip_address', models.GenericIPAddressField(blank=True, db_index=True, null=True)),
+                ('reason', models.CharField(choices=[('cancelled', 'Too many cancelled orders'), ('spam', 'Spam behavior'), ('manual', 'Manually blocked by admin')], default='manual', max_length=20)),
+                ('notes', models.TextField(blank=True)),
+                ('blocked_at', models.DateTimeField(auto_now_add=True)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'Blocked User',
+                'verbose_name_plural': 'Blocked Users',
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderRateLimit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(db_index=True, max_length=20)),
+                ('ip_address', models.GenericIPAddressField(blank=True, db_index=True, null=True)),
+                ('date', models.DateField(db_index=True)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('last_order_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Order Rate Limit',
+                'verbose_name_plural': 'Order Rate Limits',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='orderratelimit',
+            unique_together={('phone', 'date')},
+        ),
+        migrations.AddField(
+            model_name='blockeduser',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.9 on 2026-10-19 08:05
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_counts(apps, schema_editor):
+    Category = apps.get_model('core', 'Category')
+    Product = apps.get_model('core', 'Product')
+    counts = Product.objects.order_by().values('category_id').annotate(
+        total=Count('id'),
+        available=Count('id', filter=Q(is_available=True)),
+    )
+    for row in counts:
+        Category.objects.filter(pk=row['category_id']).update(
+            product_count=row['total'],
+            available_product_count=row['available'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_productdailysales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='available_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.9 on 2026-10-19 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_background_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=16)),
+                ('sql', models.TextField(help_text='Normalized: literals and IN lists replaced')),
+                ('params_hash', models.CharField(blank=True, max_length=16)),
+                ('view', models.CharField(blank=True, help_text='URL name of the view, for web requests', max_length=200)),
+                ('origin', models.CharField(help_text='Project line and/or template that ran it', max_length=300)),
+                ('database', models.CharField(max_length=50)),
+                ('duration_ms', models.FloatField()),
+                ('plan', models.TextField(blank=True)),
+                ('captured_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['captured_at'], name='slowquery_captured_idx'), models.Index(fields=['fingerprint', '-captured_at'], name='slowquery_fingerprint_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.9 on 2026-10-19 08:56
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def populate_names(apps, schema_editor):
+    Product = apps.get_model('core', 'Product')
+    ProductDailySales = apps.get_model('core', 'ProductDailySales')
+    product = Product.objects.filter(pk=OuterRef('product_id'))
+    ProductDailySales.objects.update(
+        product_name=Subquery(product.values('name')[:1]),
+        category_name=Subquery(product.values('category__name')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_slow_query_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productdailysales',
+            name='category_name',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='productdailysales',
+            name='product_name',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='productdailysales',
+            name='product',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_sales', to='core.product'),
+        ),
+        migrations.RunPython(populate_names, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
 from django.urls import reverse
+from django.utils import timezone
 
 
 class Category(models.Model):
@@ -10,6 +11,9 @@ class Category(models.Model):
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
     description = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
+    # Denormalized counters, kept in sync by core.signals (repair: manage.py refresh_category_counts)
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+    available_product_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -17,9 +21,20 @@ class Category(models.Model):
         verbose_name_plural = 'Categories'
         ordering = ['name']
 
+    COUNTER_FIELDS = ('product_count', 'available_product_count')
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Never write back (possibly stale) counters when editing a category
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('core:category_detail', kwargs={'slug': self.slug})
 
@@ -108,6 +123,10 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Per-customer order history, newest first
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.order_number}"
@@ -129,6 +148,53 @@ class OrderItem(models.Model):
         return self.price * self.quantity
 
 
+class ProductDailySales(models.Model):
+    """Per-product, per-day sales totals, maintained as orders are placed"""
+    # Deleting a product keeps its sales in the reports, under the stored names
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='daily_sales')
+    product_name = models.CharField(max_length=200, blank=True)
+    category_name = models.CharField(max_length=100, blank=True)
+    date = models.DateField()
+    units_sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Product daily sales'
+        unique_together = ['product', 'date']
+        indexes = [
+            models.Index(fields=['date'], name='daily_sales_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} on {self.date}"
+
+
+class ProductCopurchase(models.Model):
+    """How many orders contained both products (stored in both directions)"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='copurchases')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['product', 'other']
+
+    def __str__(self):
+        return f"{self.product_id} + {self.other_id}: {self.count}"
+
+
+class ProductRecommendation(models.Model):
+    """Precomputed top-K recommended product ids, best first"""
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name='recommendation'
+    )
+    product_ids = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Recommendations for {self.product_id}"
+
+
 class ContactMessage(models.Model):
     """Contact form submissions"""
     name = models.CharField(max_length=100)
@@ -136,10 +202,85 @@ class ContactMessage(models.Model):
     subject = models.CharField(max_length=200)
     message = models.TextField()
     is_read = models.BooleanField(default=False)
+    is_archived = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Columns needed by inbox listings; leaves the message body out
+    LIST_FIELDS = ('id', 'name', 'email', 'subject', 'is_read', 'is_archived', 'created_at')
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_archived', '-created_at'], name='contact_inbox_idx'),
+            # Small partial index: only unread, unarchived messages
+            models.Index(
+                fields=['-created_at'],
+                name='contact_unread_idx',
+                condition=models.Q(is_read=False, is_archived=False),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.subject}"
+
+
+class Job(models.Model):
+    """A unit of background work, run by `manage.py run_workers` (see core/jobs.py)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('dead', 'Dead'),
+    ]
+
+    task = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict)
+    queue = models.CharField(max_length=50, default='default')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    # Timing: queued -> first started, and the last attempt's run time
+    wait_ms = models.FloatField(null=True, blank=True)
+    run_ms = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest due jobs of their queues
+            models.Index(
+                fields=['queue', 'run_at'],
+                name='job_due_idx',
+                condition=models.Q(status='queued'),
+            ),
+            models.Index(fields=['status', 'finished_at'], name='job_status_finished_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+class SlowQuery(models.Model):
+    """A query that took longer than SLOW_QUERY_MS (see core/slow_queries.py)"""
+    fingerprint = models.CharField(max_length=16)
+    sql = models.TextField(help_text='Normalized: literals and IN lists replaced')
+    params_hash = models.CharField(max_length=16, blank=True)
+    view = models.CharField(max_length=200, blank=True, help_text='URL name of the view, for web requests')
+    origin = models.CharField(max_length=300, help_text='Project line and/or template that ran it')
+    database = models.CharField(max_length=50)
+    duration_ms = models.FloatField()
+    plan = models.TextField(blank=True)
+    captured_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['captured_at'], name='slowquery_captured_idx'),
+            models.Index(fields=['fingerprint', '-captured_at'], name='slowquery_fingerprint_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.duration_ms:.0f} ms: {self.sql[:80]}"
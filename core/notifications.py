@@ -0,0 +1,82 @@
+"""
+Customer notification emails
+
+Queued as background jobs (core/jobs.py) when an order is placed and when
+its status changes, so checkout and the admin never wait on the mail
+server. A worker sends each batch of email jobs over one mail connection
+(`mail_connection`) rather than logging in to the SMTP server per message.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+
+from .jobs import job
+from .models import Order
+
+_local = threading.local()
+
+
+@contextmanager
+def mail_connection():
+    """Send every email of the block, in this thread, over one connection"""
+    connection = get_connection()
+    connection.open()
+    _local.connection = connection
+    try:
+        yield connection
+    finally:
+        _local.connection = None
+        connection.close()
+
+
+def send(message):
+    """Send over the batch's connection if there is one, else a connection of its own"""
+    connection = getattr(_local, 'connection', None)
+    if connection is not None:
+        # Reconnects if an earlier failure dropped the connection
+        connection.open()
+        message.connection = connection
+    try:
+        message.send()
+    except Exception:
+        if connection is not None:
+            connection.close()
+        raise
+
+
+def order_message(order, subject, template):
+    return EmailMessage(
+        subject=subject,
+        body=render_to_string(template, {'order': order}),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[order.user.email],
+    )
+
+
+def _get_order(order_id):
+    return Order.objects.select_related('user').filter(pk=order_id).first()
+
+
+@job(queue='email', around=mail_connection)
+def send_order_confirmation(order_id):
+    order = _get_order(order_id)
+    if order is None or not order.user.email:
+        return
+    send(order_message(
+        order, f'Order {order.order_number} received', 'emails/order_confirmation.txt',
+    ))
+
+
+@job(queue='email', around=mail_connection)
+def send_order_status(order_id, status):
+    order = _get_order(order_id)
+    # A later change queued its own email
+    if order is None or order.status != status or not order.user.email:
+        return
+    send(order_message(
+        order, f'Order {order.order_number}: {order.get_status_display()}', 'emails/order_status.txt',
+    ))
@@ -0,0 +1,164 @@
+"""
+Anonymous Full-Page Cache
+
+Storefront pages requested by a visitor with no session (so not logged in,
+no cart, no flash messages) are the same for everyone, so the rendered
+response is cached and served by PageCacheMiddleware before sessions, auth
+or any view code run.
+
+Invalidation uses surrogate keys ("tags"): views tag their page with what
+it shows (`product:12`, `category:3`, `listing`, ...), and every tag has a
+version in the cache. A cached page remembers the tag versions it was
+rendered with and is discarded if any has moved on, so purging a tag
+drops exactly the pages that showed it. Signals purge the right tags when
+products or categories change.
+
+The same responses carry X-Accel-Expires and Surrogate-Key for nginx's
+proxy_cache, which holds them for a short PAGE_CACHE_NGINX_TIMEOUT
+(stock nginx can't purge by key, so it only absorbs bursts).
+
+A cached page carries the CSRF token of the request that rendered it and
+an empty cart badge, so base.html asks /session/state/ for a fresh token
+and the badge count whenever it was rendered for the cache (a small
+client-side hole).
+"""
+
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+from .catalog import bump_version, get_version
+
+
+# URL names (core namespace) whose anonymous responses are cached
+CACHEABLE_VIEWS = {'home', 'products', 'product_detail', 'category_detail', 'about'}
+
+PAGE_KEY_PREFIX = 'pagecache:page:'
+TAG_KEY_PREFIX = 'pagecache:tag:'
+
+
+def _tag_key(tag):
+    return f'{TAG_KEY_PREFIX}{tag}'
+
+
+def tag_page(request, *tags):
+    """Record surrogate keys for the page being rendered"""
+    if getattr(request, 'page_cache', False):
+        request.page_cache_tags.update(tags)
+
+
+def purge(*tags):
+    """Invalidate every cached page tagged with any of the given tags, on commit"""
+    keys = {_tag_key(tag) for tag in tags}
+
+    def bump():
+        for key in keys:
+            bump_version(key)
+
+    transaction.on_commit(bump)
+
+
+def is_cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.COOKIES.get(settings.SESSION_COOKIE_NAME) or request.COOKIES.get('messages'):
+        return False
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return False
+    return match.namespace == 'core' and match.url_name in CACHEABLE_VIEWS
+
+
+def _page_key(request):
+    url = request.build_absolute_uri()
+    return PAGE_KEY_PREFIX + hashlib.md5(url.encode()).hexdigest()
+
+
+class PageCacheMiddleware:
+    """
+    Serve and store anonymous storefront pages. Must come before
+    SessionMiddleware so hits skip sessions and auth entirely.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.page_cache = is_cacheable_request(request)
+        if not request.page_cache:
+            return self.get_response(request)
+
+        key = _page_key(request)
+        response = self._fetch(key)
+        if response is not None:
+            return self._hit(request, response)
+
+        # Every page can be dropped at once when a change's scope is unknown
+        request.page_cache_tags = {'catalog'}
+        response = self.get_response(request)
+        if self._store(key, request, response):
+            response['X-Page-Cache'] = 'miss'
+        return response
+
+    async def __acall__(self, request):
+        request.page_cache = is_cacheable_request(request)
+        if not request.page_cache:
+            return await self.get_response(request)
+
+        key = _page_key(request)
+        response = await sync_to_async(self._fetch)(key)
+        if response is not None:
+            return self._hit(request, response)
+
+        request.page_cache_tags = {'catalog'}
+        response = await self.get_response(request)
+        if await sync_to_async(self._store)(key, request, response):
+            response['X-Page-Cache'] = 'miss'
+        return response
+
+    def _hit(self, request, response):
+        response['X-Page-Cache'] = 'hit'
+        conditional = get_conditional_response(request, etag=response.get('ETag'))
+        if conditional is not None:
+            return conditional
+        return response
+
+    def _fetch(self, key):
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        tag_versions, response = entry
+        current = cache.get_many([_tag_key(tag) for tag in tag_versions])
+        for tag, version in tag_versions.items():
+            if current.get(_tag_key(tag)) != version:
+                return None
+        return response
+
+    def _store(self, key, request, response):
+        if response.status_code != 200 or response.streaming:
+            return False
+        # The renderer's CSRF cookie is dropped: pages fetch their own token
+        response.cookies.pop(settings.CSRF_COOKIE_NAME, None)
+        if response.cookies:
+            return False
+
+        tags = sorted(request.page_cache_tags)
+        response['Surrogate-Key'] = ' '.join(tags)
+        response['X-Accel-Expires'] = str(settings.PAGE_CACHE_NGINX_TIMEOUT)
+        patch_vary_headers(response, ['Cookie'])
+        tag_versions = {tag: get_version(_tag_key(tag)) for tag in tags}
+        cache.set(key, (tag_versions, response), settings.PAGE_CACHE_TIMEOUT)
+        return True
@@ -0,0 +1,68 @@
+"""
+Set-based bulk operations on products
+
+Each action is a single UPDATE over a queryset (no per-row saves), followed
+by one catalog_bulk_changed signal for the whole change.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .models import Product
+from .signals import catalog_bulk_changed
+
+
+BULK_ACTION_CHOICES = [
+    ('toggle_available', 'Toggle availability'),
+    ('toggle_featured', 'Toggle featured'),
+    ('adjust_price', 'Change price by %'),
+    ('restock', 'Restock (add quantity)'),
+]
+
+
+def _price_change(percent):
+    factor = Decimal(1) + Decimal(percent) / Decimal(100)
+    return Round(
+        ExpressionWrapper(F('price') * factor, output_field=DecimalField(max_digits=12, decimal_places=4)),
+        2,
+    )
+
+
+def apply_bulk_action(queryset, action, percent=None, quantity=None):
+    """
+    Apply a bulk action to every product in queryset with one UPDATE.
+    Returns the number of products changed.
+    """
+    if action == 'toggle_available':
+        changes = {'is_available': ~F('is_available')}
+    elif action == 'toggle_featured':
+        changes = {'is_featured': ~F('is_featured')}
+    elif action == 'adjust_price':
+        if percent is None:
+            raise ValueError('adjust_price needs a percentage')
+        changes = {'price': _price_change(percent)}
+    elif action == 'restock':
+        if not quantity or quantity < 0:
+            raise ValueError('restock needs a positive quantity')
+        changes = {'stock': F('stock') + quantity}
+    else:
+        raise ValueError(f"Unknown bulk action: {action}")
+
+    changes['updated_at'] = timezone.now()
+
+    with transaction.atomic():
+        # Collect ids first so listeners know exactly what changed
+        product_ids = list(queryset.order_by().values_list('id', flat=True))
+        if not product_ids:
+            return 0
+        updated = queryset.order_by().update(**changes)
+        catalog_bulk_changed.send(
+            sender=Product,
+            product_ids=product_ids,
+            fields=sorted(changes),
+        )
+    return updated
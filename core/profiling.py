@@ -0,0 +1,364 @@
+"""
+On-demand request profiling
+
+A profiled request leaves a profile in PROFILE_DIR, browsable under
+Profiles in the admin panel:
+- `<id>.json`    what was profiled: path, view, user, status, duration, mode
+- `<id>.folded`  sampled call stacks, one "outer;...;inner count" line per
+                 stack, drawn as a flame graph
+- `<id>.prof`    cProfile data for pstats or snakeviz (cProfile mode only)
+
+Requests are profiled when:
+- an admin opens a link made on the Profiles page. The link carries
+  `?__profile=<token>`, signed for that admin and valid for
+  PROFILE_LINK_MAX_AGE seconds. The admin picks cProfile (every call,
+  exact counts, but the request runs 2-3x slower) or the sampler.
+- a random PROFILE_SAMPLE_RATE of all requests, always with the sampler:
+  a thread that records the request thread's stack every
+  PROFILE_SAMPLE_INTERVAL seconds, cheap enough for production.
+
+Only the newest PROFILE_KEEP profiles are kept. A request that isn't
+profiled costs a substring check on its query string, plus a random()
+when PROFILE_SAMPLE_RATE is set.
+
+Under ASGI, the request's async code runs on the event loop thread and its
+sync code (sync views and middleware, and the ORM calls of async views) in
+an executor thread of its own. The sampler follows both threads, counting
+a stack only while it is inside the request's middleware chain or that
+executor's work, so the idle loop isn't sampled. Other requests' async code
+runs on the same loop and shows up too, and cProfile is replaced by the
+sampler.
+"""
+
+import cProfile
+import io
+import json
+import pstats
+import random
+import re
+import secrets
+import sys
+import sysconfig
+import threading
+import time
+import zlib
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+from asgiref.sync import SyncToAsync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+PROFILE_PARAM = '__profile'
+SIGNING_SALT = 'core.profiling'
+MODES = ('sample', 'cprofile')
+
+_PROFILE_ID = re.compile(r'^[\w-]+$')
+_PROJECT_DIR = str(Path(settings.BASE_DIR).resolve()) + '/'
+_STDLIB_DIR = sysconfig.get_paths()['stdlib'] + '/'
+
+_current = ContextVar('request_profile', default=None)
+
+
+def profile_link(user, path, mode='sample'):
+    """path with a signed query parameter that profiles it for user"""
+    token = signing.dumps({'user': user.pk, 'mode': mode}, salt=SIGNING_SALT)
+    return f"{path}{'&' if '?' in path else '?'}{PROFILE_PARAM}={token}"
+
+
+def _is_admin(user):
+    return user.is_authenticated and (user.is_admin_user or user.is_superuser)
+
+
+def _link_mode(request, user_is_admin):
+    """The mode of a valid profile link on this request, else None"""
+    try:
+        data = signing.loads(
+            request.GET.get(PROFILE_PARAM, ''), salt=SIGNING_SALT, max_age=settings.PROFILE_LINK_MAX_AGE,
+        )
+    except signing.BadSignature:
+        return None
+    if data.get('user') != request.user.pk or not user_is_admin or data.get('mode') not in MODES:
+        return None
+    return data['mode']
+
+
+# Call stacks
+
+_frame_names = {}
+
+
+def _frame_name(code):
+    name = _frame_names.get(code)
+    if name is None:
+        filename = code.co_filename
+        if filename.startswith(_PROJECT_DIR):
+            filename = filename[len(_PROJECT_DIR):]
+        elif 'site-packages/' in filename:
+            filename = filename.split('site-packages/', 1)[1]
+        elif filename.startswith(_STDLIB_DIR):
+            filename = filename[len(_STDLIB_DIR):]
+        name = _frame_names[code] = f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ',')
+    return name
+
+
+class StackSampler:
+    """Counts threads' call stacks below the root codes, sampled from a background thread"""
+
+    def __init__(self, thread_id, interval, root_codes=()):
+        self.thread_ids = {thread_id}
+        self.interval = interval
+        self.root_codes = set(root_codes)
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def follow(self, thread_id):
+        """Sample thread_id as well"""
+        self.thread_ids = self.thread_ids | {thread_id}
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in self.thread_ids:
+                self._sample(frames.get(thread_id))
+
+    def _sample(self, frame):
+        names = []
+        # Walk out to a root; the server's frames above it are noise
+        while frame is not None and frame.f_code not in self.root_codes:
+            names.append(_frame_name(frame.f_code))
+            frame = frame.f_back
+        # No root: the thread was idle, or busy with something else
+        if names and frame is not None:
+            self.stacks[';'.join(reversed(names))] += 1
+
+
+class RequestProfile:
+    def __init__(self, mode, trigger, root_codes):
+        self.mode = mode
+        self.trigger = trigger
+        self.sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL, root_codes)
+        self.profiler = cProfile.Profile() if mode == 'cprofile' else None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.sampler.start()
+        if self.profiler:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.profiler:
+            self.profiler.disable()
+        self.sampler.stop()
+        self.duration = time.perf_counter() - self.started
+
+    def save(self, request, response):
+        """Write the profile's files and drop the oldest beyond PROFILE_KEEP"""
+        directory = profile_dir()
+        profile_id = f'{timezone.now():%Y%m%d-%H%M%S}-{secrets.token_hex(3)}'
+        folded = ''.join(f'{stack} {count}\n' for stack, count in self.sampler.stacks.most_common())
+        (directory / f'{profile_id}.folded').write_text(folded)
+        if self.profiler:
+            self.profiler.dump_stats(str(directory / f'{profile_id}.prof'))
+
+        params = request.GET.copy()
+        params.pop(PROFILE_PARAM, None)
+        match = getattr(request, 'resolver_match', None)
+        user = getattr(request, 'user', None)
+        meta = {
+            'id': profile_id,
+            'created': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.path + (f'?{params.urlencode()}' if params else ''),
+            'view': match.view_name if match else None,
+            'user': user.email if user is not None and user.is_authenticated else None,
+            'status': response.status_code,
+            'duration_ms': round(self.duration * 1000, 1),
+            'mode': self.mode,
+            'trigger': self.trigger,
+            'samples': sum(self.sampler.stacks.values()),
+        }
+        # Written last: a profile is listed once its metadata exists
+        (directory / f'{profile_id}.json').write_text(json.dumps(meta))
+        prune()
+
+
+class ProfilingMiddleware:
+    """Profile requests that carry an admin's profile link, or a random sample; after auth"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode, trigger = None, None
+        if PROFILE_PARAM in request.META.get('QUERY_STRING', ''):
+            mode, trigger = _link_mode(request, _is_admin(request.user)), 'link'
+        if mode is None and self.sampled():
+            mode, trigger = 'sample', 'sample'
+        if mode is None:
+            return self.get_response(request)
+
+        profile = RequestProfile(mode, trigger, {ProfilingMiddleware.__call__.__code__})
+        token = _current.set(profile)
+        profile.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.stop()
+            _current.reset(token)
+        profile.save(request, response)
+        return response
+
+    async def __acall__(self, request):
+        mode, trigger = None, None
+        if PROFILE_PARAM in request.META.get('QUERY_STRING', ''):
+            user_is_admin = await sync_to_async(_is_admin)(request.user)
+            # cProfile would trace every coroutine on the loop; sample instead
+            mode, trigger = _link_mode(request, user_is_admin) and 'sample', 'link'
+        if mode is None and self.sampled():
+            mode, trigger = 'sample', 'sample'
+        if mode is None:
+            return await self.get_response(request)
+
+        # The request's sync code runs in its own executor thread, under thread_handler
+        profile = RequestProfile(
+            mode, trigger, {ProfilingMiddleware.__acall__.__code__, SyncToAsync.thread_handler.__code__},
+        )
+        token = _current.set(profile)
+        profile.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profile.stop()
+            _current.reset(token)
+        await sync_to_async(profile.save)(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Under ASGI this runs in the thread the request's sync code runs in
+        profile = _current.get()
+        if profile is not None:
+            profile.sampler.follow(threading.get_ident())
+
+    @staticmethod
+    def sampled():
+        rate = settings.PROFILE_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+
+# Stored profiles
+
+def profile_dir():
+    directory = Path(settings.PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def prune():
+    metas = sorted(profile_dir().glob('*.json'), reverse=True)
+    for meta in metas[settings.PROFILE_KEEP:]:
+        for path in meta.parent.glob(f'{meta.stem}.*'):
+            path.unlink(missing_ok=True)
+
+
+def _read_meta(path):
+    meta = json.loads(path.read_text())
+    meta['created'] = datetime.fromisoformat(meta['created'])
+    return meta
+
+
+def list_profiles():
+    """Metadata of the stored profiles, newest first"""
+    profiles = []
+    for path in sorted(profile_dir().glob('*.json'), reverse=True):
+        try:
+            profiles.append(_read_meta(path))
+        except (OSError, ValueError):
+            # Pruned or half-written meanwhile
+            continue
+    return profiles
+
+
+def load_profile(profile_id):
+    """A profile's metadata, or None"""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    try:
+        return _read_meta(profile_dir() / f'{profile_id}.json')
+    except (OSError, ValueError):
+        return None
+
+
+def pstats_path(profile_id):
+    """The profile's cProfile file, or None"""
+    path = profile_dir() / f'{profile_id}.prof'
+    return path if _PROFILE_ID.match(profile_id) and path.exists() else None
+
+
+def pstats_text(profile_id, sort='cumulative', limit=40):
+    path = pstats_path(profile_id)
+    if path is None:
+        return None
+    stream = io.StringIO()
+    stats = pstats.Stats(str(path), stream=stream)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def flame_graph(profile_id, min_width=0.1):
+    """
+    Rows of an icicle graph (callers above callees) for the profile's
+    sampled stacks: {'name', 'samples', 'depth', 'left', 'width', 'hue'},
+    left and width in percent. Frames narrower than min_width are left out.
+    """
+    root = {'children': {}, 'samples': 0}
+    try:
+        lines = (profile_dir() / f'{profile_id}.folded').read_text().splitlines()
+    except OSError:
+        lines = []
+    for line in lines:
+        stack, _, count = line.rpartition(' ')
+        node = root
+        root['samples'] += int(count)
+        for name in stack.split(';'):
+            node = node['children'].setdefault(name, {'children': {}, 'samples': 0})
+            node['samples'] += int(count)
+
+    total = root['samples'] or 1
+    rows = []
+    pending = [(root, 0, 0.0)]
+    while pending:
+        node, depth, left = pending.pop()
+        for name, child in sorted(node['children'].items()):
+            width = child['samples'] * 100 / total
+            if width >= min_width:
+                rows.append({
+                    'name': name,
+                    'samples': child['samples'],
+                    'depth': depth,
+                    'left': round(left, 3),
+                    'width': round(width, 3),
+                    # Same file, same colour
+                    'hue': zlib.crc32(name.partition('(')[2].encode()) % 60,
+                })
+                pending.append((child, depth + 1, left))
+            left += width
+    return rows
@@ -0,0 +1,226 @@
+"""
+Product Recommendations
+
+"You may also like" lists are precomputed rather than queried per page view:
+- ProductCopurchase holds sparse pair counts: how many orders contained
+  both products. `manage.py build_recommendations` rebuilds it from
+  OrderItem, and placed/cancelled orders adjust it incrementally, in a
+  background job (core/jobs.py) with one upsert per batch of pairs.
+- Each product's candidates are scored by co-purchase count blended with
+  the recent popularity of products in the same category, and the top
+  RECOMMENDATION_SIZE ids are stored on ProductRecommendation.
+- Product detail reads one row by primary key (or a cache hit) and falls
+  back to same-category products when nothing has been computed yet.
+"""
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import groupby, permutations
+
+from django.db import connections, router, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .caching import get_or_compute
+from .catalog import CATALOG_VERSION_KEY, RECOMMENDATIONS_VERSION_KEY, invalidate_version
+from .jobs import job
+from .models import OrderItem, Product, ProductCopurchase, ProductDailySales, ProductRecommendation
+from .page_cache import purge
+
+
+RECOMMENDATION_SIZE = 8   # ids stored per product; spares cover unavailable items
+DISPLAY_COUNT = 4
+MAX_BASKET_SIZE = 50      # pairs grow quadratically; huge orders are not signal
+POPULARITY_DAYS = 90
+CATEGORY_WEIGHT = 0.5     # weight of same-category popularity vs co-purchases
+RECOMMENDATION_CACHE_TIMEOUT = 60 * 60
+UPSERT_BATCH_SIZE = 500   # pairs per INSERT ... ON CONFLICT statement
+
+
+def _score(copurchases, popularity, category_id, categories, exclude_id):
+    """
+    Blend co-purchase counts with same-category popularity and return the
+    best RECOMMENDATION_SIZE product ids. Both signals are scaled to 0..1.
+    """
+    scores = defaultdict(float)
+    if copurchases:
+        top = max(copurchases.values())
+        for other_id, count in copurchases.items():
+            scores[other_id] += count / top
+    same_category = popularity.get(category_id, {})
+    if same_category:
+        top = max(same_category.values()) or 1
+        for other_id, units in same_category.items():
+            scores[other_id] += CATEGORY_WEIGHT * units / top
+    scores.pop(exclude_id, None)
+    ranked = sorted(
+        scores,
+        # Ties go to same-category products, then to the lower id for stable output
+        key=lambda other_id: (-scores[other_id], categories.get(other_id) != category_id, other_id),
+    )
+    return ranked[:RECOMMENDATION_SIZE]
+
+
+def _category_popularity(category_ids=None):
+    """{category_id: {product_id: units sold}} over the popularity window"""
+    since = timezone.localdate() - timedelta(days=POPULARITY_DAYS - 1)
+    rows = ProductDailySales.objects.filter(date__gte=since, product__is_available=True)
+    if category_ids is not None:
+        rows = rows.filter(product__category_id__in=category_ids)
+    popularity = defaultdict(dict)
+    for row in rows.values('product_id', category_id=F('product__category_id')).annotate(units=Sum('units_sold')):
+        if row['units'] > 0:
+            popularity[row['category_id']][row['product_id']] = row['units']
+    return popularity
+
+
+def count_copurchases():
+    """Sparse {product_id: Counter(other_id: orders)} over all non-cancelled orders"""
+    items = (
+        OrderItem.objects.filter(product__isnull=False)
+        .exclude(order__status='cancelled')
+        .values_list('order_id', 'product_id')
+        .order_by('order_id')
+    )
+    pairs = defaultdict(Counter)
+    for _, rows in groupby(items.iterator(chunk_size=5000), key=lambda row: row[0]):
+        basket = {product_id for _, product_id in rows}
+        if len(basket) > MAX_BASKET_SIZE:
+            continue
+        for product_id, other_id in permutations(basket, 2):
+            pairs[product_id][other_id] += 1
+    return pairs
+
+
+@transaction.atomic
+def build_recommendations():
+    """
+    Rebuild co-purchase counts and every product's recommendation list.
+    Returns (pair_count, product_count).
+    """
+    pairs = count_copurchases()
+    ProductCopurchase.objects.all().delete()
+    ProductCopurchase.objects.bulk_create(
+        (
+            ProductCopurchase(product_id=product_id, other_id=other_id, count=count)
+            for product_id, others in pairs.items()
+            for other_id, count in others.items()
+        ),
+        batch_size=1000,
+    )
+
+    categories = dict(Product.objects.values_list('id', 'category_id'))
+    popularity = _category_popularity()
+    recommendations = [
+        ProductRecommendation(
+            product_id=product_id,
+            product_ids=_score(pairs.get(product_id), popularity, category_id, categories, product_id),
+        )
+        for product_id, category_id in categories.items()
+    ]
+    ProductRecommendation.objects.all().delete()
+    ProductRecommendation.objects.bulk_create(recommendations, batch_size=1000)
+    invalidate_version(RECOMMENDATIONS_VERSION_KEY)
+    purge('catalog')
+    return sum(len(others) for others in pairs.values()), len(recommendations)
+
+
+@job(queue='recommendations')
+def record_order_copurchases(order_id, sign=1):
+    """
+    Add an order's product pairs to the co-purchase counts (sign=-1 removes
+    them when an order is cancelled) and refresh the affected products.
+    Queued with record_order_copurchases.delay(order_id=..., sign=...).
+    """
+    basket = set(
+        OrderItem.objects.filter(order_id=order_id, product__isnull=False).values_list('product_id', flat=True)
+    )
+    if len(basket) < 2 or len(basket) > MAX_BASKET_SIZE:
+        return
+    with transaction.atomic():
+        _add_copurchases(basket, sign)
+        refresh_recommendations(basket)
+
+
+def _add_copurchases(basket, delta):
+    """Add delta to the count of every ordered pair in basket"""
+    if delta < 0:
+        ProductCopurchase.objects.filter(product_id__in=basket, other_id__in=basket).exclude(
+            product_id=F('other_id'),
+        ).update(count=F('count') + delta)
+        return
+
+    # Upsert: one statement per batch rather than an UPDATE (and maybe an
+    # INSERT) per pair. Sorted, so concurrent orders lock rows in the same order.
+    connection = connections[router.db_for_write(ProductCopurchase)]
+    quote = connection.ops.quote_name
+    table, count = quote(ProductCopurchase._meta.db_table), quote('count')
+    pairs = list(permutations(sorted(basket), 2))
+    with connection.cursor() as cursor:
+        for start in range(0, len(pairs), UPSERT_BATCH_SIZE):
+            batch = pairs[start:start + UPSERT_BATCH_SIZE]
+            cursor.execute(
+                f"INSERT INTO {table} ({quote('product_id')}, {quote('other_id')}, {count}) "
+                f"VALUES {', '.join(['(%s, %s, %s)'] * len(batch))} "
+                f"ON CONFLICT ({quote('product_id')}, {quote('other_id')}) "
+                f"DO UPDATE SET {count} = {table}.{count} + EXCLUDED.{count}",
+                [value for product_id, other_id in batch for value in (product_id, other_id, delta)],
+            )
+
+
+def refresh_recommendations(product_ids):
+    """Recompute the stored lists of a few products from their pair counts"""
+    categories = dict(Product.objects.filter(pk__in=product_ids).values_list('id', 'category_id'))
+    popularity = _category_popularity(set(categories.values()))
+    # Category lookups for tie-breaking cover the candidates, not just the basket
+    candidates = {product_id: Counter() for product_id in categories}
+    for row in ProductCopurchase.objects.filter(product_id__in=categories, count__gt=0).values(
+        'product_id', 'other_id', 'count', other_category_id=F('other__category_id')
+    ):
+        candidates[row['product_id']][row['other_id']] = row['count']
+        categories.setdefault(row['other_id'], row['other_category_id'])
+
+    ProductRecommendation.objects.bulk_create(
+        [
+            ProductRecommendation(
+                product_id=product_id,
+                product_ids=_score(others, popularity, categories[product_id], categories, product_id),
+            )
+            for product_id, others in candidates.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=['product_ids', 'updated_at'],
+    )
+    invalidate_version(RECOMMENDATIONS_VERSION_KEY)
+    purge(*(f'product:{product_id}' for product_id in candidates))
+
+
+def recommended_products(product, limit=DISPLAY_COUNT):
+    """Recommended, available products for a product detail page"""
+    def load():
+        ids = (
+            ProductRecommendation.objects.filter(pk=product.pk)
+            .values_list('product_ids', flat=True)
+            .first()
+        )
+        if ids:
+            found = Product.objects.filter(pk__in=ids, is_available=True).in_bulk()
+            products = [found[pk] for pk in ids if pk in found]
+        else:
+            products = []
+        if len(products) < limit:
+            # Not computed yet (new product or no sales): top up from the category
+            products += list(
+                Product.objects.filter(category_id=product.category_id, is_available=True)
+                .exclude(pk__in=[product.pk] + [p.pk for p in products])[:limit - len(products)]
+            )
+        return products[:limit]
+
+    return get_or_compute(
+        f'recommendations:{product.pk}:{limit}',
+        load,
+        RECOMMENDATION_CACHE_TIMEOUT,
+        versions=[CATALOG_VERSION_KEY, RECOMMENDATIONS_VERSION_KEY],
+        read_primary=True,
+    )
@@ -0,0 +1,201 @@
+"""
+Sales Reporting
+
+Product performance is read from ProductDailySales, a per-product-per-day
+aggregate that is updated incrementally as orders are placed or cancelled,
+so reports never scan OrderItem. Report results are cached until the next
+order changes the sales version.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .caching import get_or_compute
+from .catalog import SALES_VERSION_KEY, invalidate_sales
+from .models import OrderItem, ProductDailySales
+
+
+REPORT_WINDOWS = [7, 30, 90, 365]
+DEFAULT_REPORT_WINDOW = 30
+REPORT_CACHE_TIMEOUT = 60 * 60
+
+
+def record_order_sales(order, sign=1):
+    """
+    Add an order's items to the daily aggregate (sign=-1 removes them,
+    e.g. when an order is cancelled).
+    """
+    day = timezone.localdate(order.created_at)
+    lines = (
+        order.items.values(
+            'product_id',
+            # Same grouping as rebuild_daily_sales, deleted products included
+            name=Coalesce('product__name', 'product_name'),
+            category=Coalesce('product__category__name', Value('')),
+        )
+        .annotate(units=Sum('quantity'), revenue=Sum(F('price') * F('quantity')))
+        .order_by()
+    )
+    for line in lines:
+        _add_daily_sales(
+            line['product_id'],
+            line['name'],
+            line['category'],
+            day,
+            units=sign * line['units'],
+            revenue=sign * line['revenue'],
+            orders=sign,
+        )
+    invalidate_sales()
+
+
+def _add_daily_sales(product_id, product_name, category_name, day, units, revenue, orders):
+    """Increment one aggregate row, creating it on first sale of the day"""
+    changes = {
+        'units_sold': F('units_sold') + units,
+        'revenue': F('revenue') + revenue,
+        'order_count': F('order_count') + orders,
+    }
+    if product_id is None:
+        # A deleted product's rows are only known by name, and the name need
+        # not be unique, so adjust exactly one of them
+        pk = (
+            ProductDailySales.objects.filter(product__isnull=True, product_name=product_name, date=day)
+            .values_list('pk', flat=True)
+            .first()
+        )
+        rows = ProductDailySales.objects.filter(pk=pk)
+    else:
+        rows = ProductDailySales.objects.filter(product_id=product_id, date=day)
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            ProductDailySales.objects.create(
+                product_id=product_id,
+                product_name=product_name,
+                category_name=category_name,
+                date=day,
+                units_sold=units,
+                revenue=revenue,
+                order_count=orders,
+            )
+    except IntegrityError:
+        # Another request created the row first
+        rows.update(**changes)
+
+
+@transaction.atomic
+def rebuild_daily_sales():
+    """Recompute the whole aggregate from OrderItem. Returns the row count."""
+    rows = (
+        OrderItem.objects.exclude(order__status='cancelled')
+        .annotate(date=TruncDate('order__created_at'))
+        .values(
+            'product_id',
+            'date',
+            # Items of deleted products keep the name they were ordered under
+            name=Coalesce('product__name', 'product_name'),
+            category=Coalesce('product__category__name', Value('')),
+        )
+        .annotate(
+            units_sold=Sum('quantity'),
+            revenue=Sum(F('price') * F('quantity')),
+            order_count=Count('order_id', distinct=True),
+        )
+        .order_by()
+    )
+    ProductDailySales.objects.all().delete()
+    created = ProductDailySales.objects.bulk_create(
+        [
+            ProductDailySales(product_name=row.pop('name'), category_name=row.pop('category'), **row)
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+    invalidate_sales()
+    return len(created)
+
+
+def _window_start(days):
+    return timezone.localdate() - timedelta(days=days - 1)
+
+
+def product_performance(days=DEFAULT_REPORT_WINDOW):
+    """
+    Units sold, revenue, order count and revenue share per product and per
+    category over the last `days` days. Returns a dict with 'products',
+    'categories' and 'total_revenue'.
+    """
+    return get_or_compute(
+        f'reports:products:{days}',
+        lambda: _compute_performance(days),
+        REPORT_CACHE_TIMEOUT,
+        versions=[SALES_VERSION_KEY],
+        read_primary=True,
+    )
+
+
+def _compute_performance(days):
+    rows = list(
+        ProductDailySales.objects.filter(date__gte=_window_start(days))
+        .values(
+            'product_id',
+            name=Coalesce('product__name', 'product_name'),
+            category=Coalesce('product__category__name', 'category_name'),
+        )
+        .annotate(
+            units_sold=Sum('units_sold'),
+            revenue=Sum('revenue'),
+            order_count=Sum('order_count'),
+        )
+        .order_by('-revenue')
+    )
+    total_revenue = sum((row['revenue'] for row in rows), Decimal('0'))
+
+    # An order containing several products of a category counts once per
+    # product here, so the category figure is order lines, not orders
+    categories = defaultdict(lambda: {'units_sold': 0, 'revenue': Decimal('0'), 'order_lines': 0})
+    for row in rows:
+        row['share'] = _share(row['revenue'], total_revenue)
+        category = categories[row['category']]
+        category['units_sold'] += row['units_sold']
+        category['revenue'] += row['revenue']
+        category['order_lines'] += row['order_count']
+
+    category_rows = sorted(
+        (
+            {'name': name, 'share': _share(totals['revenue'], total_revenue), **totals}
+            for name, totals in categories.items()
+        ),
+        key=lambda row: row['revenue'],
+        reverse=True,
+    )
+
+    return {
+        'products': rows,
+        'categories': category_rows,
+        'total_revenue': total_revenue,
+    }
+
+
+def _share(revenue, total):
+    if not total:
+        return Decimal('0')
+    return (revenue * 100 / total).quantize(Decimal('0.1'))
+
+
+def annotate_sales(products, days=DEFAULT_REPORT_WINDOW):
+    """Annotate a Product queryset with units/revenue/orders over the window"""
+    in_window = Q(daily_sales__date__gte=_window_start(days))
+    return products.annotate(
+        units_sold=Sum('daily_sales__units_sold', filter=in_window),
+        revenue=Sum('daily_sales__revenue', filter=in_window),
+        order_count=Sum('daily_sales__order_count', filter=in_window),
+    )
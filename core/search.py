@@ -0,0 +1,120 @@
+"""
+Product Search
+
+Storefront search matches every word of the query (lightly stemmed, so
+"cakes" finds "cake") against product names and descriptions, with case
+and accents folded on both sides.
+
+Matching runs against a snapshot of the available catalog's folded text,
+built once per catalog version. Results are small id lists kept in a
+per-process LRU keyed by catalog version, category and the normalized
+query, so "Cakes", "cake " and "CAKE" share one entry. A query is only
+admitted to the LRU the second time it is seen, so one-off searches can't
+push out the popular ones. Views hydrate the ids with a single in_bulk().
+"""
+
+import threading
+from collections import OrderedDict
+
+from .caching import get_or_compute
+from .catalog import CATALOG_VERSION_KEY, get_catalog_version
+from .models import Product
+from .typeahead import fold_text
+
+
+SEARCH_CACHE_SIZE = 500
+SEARCH_SNAPSHOT_TIMEOUT = 60 * 60
+
+
+def stem(word):
+    """Strip common English plural endings, keeping at least three letters"""
+    if len(word) > 5 and word.endswith('ies'):
+        return word[:-3]
+    if len(word) > 4 and word.endswith('es') and word[:-2].endswith(('s', 'x', 'z', 'ch', 'sh')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def normalize_query(query):
+    """Sorted, de-duplicated stems of a query; word order doesn't matter"""
+    return tuple(sorted({stem(word) for word in fold_text(query).split(' ') if word}))
+
+
+def get_search_snapshot():
+    """[(product_id, category_id, folded text)] of available products, listing order"""
+    return get_or_compute(
+        'search:snapshot', _build_snapshot, SEARCH_SNAPSHOT_TIMEOUT, versions=[CATALOG_VERSION_KEY],
+        read_primary=True,
+    )
+
+
+def _build_snapshot():
+    return [
+        (product_id, category_id, fold_text(f'{name} {description}'))
+        for product_id, category_id, name, description in Product.objects.filter(
+            is_available=True
+        ).values_list('id', 'category_id', 'name', 'description')
+    ]
+
+
+class SearchCache:
+    """Thread-safe LRU of id lists that only admits keys seen twice"""
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.seen = OrderedDict()  # keys requested once, not yet admitted
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        return None
+
+    def offer(self, key, value):
+        with self.lock:
+            if key not in self.seen:
+                self.seen[key] = True
+                if len(self.seen) > self.size:
+                    self.seen.popitem(last=False)
+                return
+            del self.seen[key]
+            self.entries[key] = value
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.seen.clear()
+
+
+_results = SearchCache(SEARCH_CACHE_SIZE)
+
+
+def search_product_ids(query, category=None):
+    """Ids of available products matching every word of the query, listing order"""
+    words = normalize_query(query)
+    if not words:
+        return []
+    category_id = category.pk if category else None
+    key = (get_catalog_version(), category_id, words)
+    ids = _results.get(key)
+    if ids is None:
+        ids = [
+            product_id for product_id, product_category_id, text in get_search_snapshot()
+            if (category_id is None or product_category_id == category_id)
+            and all(word in text for word in words)
+        ]
+        _results.offer(key, ids)
+    return ids
+
+
+def hydrate(product_ids):
+    """Products for a list of ids, in the same order, from one in_bulk() query"""
+    found = Product.objects.select_related('category').in_bulk(product_ids)
+    return [found[product_id] for product_id in product_ids if product_id in found]
@@ -0,0 +1,185 @@
+"""
+Signal handlers for the core app
+"""
+
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import Signal, receiver
+
+from .catalog import (
+    BLOCKS_VERSION_KEY, ORDERS_VERSION_KEY, invalidate_cart, invalidate_catalog, invalidate_version,
+)
+from .category_counts import adjust_category_counts, refresh_category_counts
+from .events import publish_order
+from .images import generate_variants, variants_missing
+from .inbox import adjust_unread_count, reset_unread_count
+from .notifications import send_order_status
+from .page_cache import purge
+from .spam_protection import BlockedUser
+from .models import Cart, CartItem, Category, ContactMessage, Order, Product
+
+
+# Sent once for a set-based change (bulk import, bulk admin action) that
+# bypasses per-instance save signals.
+# Arguments: product_ids (list, or None when unknown), fields (list of changed fields)
+catalog_bulk_changed = Signal()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def catalog_changed(sender, **kwargs):
+    """Invalidate cached catalog data whenever a product or category changes"""
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def queue_image_variants(sender, instance, **kwargs):
+    """Resize newly uploaded images in the background"""
+    if not kwargs.get('raw') and variants_missing(instance.image):
+        generate_variants(instance.image)
+
+
+@receiver(catalog_bulk_changed)
+def catalog_bulk_changed_handler(sender, **kwargs):
+    """Invalidate cached catalog data once for a whole bulk change"""
+    invalidate_catalog()
+    product_ids = kwargs.get('product_ids')
+    if product_ids is None:
+        purge('catalog')
+    else:
+        category_ids = set(
+            Product.objects.filter(pk__in=product_ids).values_list('category_id', flat=True)
+        )
+        purge(
+            'listing',
+            *(f'product:{pk}' for pk in product_ids),
+            *(f'category:{pk}' for pk in category_ids),
+        )
+    fields = kwargs.get('fields')
+    if fields is None or {'category', 'is_available'} & set(fields):
+        refresh_category_counts()
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_delete, sender=Product)
+def remember_product_counts_state(sender, instance, **kwargs):
+    """Remember the stored category/availability so post_save/post_delete can diff it"""
+    if instance._state.adding or kwargs.get('raw'):
+        instance._counted_state = None
+        return
+    instance._counted_state = (
+        Product.objects.filter(pk=instance.pk).values_list('category_id', 'is_available').first()
+    )
+
+
+@receiver(post_save, sender=Product)
+def update_category_counts_on_save(sender, instance, created, **kwargs):
+    """Move the product between category counters as needed"""
+    if kwargs.get('raw'):
+        return
+    old = None if created else getattr(instance, '_counted_state', None)
+    new = (instance.category_id, instance.is_available)
+    if old == new:
+        return
+    if old is not None:
+        old_category_id, old_available = old
+        adjust_category_counts(old_category_id, total=-1, available=-int(old_available))
+    adjust_category_counts(instance.category_id, total=1, available=int(instance.is_available))
+
+
+@receiver(post_delete, sender=Product)
+def update_category_counts_on_delete(sender, instance, **kwargs):
+    old = getattr(instance, '_counted_state', None)
+    if old is not None:
+        old_category_id, old_available = old
+        adjust_category_counts(old_category_id, total=-1, available=-int(old_available))
+
+
+@receiver(post_save, sender=ContactMessage)
+def update_unread_count_on_save(sender, instance, created, **kwargs):
+    if created:
+        if not instance.is_read and not instance.is_archived:
+            adjust_unread_count(1)
+    else:
+        # Edited elsewhere (e.g. Django admin): we can't tell what changed
+        reset_unread_count()
+
+
+@receiver(post_delete, sender=ContactMessage)
+def update_unread_count_on_delete(sender, instance, **kwargs):
+    reset_unread_count()
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def cart_changed(sender, instance, **kwargs):
+    """New cart version, so pages showing the cart badge are re-rendered"""
+    owner = Cart.objects.filter(pk=instance.cart_id).values_list('user_id', 'session_key').first()
+    if owner:
+        invalidate_cart(*owner)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def purge_product_pages(sender, instance, **kwargs):
+    """Drop cached pages showing this product (old and new category included)"""
+    if kwargs.get('raw'):
+        return
+    tags = ['listing', f'product:{instance.pk}', f'category:{instance.category_id}']
+    old = getattr(instance, '_counted_state', None)
+    if old is not None:
+        tags.append(f'category:{old[0]}')
+    purge(*tags)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def purge_category_pages(sender, instance, **kwargs):
+    """Drop cached pages showing this category"""
+    if not kwargs.get('raw'):
+        purge('listing', f'category:{instance.pk}')
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def orders_changed(sender, **kwargs):
+    """Cached order statistics (admin dashboard) are recomputed"""
+    invalidate_version(ORDERS_VERSION_KEY)
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    """Remember the stored status so post_save can tell a status change"""
+    if instance._state.adding or kwargs.get('raw'):
+        instance._stored_status = None
+        return
+    instance._stored_status = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Order)
+def publish_order_events(sender, instance, created, **kwargs):
+    """Push new orders and status changes to open order pages (see core/events.py)"""
+    if kwargs.get('raw'):
+        return
+    if created:
+        publish_order(instance, 'created')
+    elif instance.status != getattr(instance, '_stored_status', instance.status):
+        publish_order(instance, 'status')
+
+
+@receiver(post_save, sender=Order)
+def queue_status_email(sender, instance, created, **kwargs):
+    """Email the customer when their order's status changes"""
+    if kwargs.get('raw') or created:
+        return
+    if instance.status != getattr(instance, '_stored_status', instance.status):
+        send_order_status.delay(order_id=instance.pk, status=instance.status)
+
+
+@receiver(post_save, sender=BlockedUser)
+@receiver(post_delete, sender=BlockedUser)
+def blocks_changed(sender, **kwargs):
+    """Checkout reloads the cached blocklist"""
+    invalidate_version(BLOCKS_VERSION_KEY)
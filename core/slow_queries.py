@@ -0,0 +1,347 @@
+"""
+Slow query log
+
+With SLOW_QUERY_MS above 0, an execute wrapper on every connection (web
+workers, job workers, management commands) times each query. One that
+takes longer is appended to an in-memory ring buffer of
+SLOW_QUERY_BUFFER_SIZE entries, keeping:
+- the SQL, normalized: literals, numbers and `IN (...)` lists replaced, so
+  the same query with other values gets the same fingerprint;
+- a hash of the parameters, never the values themselves;
+- where it came from: the view (set by SlowQueryMiddleware), and the
+  project line that ran it and/or the template being rendered, as for the
+  N+1 warnings in core.instrumentation. Queries an async view runs through
+  sync_to_async have no project line; the view still names them;
+- the database alias and the duration.
+
+It is off unless SLOW_QUERY_MS is set: turn it on while investigating.
+
+A background thread per process empties the buffer every
+SLOW_QUERY_FLUSH_INTERVAL seconds into SlowQuery rows, keeping the newest
+SLOW_QUERY_MAX_ROWS. Before writing, it captures the plan of each SELECT
+with `EXPLAIN (ANALYZE off)` on PostgreSQL or `EXPLAIN QUERY PLAN` on
+SQLite: the estimate only, nothing is run a second time. Each fingerprint is
+explained at most once per SLOW_QUERY_EXPLAIN_INTERVAL seconds (remembered
+for the last EXPLAINED_FINGERPRINTS fingerprints).
+
+The admin panel's Slow Queries page groups the rows by fingerprint in SQL,
+with p50/p95 durations (percentile_disc on PostgreSQL, computed for the
+shown fingerprints only elsewhere), callers and the latest plan.
+
+A query under the threshold costs two perf_counter() calls; the request
+never waits on the EXPLAIN or the insert.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Aggregate, Count, FloatField, Max, Sum
+from django.utils import timezone
+
+from .instrumentation import query_origin, skip_in_origins
+
+logger = logging.getLogger(__name__)
+
+skip_in_origins(__file__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_SPACE = re.compile(r'\s+')
+
+_EXPLAIN = {
+    'postgresql': 'EXPLAIN (ANALYZE off) ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+
+_request = ContextVar('slow_query_request', default=None)
+_buffer = deque(maxlen=settings.SLOW_QUERY_BUFFER_SIZE)
+_local = threading.local()
+_flusher_lock = threading.Lock()
+_flusher_pid = None
+EXPLAINED_FINGERPRINTS = 1000
+_explained = OrderedDict()     # fingerprint -> monotonic time of its last EXPLAIN, oldest first
+
+
+def normalize(sql):
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def _params_hash(params):
+    if not params:
+        return ''
+    return hashlib.sha1(repr(params).encode()).hexdigest()[:16]
+
+
+def _view_name():
+    request = _request.get()
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else ''
+
+
+def _record_slow(execute, sql, params, many, context):
+    if getattr(_local, 'flushing', False):
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - started) * 1000
+    if duration_ms >= settings.SLOW_QUERY_MS:
+        normalized = normalize(sql)
+        _buffer.append({
+            'sql': sql,
+            'params': None if many else params,   # for the EXPLAIN only
+            'normalized': normalized,
+            'fingerprint': fingerprint(normalized),
+            'params_hash': _params_hash(params),
+            'view': _view_name(),
+            'origin': query_origin(),
+            'database': context['connection'].alias,
+            'duration_ms': duration_ms,
+            'captured_at': timezone.now(),
+        })
+        _start_flusher()
+    return result
+
+
+def _add_wrapper(connection):
+    if _record_slow not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_slow)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _add_wrapper(connection)
+
+
+def install():
+    """Watch queries on every connection when SLOW_QUERY_MS is set; idempotent"""
+    if settings.SLOW_QUERY_MS <= 0:
+        return
+    connection_created.connect(_on_connection_created, dispatch_uid='slow_queries')
+    for connection in connections.all(initialized_only=True):
+        _add_wrapper(connection)
+
+
+class SlowQueryMiddleware:
+    """Makes the request's view known to the slow query log"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.SLOW_QUERY_MS <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
+
+    async def __acall__(self, request):
+        token = _request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _request.reset(token)
+
+
+def _start_flusher():
+    global _flusher_pid
+    # Per process: a forked gunicorn or job worker doesn't inherit the thread
+    if _flusher_pid == os.getpid():
+        return
+    with _flusher_lock:
+        if _flusher_pid != os.getpid():
+            _flusher_pid = os.getpid()
+            threading.Thread(target=_flush_loop, name='slow-query-flush', daemon=True).start()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(settings.SLOW_QUERY_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            logger.exception('Could not save slow queries')
+        finally:
+            close_old_connections()
+
+
+def explain(entry):
+    """The entry's query plan, or '' for statements that can't be explained"""
+    connection = connections[entry['database']]
+    prefix = _EXPLAIN.get(connection.vendor)
+    statement = entry['sql'].lstrip().upper()
+    if prefix is None or entry['params'] is None or not statement.startswith(('SELECT', 'WITH')):
+        return ''
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + entry['sql'], entry['params'])
+            rows = cursor.fetchall()
+    except Exception as exc:
+        return f'EXPLAIN failed: {exc}'
+    # PostgreSQL returns one line per row; SQLite (id, parent, notused, detail)
+    return '\n'.join(str(row[-1]) for row in rows)
+
+
+def flush():
+    """Save the buffered slow queries, with plans; returns how many"""
+    from .models import SlowQuery
+
+    entries = []
+    while _buffer:
+        try:
+            entries.append(_buffer.popleft())
+        except IndexError:
+            break
+    if not entries:
+        return 0
+
+    _local.flushing = True
+    try:
+        now = time.monotonic()
+        rows = []
+        for entry in entries:
+            plan = ''
+            last = _explained.get(entry['fingerprint'])
+            if last is None or now - last >= settings.SLOW_QUERY_EXPLAIN_INTERVAL:
+                plan = explain(entry)
+                _remember_explained(entry['fingerprint'], now)
+            rows.append(SlowQuery(
+                fingerprint=entry['fingerprint'],
+                sql=entry['normalized'],
+                params_hash=entry['params_hash'],
+                view=entry['view'],
+                origin=entry['origin'][:300],
+                database=entry['database'],
+                duration_ms=entry['duration_ms'],
+                plan=plan,
+                captured_at=entry['captured_at'],
+            ))
+        SlowQuery.objects.bulk_create(rows)
+        prune()
+    finally:
+        _local.flushing = False
+    return len(rows)
+
+
+def _remember_explained(fp, now):
+    # Only the flusher thread writes it
+    _explained[fp] = now
+    _explained.move_to_end(fp)
+    while len(_explained) > EXPLAINED_FINGERPRINTS:
+        _explained.popitem(last=False)
+
+
+def prune():
+    """Keep the newest SLOW_QUERY_MAX_ROWS rows"""
+    from .models import SlowQuery
+
+    keep = settings.SLOW_QUERY_MAX_ROWS
+    cutoff = list(SlowQuery.objects.order_by('-pk').values_list('pk', flat=True)[keep:keep + 1])
+    if cutoff:
+        SlowQuery.objects.filter(pk__lte=cutoff[0]).delete()
+
+
+class _Percentile(Aggregate):
+    """PostgreSQL's percentile_disc: the nearest-rank percentile"""
+    function = 'percentile_disc'
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+    def __init__(self, expression, fraction):
+        super().__init__(expression, fraction=float(fraction))
+
+
+def _percentile(ordered, fraction):
+    # Nearest rank
+    return ordered[max(0, math.ceil(len(ordered) * fraction) - 1)]
+
+
+def slow_query_report(since, limit=50):
+    """
+    Slow queries captured since `since`, grouped by fingerprint, most total
+    time first: [{'fingerprint', 'sql', 'count', 'p50_ms', 'p95_ms', 'max_ms',
+    'total_ms', 'last_seen', 'origins': [(origin, count)], 'plan'}]
+    """
+    from .models import SlowQuery
+
+    rows = SlowQuery.objects.filter(captured_at__gte=since)
+    aggregates = {
+        'count': Count('pk'),
+        'max_ms': Max('duration_ms'),
+        'total_ms': Sum('duration_ms'),
+        'last_seen': Max('captured_at'),
+    }
+    in_sql = connections[rows.db].vendor == 'postgresql'
+    if in_sql:
+        aggregates['p50_ms'] = _Percentile('duration_ms', 0.5)
+        aggregates['p95_ms'] = _Percentile('duration_ms', 0.95)
+    report = list(
+        rows.values('fingerprint').annotate(**aggregates).order_by('-total_ms')[:limit]
+    )
+    shown = [row['fingerprint'] for row in report]
+
+    if not in_sql:
+        durations = {}
+        for fp, duration_ms in rows.filter(fingerprint__in=shown).values_list('fingerprint', 'duration_ms'):
+            durations.setdefault(fp, []).append(duration_ms)
+        for row in report:
+            ordered = sorted(durations[row['fingerprint']])
+            row['p50_ms'] = _percentile(ordered, 0.5)
+            row['p95_ms'] = _percentile(ordered, 0.95)
+
+    origins = {}
+    for row in (
+        rows.filter(fingerprint__in=shown)
+        .values('fingerprint', 'view', 'origin')
+        .annotate(count=Count('pk'))
+        .order_by('-count')
+    ):
+        origin, view = row['origin'], row['view']
+        if view:
+            origin = view if origin == 'unknown' else f'{view}: {origin}'
+        found = origins.setdefault(row['fingerprint'], [])
+        if len(found) < 5:
+            found.append((origin, row['count']))
+
+    # The SQL and latest plan of each fingerprint shown
+    latest = {}
+    for fp, sql, plan in (
+        SlowQuery.objects.filter(fingerprint__in=shown)
+        .order_by('-captured_at')
+        .values_list('fingerprint', 'sql', 'plan')
+        .iterator()
+    ):
+        known = latest.setdefault(fp, {'sql': sql, 'plan': ''})
+        if not known['plan']:
+            known['plan'] = plan
+    for row in report:
+        row['origins'] = origins.get(row['fingerprint'], [])
+        row.update(latest.get(row['fingerprint'], {'sql': '', 'plan': ''}))
+    return report
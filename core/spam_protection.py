@@ -5,13 +5,22 @@ This module provides anti-spam functionality for the ordering system:
 - Max 2 orders per day per phone number
 - Blocking users with repeated cancellations (3+)
 - IP-based cooldown between orders (5 minutes)
+
+plus a generic cache-backed rate limit used to throttle form submissions.
 """
 
+import ipaddress
+import time
+from functools import lru_cache
+
+from django.core.cache import cache
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 
+from .metrics import record_checkout
+
 
 class BlockedUser(models.Model):
     """Model to store permanently blocked users/phones/IPs"""
@@ -66,16 +75,73 @@ class OrderRateLimit(models.Model):
 
 # ============== Validation Functions ==============
 
+@lru_cache(maxsize=8)
+def _proxy_networks(proxies):
+    return [ipaddress.ip_network(proxy.strip(), strict=False) for proxy in proxies if proxy.strip()]
+
+
+def _is_trusted_proxy(ip):
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(address in network for network in _proxy_networks(tuple(settings.TRUSTED_PROXIES)))
+
+
 def get_client_ip(request):
-    """Extract client IP from request, handling proxies"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0].strip()
-    else:
-        ip = request.META.get('REMOTE_ADDR')
+    """
+    Client IP as seen by the first proxy we trust. X-Forwarded-For is read
+    only when the peer is in TRUSTED_PROXIES, and from the right: each
+    trusted hop appends the address it saw, so the nearest untrusted entry
+    is the client. Entries further left are whatever the client sent and
+    would let anyone pick their own rate-limit bucket.
+    """
+    ip = request.META.get('REMOTE_ADDR')
+    if not _is_trusted_proxy(ip):
+        return ip
+    for hop in reversed(request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')):
+        hop = hop.strip()
+        if not hop:
+            continue
+        ip = hop
+        if not _is_trusted_proxy(hop):
+            break
     return ip
 
 
+def within_rate_limit(key, limit, window):
+    """
+    Sliding-window limit kept in the cache: at most about `limit` hits in
+    any `window` seconds. Hits are counted per fixed window and the previous
+    window's count is weighted by how much of it still overlaps the last
+    `window` seconds, so a burst either side of a boundary can't get twice
+    the limit through. Counts only move through add()/incr()/decr(), so
+    concurrent requests can't all read the same count; a refused hit is
+    taken back out so it doesn't count against the next one.
+    Returns True if this hit is allowed.
+    """
+    now = time.time()
+    current = int(now // window)
+    cache_key = f'ratelimit:{key}:{current}'
+    # Kept for a second window, where it is the "previous" count
+    cache.add(cache_key, 0, 2 * window + 1)
+    try:
+        hits = cache.incr(cache_key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.add(cache_key, 1, 2 * window + 1)
+        hits = 1
+    previous = cache.get(f'ratelimit:{key}:{current - 1}', 0)
+    overlap = 1 - (now / window - current)
+    if hits + previous * overlap <= limit:
+        return True
+    try:
+        cache.decr(cache_key)
+    except ValueError:
+        pass
+    return False
+
+
 def check_phone_daily_limit(phone, max_orders=2):
     """
     Check if phone number has exceeded daily order limit.
@@ -93,23 +159,47 @@ def check_phone_daily_limit(phone, max_orders=2):
     return True, None
 
 
+def get_blocklist():
+    """
+    Active blocks as {'users', 'phones', 'ips'} sets, cached until a
+    BlockedUser changes (see core.signals).
+    """
+    from .caching import get_or_compute
+    from .catalog import BLOCKS_VERSION_KEY
+
+    def load():
+        blocklist = {'users': set(), 'phones': set(), 'ips': set()}
+        for user_id, phone, ip_address in BlockedUser.objects.filter(is_active=True).values_list(
+            'user_id', 'phone', 'ip_address'
+        ):
+            if user_id:
+                blocklist['users'].add(user_id)
+            if phone:
+                blocklist['phones'].add(phone)
+            if ip_address:
+                blocklist['ips'].add(ip_address)
+        return blocklist
+
+    return get_or_compute('spam:blocklist', load, None, versions=[BLOCKS_VERSION_KEY], read_primary=True)
+
+
 def check_user_not_blocked(user=None, phone=None, ip_address=None):
     """
     Check if user, phone, or IP is blocked.
     Returns (is_allowed, message)
     """
-    blocks = BlockedUser.objects.filter(is_active=True)
+    blocks = get_blocklist()
     
     if user:
-        if blocks.filter(user=user).exists():
+        if user.pk in blocks['users']:
             return False, "Your account has been blocked due to policy violations."
     
     if phone:
-        if blocks.filter(phone=phone).exists():
+        if phone in blocks['phones']:
             return False, "This phone number has been blocked due to policy violations."
     
     if ip_address:
-        if blocks.filter(ip_address=ip_address).exists():
+        if ip_address in blocks['ips']:
             return False, "Access denied. Please contact support."
     
     return True, None
@@ -190,16 +280,19 @@ def validate_order_allowed(request, phone):
     # Check if user/phone/IP is blocked
     allowed, message = check_user_not_blocked(user, phone, ip_address)
     if not allowed:
+        record_checkout('blocked')
         return False, message
     
     # Check phone daily limit
     allowed, message = check_phone_daily_limit(phone)
     if not allowed:
+        record_checkout('rate_limited')
         return False, message
     
     # Check IP cooldown
     allowed, message = check_ip_cooldown(ip_address)
     if not allowed:
+        record_checkout('rate_limited')
         return False, message
     
     return True, None
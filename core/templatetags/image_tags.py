@@ -0,0 +1,69 @@
+"""
+Responsive image tags
+
+    {% load image_tags %}
+    {% responsive_image product.image 'card' alt=product.name %}
+    <div style="background-image: url('{% image_variant_url category.image 'detail' %}')">
+
+Variants come from core.images, which lists them from the cache; anything
+not generated yet falls back to the original upload.
+"""
+
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core.images import IMAGE_VARIANTS, image_variants
+
+register = template.Library()
+
+
+def _srcset(variants):
+    return ', '.join(f'{url} {width}w' for _, width, url in variants)
+
+
+@register.simple_tag
+def image_variant_url(image, variant='card'):
+    """URL of one JPEG variant, or of the original if it isn't ready yet"""
+    if not image:
+        return ''
+    for name, _, url in image_variants(image.name)['jpg']:
+        if name == variant:
+            return url
+    return image.url
+
+
+@register.simple_tag
+def responsive_image(image, variant='card', alt='', sizes=None, lazy=True, **attrs):
+    """
+    <picture> with a WebP source and a JPEG <img>, each with a srcset of
+    the variants that exist. `variant` picks the default src and the
+    display width used for `sizes`. Extra keyword args (class, id, ...)
+    become <img> attributes.
+    """
+    if not image:
+        return ''
+
+    width = IMAGE_VARIANTS.get(variant, IMAGE_VARIANTS['card'])
+    sizes = sizes or f'(max-width: {width}px) 100vw, {width}px'
+    variants = image_variants(image.name)
+    webp, jpg = variants['webp'], variants['jpg']
+
+    src = image.url
+    for name, _, url in jpg:
+        if name == variant:
+            src = url
+
+    img_attrs = {'src': src, 'alt': alt}
+    if jpg:
+        img_attrs.update(srcset=_srcset(jpg), sizes=sizes)
+    if lazy:
+        img_attrs['loading'] = 'lazy'
+    img_attrs.update({key.replace('_', '-'): value for key, value in attrs.items()})
+    img = format_html('<img{}>', format_html_join('', ' {}="{}"', img_attrs.items()))
+
+    if not webp:
+        return img
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">{}</picture>',
+        _srcset(webp), sizes, img,
+    )
@@ -0,0 +1,39 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from core import caching
+from core.caching import get_or_compute
+
+
+class KeyLockTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        caching.local_cache.clear()
+
+    def test_waiting_for_another_worker_blocks_only_that_key(self):
+        # Another process is recomputing 'slow', so this thread polls for it
+        cache.add('lock:slow', 1, caching.LOCK_TIMEOUT)
+        waiter = threading.Thread(target=get_or_compute, args=('slow', lambda: 'mine'))
+        waiter.start()
+        time.sleep(0.1)
+
+        started = time.monotonic()
+        for n in range(200):
+            self.assertEqual(get_or_compute(f'other:{n}', lambda: n), n)
+        self.assertLess(time.monotonic() - started, 1)
+
+        cache.set('slow', ('theirs', 0, None))
+        waiter.join()
+        self.assertEqual(caching._key_locks, {})
+
+    def test_lock_released_when_compute_fails(self):
+        def fail():
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            get_or_compute('failing', fail)
+        self.assertEqual(caching._key_locks, {})
+        self.assertEqual(get_or_compute('failing', lambda: 1), 1)
@@ -0,0 +1,47 @@
+import io
+import os
+import tempfile
+
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core.catalog_import import import_products
+from core.images import variants_missing
+from core.models import Category, Product
+
+HEADER = 'slug,name,category,price,description,image\n'
+
+
+class CatalogImportImageTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name, IMAGE_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        os.makedirs(os.path.join(media.name, 'products'))
+        Image.new('RGB', (1200, 800), 'peru').save(os.path.join(media.name, 'products', 'cake.jpg'))
+        Category.objects.create(name='Cakes', slug='cakes')
+
+    def run_import(self, *rows):
+        csv = HEADER + ''.join(f'{slug},{slug.title()},cakes,10,Tasty,{image}\n' for slug, image in rows)
+        with self.captureOnCommitCallbacks(execute=True):
+            return import_products(io.StringIO(csv))
+
+    def test_unsafe_or_missing_images_are_row_errors(self):
+        report = self.run_import(
+            ('up', '../secrets.jpg'),
+            ('absolute', '/etc/passwd'),
+            ('missing', 'products/nope.jpg'),
+            ('good', 'products/cake.jpg'),
+        )
+        self.assertEqual([row for row, _ in report.errors], [2, 3, 4])
+        self.assertIn('image:', report.errors[2][1])
+        self.assertEqual(report.created, 1)
+        self.assertEqual(list(Product.objects.values_list('slug', flat=True)), ['good'])
+
+    def test_variants_are_made_after_the_import_commits(self):
+        report = self.run_import(('good', 'products/cake.jpg'))
+        self.assertTrue(report.ok)
+        self.assertFalse(variants_missing(Product.objects.get().image))
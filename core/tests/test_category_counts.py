@@ -0,0 +1,71 @@
+from django.test import TestCase
+
+from core.category_counts import refresh_category_counts
+from core.models import Category, Product
+
+
+class CategoryCountTests(TestCase):
+    def setUp(self):
+        self.cakes = Category.objects.create(name='Cakes', slug='cakes')
+        self.breads = Category.objects.create(name='Breads', slug='breads')
+
+    def make(self, slug, category, is_available=True):
+        return Product.objects.create(
+            name=slug.title(), slug=slug, category=category, price=10, description='', is_available=is_available,
+        )
+
+    def counts(self, category):
+        category.refresh_from_db()
+        return category.product_count, category.available_product_count
+
+    def assertMatchesRecount(self):
+        # refresh_category_counts() returns how many categories it had to fix
+        self.assertEqual(refresh_category_counts(), 0)
+
+    def test_create(self):
+        self.make('sponge', self.cakes)
+        self.make('torte', self.cakes, is_available=False)
+        self.assertEqual(self.counts(self.cakes), (2, 1))
+        self.assertMatchesRecount()
+
+    def test_delete(self):
+        sponge = self.make('sponge', self.cakes)
+        torte = self.make('torte', self.cakes, is_available=False)
+        sponge.delete()
+        self.assertEqual(self.counts(self.cakes), (1, 0))
+        torte.delete()
+        self.assertEqual(self.counts(self.cakes), (0, 0))
+        self.assertMatchesRecount()
+
+    def test_availability_toggle(self):
+        sponge = self.make('sponge', self.cakes)
+        sponge.is_available = False
+        sponge.save()
+        self.assertEqual(self.counts(self.cakes), (1, 0))
+        self.assertMatchesRecount()
+        sponge.is_available = True
+        sponge.save()
+        self.assertEqual(self.counts(self.cakes), (1, 1))
+        self.assertMatchesRecount()
+
+    def test_category_move(self):
+        sponge = self.make('sponge', self.cakes)
+        sponge.category = self.breads
+        sponge.is_available = False
+        sponge.save()
+        self.assertEqual(self.counts(self.cakes), (0, 0))
+        self.assertEqual(self.counts(self.breads), (1, 0))
+        self.assertMatchesRecount()
+
+    def test_unrelated_edit_leaves_counts(self):
+        sponge = self.make('sponge', self.cakes)
+        sponge.price = 12
+        sponge.save()
+        self.assertEqual(self.counts(self.cakes), (1, 1))
+        self.assertMatchesRecount()
+
+    def test_recount_repairs_drift(self):
+        self.make('sponge', self.cakes)
+        Category.objects.filter(pk=self.cakes.pk).update(product_count=7)
+        self.assertEqual(refresh_category_counts(), 1)
+        self.assertEqual(self.counts(self.cakes), (1, 1))
@@ -0,0 +1,41 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from core.catalog import RECOMMENDATIONS_VERSION_KEY, SALES_VERSION_KEY, bump_catalog_version, bump_version
+from core.conditional import product_page
+
+
+@product_page
+def view(request):
+    return HttpResponse('page')
+
+
+class ProductPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def get(self, etag=None):
+        request = RequestFactory().get('/', HTTP_IF_NONE_MATCH=etag) if etag else RequestFactory().get('/')
+        request.user = AnonymousUser()
+        request.session = self.client.session
+        return view(request)
+
+    def test_unchanged_page_is_not_modified(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(etag).status_code, 304)
+
+    def test_versions_the_page_depends_on_change_its_etag(self):
+        for bump in (
+            bump_catalog_version,
+            lambda: bump_version(SALES_VERSION_KEY),
+            lambda: bump_version(RECOMMENDATIONS_VERSION_KEY),
+        ):
+            etag = self.get()['ETag']
+            bump()
+            self.assertEqual(self.get(etag).status_code, 200)
+
+    def test_no_last_modified(self):
+        # Only the catalog's changes are dated; sales and recommendations aren't
+        self.assertFalse(self.get().has_header('Last-Modified'))
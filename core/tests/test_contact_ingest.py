@@ -0,0 +1,84 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from core.contact_ingest import ACCEPTED, DUPLICATE, RATE_LIMITED, submit_contact_message
+from core.models import ContactMessage
+from core.spam_protection import get_client_ip, within_rate_limit
+
+
+def message(n):
+    return {'name': 'Ann', 'email': 'ann@example.com', 'subject': f'Order {n}', 'message': 'Hello'}
+
+
+@override_settings(CONTACT_RATE_LIMIT=5, CONTACT_RATE_WINDOW=600)
+class SubmitContactMessageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_saved_before_returning(self):
+        self.assertEqual(submit_contact_message('203.0.113.5', **message(1)), ACCEPTED)
+        self.assertTrue(ContactMessage.objects.filter(subject='Order 1').exists())
+
+    def test_duplicate_dropped(self):
+        submit_contact_message('203.0.113.5', **message(1))
+        self.assertEqual(submit_contact_message('203.0.113.6', **message(1)), DUPLICATE)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+    def test_rate_limited_per_ip(self):
+        for n in range(5):
+            self.assertEqual(submit_contact_message('203.0.113.5', **message(n)), ACCEPTED)
+        self.assertEqual(submit_contact_message('203.0.113.5', **message(5)), RATE_LIMITED)
+        self.assertEqual(submit_contact_message('203.0.113.6', **message(6)), ACCEPTED)
+
+
+class WithinRateLimitTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def hits(self, at, count):
+        with mock.patch('core.spam_protection.time.time', return_value=at):
+            return sum(within_rate_limit('test', limit=5, window=600) for _ in range(count))
+
+    def test_burst_across_boundary_not_doubled(self):
+        # Five at the end of one window, then a burst just after the boundary
+        self.assertEqual(self.hits(1199, 5), 5)
+        self.assertEqual(self.hits(1201, 5), 0)
+
+    def test_allowance_returns_as_window_slides(self):
+        self.assertEqual(self.hits(1199, 5), 5)
+        # Halfway through the next window half of those still count
+        self.assertEqual(self.hits(1500, 5), 2)
+        # A whole window later none of them do
+        self.assertEqual(self.hits(1800, 5), 3)
+
+    def test_refused_hits_not_counted(self):
+        self.assertEqual(self.hits(0, 50), 5)
+        self.assertEqual(self.hits(600, 5), 0)
+        self.assertEqual(self.hits(1200, 5), 5)
+
+
+@override_settings(TRUSTED_PROXIES=['127.0.0.1/32', '172.16.0.0/12'])
+class GetClientIpTests(SimpleTestCase):
+    def ip(self, remote_addr, forwarded_for=None):
+        meta = {'REMOTE_ADDR': remote_addr}
+        if forwarded_for is not None:
+            meta['HTTP_X_FORWARDED_FOR'] = forwarded_for
+        return get_client_ip(RequestFactory().get('/', **meta))
+
+    def test_direct_client_ignores_header(self):
+        self.assertEqual(self.ip('203.0.113.5', '198.51.100.1'), '203.0.113.5')
+
+    def test_address_added_by_proxy(self):
+        self.assertEqual(self.ip('172.18.0.5', '203.0.113.5'), '203.0.113.5')
+
+    def test_spoofed_entries_skipped(self):
+        # The client sent "X-Forwarded-For: 198.51.100.1"; nginx appended its peer
+        self.assertEqual(self.ip('172.18.0.5', '198.51.100.1, 203.0.113.5'), '203.0.113.5')
+
+    def test_trusted_hops_skipped(self):
+        self.assertEqual(self.ip('127.0.0.1', '203.0.113.5, 172.18.0.5'), '203.0.113.5')
+
+    def test_proxy_without_header(self):
+        self.assertEqual(self.ip('172.18.0.5'), '172.18.0.5')
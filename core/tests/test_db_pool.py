@@ -0,0 +1,62 @@
+from django.test import SimpleTestCase
+
+from core.db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql):
+        if self.connection.broken:
+            raise OSError('connection lost')
+        self.connection.log.append(sql)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Records what the pool does to it"""
+
+    def __init__(self):
+        self.log = []
+        self.broken = False
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.log.append('rollback')
+
+    def commit(self):
+        self.log.append('commit')
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_release_rolls_back_and_resets_session(self):
+        pool = ConnectionPool(max_size=1)
+        connection = pool.acquire(FakeConnection)
+        pool.release(connection)
+        self.assertEqual(connection.log, ['rollback', 'RESET ALL', 'commit'])
+        self.assertIs(pool.acquire(FakeConnection), connection)
+
+    def test_connection_that_cannot_reset_is_closed(self):
+        pool = ConnectionPool(max_size=1)
+        connection = pool.acquire(FakeConnection)
+        connection.broken = True
+        pool.release(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+        self.assertIsNot(pool.acquire(FakeConnection), connection)
+
+    def test_timeout_when_all_checked_out(self):
+        pool = ConnectionPool(max_size=1, timeout=0.01)
+        pool.acquire(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+        self.assertEqual(pool.stats()['timeouts'], 1)
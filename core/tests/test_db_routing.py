@@ -0,0 +1,189 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.caching import get_or_compute
+from core.catalog import SALES_VERSION_KEY, bump_catalog_version, bump_version
+from core.conditional import catalog_page
+from core.db_routing import PIN_COOKIE, ReplicaRoutingMiddleware, primary, read_from_replica
+from core.models import Category, Product
+
+
+class RoutingTestCase(TransactionTestCase):
+    databases = {'default', 'replica_1'}
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        # No recent version bumps: replicas have caught up
+        cache.clear()
+
+    def aliases(self, view, request):
+        """The aliases `view` read from while answering `request`"""
+        with CaptureQueriesContext(connections['default']) as on_primary, \
+                CaptureQueriesContext(connections['replica_1']) as on_replica:
+            view(request)
+        return {
+            alias for alias, queries in (('default', on_primary), ('replica_1', on_replica)) if queries
+        }
+
+
+def _read_products(request):
+    list(Product.objects.all())
+    return HttpResponse()
+
+
+class ReplicaRouterTests(RoutingTestCase):
+    def test_opted_in_get_reads_from_replica(self):
+        view = read_from_replica(_read_products)
+        self.assertEqual(self.aliases(view, self.factory.get('/')), {'replica_1'})
+
+    def test_views_without_decorator_read_from_primary(self):
+        self.assertEqual(self.aliases(_read_products, self.factory.get('/')), {'default'})
+
+    def test_post_reads_from_primary(self):
+        view = read_from_replica(_read_products)
+        self.assertEqual(self.aliases(view, self.factory.post('/')), {'default'})
+
+    def test_pin_cookie_reads_from_primary(self):
+        view = read_from_replica(_read_products)
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.aliases(view, request), {'default'})
+
+    def test_page_cache_render_reads_from_replica(self):
+        view = read_from_replica(_read_products)
+        request = self.factory.get('/')
+        request.page_cache = True
+        self.assertEqual(self.aliases(view, request), {'replica_1'})
+
+    def test_page_cache_render_after_catalog_change_reads_from_primary(self):
+        bump_catalog_version()
+        view = read_from_replica(_read_products)
+        request = self.factory.get('/')
+        request.page_cache = True
+        self.assertEqual(self.aliases(view, request), {'default'})
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_page_cache_render_once_replicas_caught_up(self):
+        bump_catalog_version()
+        view = read_from_replica(_read_products)
+        request = self.factory.get('/')
+        request.page_cache = True
+        self.assertEqual(self.aliases(view, request), {'replica_1'})
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        view = read_from_replica(_read_products)
+        self.assertEqual(self.aliases(view, self.factory.get('/')), {'default'})
+
+    def test_primary_block(self):
+        @read_from_replica
+        def view(request):
+            with primary():
+                list(Product.objects.all())
+            return HttpResponse()
+
+        self.assertEqual(self.aliases(view, self.factory.get('/')), {'default'})
+
+    def test_atomic_block(self):
+        @read_from_replica
+        def view(request):
+            with transaction.atomic():
+                list(Product.objects.all())
+            return HttpResponse()
+
+        self.assertEqual(self.aliases(view, self.factory.get('/')), {'default'})
+
+    def test_primary_only_apps(self):
+        @read_from_replica
+        def view(request):
+            list(get_user_model().objects.all())
+            return HttpResponse()
+
+        self.assertEqual(self.aliases(view, self.factory.get('/')), {'default'})
+
+    def test_flag_is_reset_after_view(self):
+        read_from_replica(_read_products)(self.factory.get('/'))
+        self.assertEqual(self.aliases(_read_products, self.factory.get('/')), {'default'})
+
+    def test_async_view(self):
+        from asgiref.sync import async_to_sync, sync_to_async
+
+        @read_from_replica
+        async def view(request):
+            return await sync_to_async(_read_products)(request)
+
+        self.assertEqual(self.aliases(async_to_sync(view), self.factory.get('/')), {'replica_1'})
+
+    def test_writes_go_to_primary(self):
+        @read_from_replica
+        def view(request):
+            Category.objects.create(name='Cakes', slug='cakes')
+            return HttpResponse()
+
+        self.assertEqual(self.aliases(view, self.factory.get('/')), {'default'})
+
+
+class VersionedValueTests(RoutingTestCase):
+    def test_read_primary_computes_on_primary(self):
+        @read_from_replica
+        def view(request):
+            get_or_compute('tests:routing', lambda: Product.objects.count(), read_primary=True)
+            return HttpResponse()
+
+        self.assertEqual(self.aliases(view, self.factory.get('/')), {'default'})
+
+    def etag_page_request(self):
+        request = self.factory.get('/')
+        request.user = AnonymousUser()
+        request.session = self.client.session
+        return request
+
+    def test_page_with_etag_renders_on_replica(self):
+        view = read_from_replica(catalog_page(_read_products))
+        self.assertEqual(self.aliases(view, self.etag_page_request()), {'replica_1'})
+
+    def test_page_with_etag_renders_on_primary_after_version_bump(self):
+        view = read_from_replica(catalog_page(_read_products, versions=(SALES_VERSION_KEY,)))
+        bump_version(SALES_VERSION_KEY)
+        self.assertEqual(self.aliases(view, self.etag_page_request()), {'default'})
+
+
+class CatalogPageTests(RoutingTestCase):
+    def test_catalog_get_reads_from_replica(self):
+        for url in ('/', '/products/'):
+            with self.subTest(url=url), \
+                    CaptureQueriesContext(connections['replica_1']) as on_replica:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(any('core_product' in query['sql'] for query in on_replica))
+
+    def test_catalog_get_after_catalog_change_reads_from_primary(self):
+        bump_catalog_version()
+        with CaptureQueriesContext(connections['replica_1']) as on_replica:
+            self.assertEqual(self.client.get('/products/').status_code, 200)
+        self.assertEqual(len(on_replica), 0)
+
+
+class PinCookieTests(RoutingTestCase):
+    def middleware(self):
+        return ReplicaRoutingMiddleware(lambda request: HttpResponse())
+
+    def test_post_sets_pin(self):
+        response = self.middleware()(self.factory.post('/'))
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 10)
+        self.assertTrue(cookie['httponly'])
+
+    def test_get_does_not_pin(self):
+        response = self.middleware()(self.factory.get('/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_pin_without_replicas(self):
+        response = self.middleware()(self.factory.post('/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
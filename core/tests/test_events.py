@@ -0,0 +1,55 @@
+import asyncio
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+
+from core.events import broker, event_stream_response, long_poll
+
+
+@override_settings(SERVER_MODE='asgi')
+class ConnectionReleaseTests(SimpleTestCase):
+    """Open streams and long polls must not keep the request's DB connection"""
+
+    def test_long_poll_releases_before_waiting(self):
+        async def pending():
+            return []
+
+        async def poll():
+            waiting = asyncio.ensure_future(long_poll(['tests'], pending, timeout=5))
+            await asyncio.sleep(0.05)
+            released = close_all.called
+            broker.dispatch('tests', {'type': 'ping'})
+            return released, await waiting
+
+        with mock.patch('core.events.connections.close_all') as close_all:
+            released, events = async_to_sync(poll)()
+        self.assertTrue(released)
+        self.assertEqual(events, [{'type': 'ping'}])
+
+    def test_long_poll_with_pending_events_returns_them(self):
+        async def pending():
+            return [{'type': 'status'}]
+
+        self.assertEqual(async_to_sync(long_poll)(['tests'], pending), [{'type': 'status'}])
+
+    def test_stream_releases_after_initial_events(self):
+        async def initial():
+            return [{'type': 'status'}]
+
+        async def first_chunks():
+            chunks = aiter(event_stream_response(['tests'], initial).streaming_content)
+            retry = await anext(chunks)
+            await anext(chunks)     # the initial status
+            waiting = asyncio.ensure_future(anext(chunks))
+            await asyncio.sleep(0.05)
+            released = close_all.called
+            broker.dispatch('tests', {'type': 'ping'})
+            await waiting
+            await chunks.aclose()
+            return retry, released
+
+        with mock.patch('core.events.connections.close_all') as close_all:
+            retry, released = async_to_sync(first_chunks)()
+        self.assertEqual(retry, b'retry: 3000\n\n')
+        self.assertTrue(released)
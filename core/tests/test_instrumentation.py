@@ -0,0 +1,68 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from core.instrumentation import RequestTimingMiddleware, install, server_timing, timed
+from core.models import Category, Product
+
+
+class ServerTimingTests(SimpleTestCase):
+    def test_repeated_queries_are_counted_without_origins(self):
+        header = server_timing({
+            'db_ms': 12.1, 'queries': 9, 'template_ms': 4.0, 'view_ms': 25.3, 'total_ms': 27.9,
+            'repeated': [{
+                'count': 7,
+                'sql': 'SELECT COUNT(*) FROM "core_orderitem" WHERE "order_id" = %s',
+                'origin': '/srv/app/dashboard/views.py:42 in orders (dashboard/orders.html)',
+            }],
+        })
+        self.assertEqual(
+            header,
+            'db;dur=12.1;desc="9 queries", tpl;dur=4.0, view;dur=25.3, total;dur=27.9, repeated;desc="7x"',
+        )
+
+
+def _count_products():
+    return Product.objects.count()
+
+
+class RepeatDetectionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        install()
+
+    @override_settings(REQUEST_TIMING_REPEAT_THRESHOLD=3)
+    def test_repeated_shape_is_reported_with_its_origin(self):
+        with timed(detect_repeats=True) as timings:
+            for _ in range(4):
+                _count_products()
+            Category.objects.count()
+        summary = timings.summary(RequestFactory().get('/'), HttpResponse())
+
+        self.assertEqual(summary['queries'], 5)
+        [repeated] = summary['repeated']
+        self.assertEqual(repeated['count'], 4)
+        self.assertIn('core_product', repeated['sql'])
+        self.assertRegex(repeated['origin'], r'^core/tests/test_instrumentation\.py:\d+ in _count_products$')
+
+    @override_settings(REQUEST_TIMING_REPEAT_THRESHOLD=3)
+    def test_repeats_are_logged_not_sent(self):
+        def view(request):
+            for _ in range(3):
+                _count_products()
+            return HttpResponse()
+
+        with self.settings(REQUEST_TIMING_SAMPLE_RATE=1):
+            middleware = RequestTimingMiddleware(view)
+            with self.assertLogs('core.instrumentation', 'WARNING') as logs:
+                response = middleware(RequestFactory().get('/'))
+        self.assertIn('in _count_products', logs.output[0])
+        self.assertIn('repeated;desc="3x"', response['Server-Timing'])
+        self.assertNotIn('_count_products', response['Server-Timing'])
+
+    def test_without_detection_nothing_is_repeated(self):
+        with timed() as timings:
+            for _ in range(10):
+                _count_products()
+        self.assertEqual(timings.queries, 10)
+        self.assertEqual(timings.summary(RequestFactory().get('/'), HttpResponse())['repeated'], [])
@@ -0,0 +1,168 @@
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.jobs import Worker, claim, job, requeue, requeue_stale
+from core.models import Job, Order
+from core.notifications import send_order_confirmation
+
+calls = []
+
+
+@job(queue='tests', max_attempts=2)
+def always_fails():
+    raise ValueError('boom')
+
+
+@contextmanager
+def broken_resource():
+    raise ConnectionError('no mail server')
+    yield
+
+
+@job(queue='tests', around=broken_resource)
+def needs_resource():
+    calls.append('needs_resource')
+
+
+def run_due_jobs(queues=('tests',)):
+    """Claim and run everything due, as one worker pass does; returns the claimed jobs"""
+    claimed = claim('tests:1', list(queues))
+    if claimed:
+        Worker('tests:1').run_batch(claimed)
+    return claimed
+
+
+class OrderEmailTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            username='ann', email='ann@example.com', password='secret',
+        )
+        self.order = Order.objects.create(
+            user=user, order_number='ORD-1', total=Decimal('12.50'), address='1 Baker St', phone='555',
+        )
+
+    def test_confirmation_is_sent_by_a_worker(self):
+        send_order_confirmation.delay(order_id=self.order.pk)
+        self.assertEqual(mail.outbox, [])
+        with self.assertLogs('core.jobs', 'INFO'):
+            run_due_jobs(['email'])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Order ORD-1 received')
+        self.assertEqual(mail.outbox[0].to, ['ann@example.com'])
+        self.assertEqual(Job.objects.get().status, 'done')
+
+    def test_status_change_queues_status_email(self):
+        self.order.status = 'ready'
+        self.order.save()
+        with self.assertLogs('core.jobs', 'INFO'):
+            run_due_jobs(['email'])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Order ORD-1: Ready for Pickup')
+
+    def test_superseded_status_email_is_skipped(self):
+        self.order.status = 'preparing'
+        self.order.save()
+        self.order.status = 'ready'
+        self.order.save()
+        with self.assertLogs('core.jobs', 'INFO'):
+            run_due_jobs(['email'])
+        self.assertEqual([message.subject for message in mail.outbox], ['Order ORD-1: Ready for Pickup'])
+
+
+@override_settings(JOB_RETRY_DELAY=60)
+class RetryTests(TestCase):
+    def test_failing_job_retries_then_dies(self):
+        always_fails.delay()
+        with self.assertLogs('core.jobs', 'WARNING'):
+            run_due_jobs()
+        queued = Job.objects.get()
+        self.assertEqual((queued.status, queued.attempts), ('queued', 1))
+        self.assertIn('ValueError: boom', queued.last_error)
+        self.assertGreater(queued.run_at, timezone.now() + timedelta(seconds=59))
+        # Not due yet
+        self.assertEqual(run_due_jobs(), [])
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.jobs', 'WARNING'):
+            run_due_jobs()
+        dead = Job.objects.get()
+        self.assertEqual((dead.status, dead.attempts), ('dead', 2))
+        self.assertIsNotNone(dead.finished_at)
+
+        self.assertEqual(requeue(), 1)
+        self.assertEqual(Job.objects.get().attempts, 0)
+
+    def test_around_failure_retries_its_jobs(self):
+        needs_resource.delay()
+        needs_resource.delay()
+        with self.assertLogs('core.jobs', 'WARNING'):
+            run_due_jobs()
+        self.assertEqual(calls, [])
+        for retried in Job.objects.all():
+            self.assertEqual((retried.status, retried.attempts), ('queued', 1))
+            self.assertIn('ConnectionError: no mail server', retried.last_error)
+
+    def test_unknown_task_is_retried(self):
+        Job.objects.create(task='core.tests.test_jobs.missing', queue='tests')
+        with self.assertLogs('core.jobs', 'WARNING'):
+            run_due_jobs()
+        self.assertIn('Unknown task', Job.objects.get().last_error)
+
+
+class ClaimTests(TestCase):
+    def test_claim_marks_jobs_running(self):
+        first, second = always_fails.delay(), always_fails.delay()
+        claimed = claim('tests:1', ['tests'], limit=1)
+        self.assertEqual([found.pk for found in claimed], [first.pk])
+        self.assertEqual((claimed[0].status, claimed[0].locked_by, claimed[0].attempts), ('running', 'tests:1', 1))
+        # Another worker only gets what is left
+        self.assertEqual([found.pk for found in claim('tests:2', ['tests'])], [second.pk])
+        self.assertEqual(claim('tests:3', ['tests']), [])
+
+    def test_claim_uses_conditional_update_on_sqlite(self):
+        always_fails.delay()
+        with self.assertNumQueries(3):   # due ids, one UPDATE per id, the claimed rows
+            self.assertEqual(len(claim('tests:1', ['tests'])), 1)
+
+    def test_claim_skips_jobs_taken_meanwhile(self):
+        taken = always_fails.delay()
+        real_filter = Job.objects.filter
+
+        def claim_race(*args, **kwargs):
+            # Another worker claims the job between the SELECT and the UPDATE
+            if kwargs.get('status') == 'queued' and 'pk' in kwargs:
+                real_filter(pk=taken.pk).update(status='running', locked_by='tests:2')
+            return real_filter(*args, **kwargs)
+
+        with mock.patch.object(Job.objects, 'filter', claim_race):
+            self.assertEqual(claim('tests:1', ['tests']), [])
+        self.assertEqual(Job.objects.get().locked_by, 'tests:2')
+
+    def test_other_queues_are_left_alone(self):
+        always_fails.delay()
+        self.assertEqual(claim('tests:1', ['email']), [])
+
+
+@override_settings(JOB_LOCK_TIMEOUT=60)
+class RequeueStaleTests(TestCase):
+    def test_stale_jobs_are_requeued_or_buried(self):
+        long_ago = timezone.now() - timedelta(seconds=120)
+        retry = Job.objects.create(task='x', status='running', attempts=1, max_attempts=3, locked_at=long_ago)
+        last = Job.objects.create(task='x', status='running', attempts=3, max_attempts=3, locked_at=long_ago)
+        busy = Job.objects.create(task='x', status='running', attempts=1, locked_at=timezone.now())
+
+        with self.assertLogs('core.jobs', 'WARNING'):
+            self.assertEqual(requeue_stale(), 2)
+        retry.refresh_from_db()
+        last.refresh_from_db()
+        busy.refresh_from_db()
+        self.assertEqual((retry.status, retry.locked_by, retry.locked_at), ('queued', '', None))
+        self.assertEqual(last.status, 'dead')
+        self.assertEqual(busy.status, 'running')
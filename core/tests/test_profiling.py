@@ -0,0 +1,67 @@
+import tempfile
+import time
+
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import path
+
+from core.profiling import list_profiles, profile_dir
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def sync_view(request):
+    busy(0.1)
+    return HttpResponse()
+
+
+async def async_view(request):
+    busy(0.1)
+    return HttpResponse()
+
+
+urlpatterns = [
+    path('sync/', sync_view),
+    path('async/', async_view),
+]
+
+
+@override_settings(
+    ROOT_URLCONF='core.tests.test_profiling',
+    PROFILE_SAMPLE_RATE=1,
+    PROFILE_SAMPLE_INTERVAL=0.002,
+    SLOW_QUERY_MS=0,
+)
+class SampledProfileTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(PROFILE_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def stacks(self):
+        [profile] = list_profiles()
+        return (profile_dir() / f"{profile['id']}.folded").read_text()
+
+    def assert_view_sampled(self, view_name):
+        stacks = self.stacks()
+        self.assertIn(f'{view_name} (core/tests/test_profiling.py', stacks)
+        self.assertIn('busy (core/tests/test_profiling.py', stacks)
+
+    def test_sync_view_under_wsgi(self):
+        self.client.get('/sync/')
+        self.assert_view_sampled('sync_view')
+
+    async def test_sync_view_under_asgi(self):
+        # Runs in the request's executor thread, not on the event loop
+        await self.async_client.get('/sync/')
+        self.assert_view_sampled('sync_view')
+
+    async def test_async_view_under_asgi(self):
+        await self.async_client.get('/async/')
+        self.assert_view_sampled('async_view')
@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.models import Category, Order, OrderItem, Product, ProductDailySales
+from core.reports import rebuild_daily_sales, record_order_sales
+
+
+class DailySalesTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='ann@example.com', username='ann', password='x')
+        cakes = Category.objects.create(name='Cakes', slug='cakes')
+        self.sponge = Product.objects.create(name='Sponge', slug='sponge', category=cakes, price=10, description='')
+        self.torte = Product.objects.create(name='Torte', slug='torte', category=cakes, price=25, description='')
+
+    def place(self, number, *lines):
+        order = Order.objects.create(user=self.user, order_number=number, total=0, address='x', phone='1')
+        for product, quantity in lines:
+            OrderItem.objects.create(
+                order=order, product=product, product_name=product.name, price=product.price, quantity=quantity,
+            )
+        record_order_sales(order)
+        return order
+
+    def cancel(self, order):
+        order.status = 'cancelled'
+        order.save()
+        record_order_sales(order, sign=-1)
+
+    def totals(self):
+        return sorted(
+            ProductDailySales.objects.exclude(units_sold=0, order_count=0).values_list(
+                'product_id', 'product_name', 'date', 'units_sold', 'revenue', 'order_count',
+            ),
+            key=str,
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.totals()
+        rebuild_daily_sales()
+        self.assertEqual(incremental, self.totals())
+
+    def test_orders_accumulate(self):
+        self.place('A1', (self.sponge, 2), (self.torte, 1))
+        self.place('A2', (self.sponge, 1))
+        sponge = ProductDailySales.objects.get(product=self.sponge)
+        self.assertEqual((sponge.units_sold, sponge.revenue, sponge.order_count), (3, Decimal('30'), 2))
+        self.assertMatchesRebuild()
+
+    def test_cancel_removes_order(self):
+        self.place('A1', (self.sponge, 2))
+        self.cancel(self.place('A2', (self.sponge, 1), (self.torte, 1)))
+        self.assertMatchesRebuild()
+
+    def test_cancel_after_product_deleted(self):
+        self.place('A1', (self.torte, 1))
+        order = self.place('A2', (self.torte, 2), (self.sponge, 1))
+        self.torte.delete()
+        self.cancel(order)
+        row = ProductDailySales.objects.get(product__isnull=True)
+        self.assertEqual((row.product_name, row.units_sold, row.order_count), ('Torte', 1, 1))
+        self.assertMatchesRebuild()
+
+    def test_reinstate_after_product_deleted(self):
+        order = self.place('A1', (self.torte, 2))
+        self.cancel(order)
+        self.torte.delete()
+        order.status = 'pending'
+        order.save()
+        record_order_sales(order)
+        self.assertMatchesRebuild()
@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core import slow_queries
+from core.models import SlowQuery
+from core.slow_queries import slow_query_report
+
+
+class SlowQueryReportTests(TestCase):
+    def add(self, fingerprint, duration_ms, origin='core/views.py:10 in products', view='core:products',
+            minutes_ago=1):
+        SlowQuery.objects.create(
+            fingerprint=fingerprint, sql=f'SELECT {fingerprint}', view=view, origin=origin,
+            database='default', duration_ms=duration_ms,
+            captured_at=timezone.now() - timedelta(minutes=minutes_ago),
+        )
+
+    def test_grouped_by_fingerprint_most_total_time_first(self):
+        for duration in range(1, 21):
+            self.add('a', duration * 10)
+        self.add('a', 5000, origin='unknown', view='')
+        self.add('b', 9000)
+        self.add('b', 9000, minutes_ago=3 * 24 * 60)   # outside the window
+
+        report = slow_query_report(timezone.now() - timedelta(days=1))
+
+        self.assertEqual([row['fingerprint'] for row in report], ['b', 'a'])
+        a = report[1]
+        self.assertEqual(a['count'], 21)
+        self.assertEqual((a['p50_ms'], a['p95_ms'], a['max_ms']), (110, 200, 5000))
+        self.assertEqual(a['total_ms'], 7100)
+        self.assertEqual(a['origins'], [('core:products: core/views.py:10 in products', 20), ('unknown', 1)])
+        self.assertEqual(a['sql'], 'SELECT a')
+
+    def test_limit(self):
+        for fingerprint in 'abc':
+            self.add(fingerprint, 100)
+        self.assertEqual(len(slow_query_report(timezone.now() - timedelta(days=1), limit=2)), 2)
+
+
+class ExplainedFingerprintTests(TestCase):
+    def test_bounded(self):
+        self.addCleanup(slow_queries._explained.clear)
+        for number in range(slow_queries.EXPLAINED_FINGERPRINTS + 10):
+            slow_queries._remember_explained(f'fp{number}', number)
+        self.assertEqual(len(slow_queries._explained), slow_queries.EXPLAINED_FINGERPRINTS)
+        self.assertNotIn('fp0', slow_queries._explained)
+        self.assertIn(f'fp{slow_queries.EXPLAINED_FINGERPRINTS + 9}', slow_queries._explained)
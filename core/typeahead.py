@@ -0,0 +1,143 @@
+"""
+Search Typeahead
+
+Suggestions for the search box come from an in-process prefix index rather
+than the database:
+
+- product and category names are normalized (lowercase, accents and extra
+  whitespace folded) and every word start becomes a key, so "cake" finds
+  "Chocolate Cake" as well as "Cake Rusk"
+- keys live in one sorted list; a prefix lookup is a bisect plus a short
+  forward scan, and one- and two-letter prefixes are answered from a
+  precomputed table so a single keystroke never scans the whole catalog
+- matches are ranked by recent units sold (categories by their products')
+
+Each worker process keeps its own index and rebuilds it when the catalog
+version changes, or after TYPEAHEAD_MAX_AGE so rankings follow sales.
+"""
+
+import time
+import unicodedata
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from .catalog import get_catalog_version
+from .db_routing import primary
+from .models import Category, Product, ProductDailySales
+
+
+SUGGESTION_LIMIT = 8
+PRECOMPUTED_PREFIX_LENGTH = 2
+POPULARITY_DAYS = 90
+TYPEAHEAD_MAX_AGE = 15 * 60
+
+
+def fold_text(text):
+    """Lowercase, strip accents and collapse whitespace"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())
+
+
+class PrefixIndex:
+    """Sorted (key, entry) pairs over normalized names"""
+
+    def __init__(self, entries):
+        # entries: [{'type', 'label', 'url', 'score'}], best first
+        self.entries = sorted(entries, key=lambda entry: (-entry['score'], entry['label']))
+        pairs = []
+        for position, entry in enumerate(self.entries):
+            words = fold_text(entry['label']).split(' ')
+            for start in range(len(words)):
+                pairs.append((' '.join(words[start:]), position))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.positions = [position for _, position in pairs]
+
+        self.short = {}
+        for key, position in pairs:
+            for length in range(1, PRECOMPUTED_PREFIX_LENGTH + 1):
+                if len(key) >= length:
+                    self.short.setdefault(key[:length], set()).add(position)
+        self.short = {
+            prefix: sorted(positions)[:SUGGESTION_LIMIT]
+            for prefix, positions in self.short.items()
+        }
+
+    def search(self, query, limit=SUGGESTION_LIMIT):
+        prefix = fold_text(query)
+        if not prefix:
+            return []
+        if len(prefix) <= PRECOMPUTED_PREFIX_LENGTH:
+            positions = self.short.get(prefix, [])
+        else:
+            matched = set()
+            start = bisect_left(self.keys, prefix)
+            for i in range(start, len(self.keys)):
+                if not self.keys[i].startswith(prefix):
+                    break
+                matched.add(self.positions[i])
+            # Entries are stored best first, so position order is rank order
+            positions = sorted(matched)
+        return [self.entries[position] for position in positions[:limit]]
+
+
+def build_index():
+    since = timezone.localdate() - timedelta(days=POPULARITY_DAYS - 1)
+    sales = dict(
+        ProductDailySales.objects.filter(date__gte=since)
+        .values_list('product_id')
+        .annotate(units=Sum('units_sold'))
+        .order_by()
+    )
+    entries = []
+    category_scores = {}
+    for product_id, name, slug, category_id in Product.objects.filter(
+        is_available=True, category__is_active=True,
+    ).values_list('id', 'name', 'slug', 'category_id'):
+        score = max(sales.get(product_id, 0), 0)
+        category_scores[category_id] = category_scores.get(category_id, 0) + score
+        entries.append({
+            'type': 'product',
+            'label': name,
+            'url': Product(slug=slug).get_absolute_url(),
+            'score': score,
+        })
+    for category_id, name, slug in Category.objects.filter(is_active=True).values_list('id', 'name', 'slug'):
+        entries.append({
+            'type': 'category',
+            'label': name,
+            'url': Category(slug=slug).get_absolute_url(),
+            # Categories sort ahead of their equally popular products
+            'score': category_scores.get(category_id, 0) + 1,
+        })
+    return PrefixIndex(entries)
+
+
+_index = None
+_index_version = None
+_index_built_at = 0.0
+
+
+def get_index():
+    """This process's index, rebuilt when the catalog changes or it gets old"""
+    global _index, _index_version, _index_built_at
+    version = get_catalog_version()
+    if _index is None or version != _index_version or time.monotonic() - _index_built_at > TYPEAHEAD_MAX_AGE:
+        with primary():
+            # Built under the new version, so it must not come from a lagging replica
+            _index = build_index()
+        _index_version = version
+        _index_built_at = time.monotonic()
+    return _index
+
+
+def suggest(query, limit=SUGGESTION_LIMIT):
+    """Top suggestions for a partial query: [{'type', 'label', 'url'}]"""
+    return [
+        {'type': entry['type'], 'label': entry['label'], 'url': entry['url']}
+        for entry in get_index().search(query, limit)
+    ]
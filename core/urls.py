@@ -6,6 +6,8 @@ app_name = 'core'
 urlpatterns = [
     path('', views.home, name='home'),
     path('products/', views.products, name='products'),
+    path('search/suggest/', views.search_suggest, name='search_suggest'),
+    path('session/state/', views.session_state, name='session_state'),
     path('product/<slug:slug>/', views.product_detail, name='product_detail'),
     path('category/<slug:slug>/', views.category_detail, name='category_detail'),
     path('about/', views.about, name='about'),
@@ -1,11 +1,18 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.views.decorators.http import require_POST
-from django.db.models import Q
+from django.utils.cache import add_never_cache_headers, patch_cache_control
+from django.middleware.csrf import get_token
 import uuid
 
+from asgiref.sync import sync_to_async
+
+from .conditional import catalog_page, product_page
+from .db_routing import read_from_replica
+from .metrics import record_cart, record_checkout
+from .page_cache import tag_page
 from .models import Category, Product, Cart, CartItem, Order, OrderItem, ContactMessage
 
 
@@ -22,74 +29,157 @@ def get_or_create_cart(request):
     return cart
 
 
-def home(request):
+async def render_async(request, template_name, context=None):
+    """render() for async views; templates read the session, user and cart badge"""
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def get_object_or_404_async(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
+
+@read_from_replica
+@catalog_page
+async def home(request):
     """Homepage view"""
-    categories = Category.objects.filter(is_active=True)[:6]
-    featured_products = Product.objects.filter(is_featured=True, is_available=True)[:6]
-    special_products = Product.objects.filter(is_special=True, is_available=True)[:6]
+    categories = [category async for category in Category.objects.filter(is_active=True)[:6]]
+    featured_products = [
+        product async for product in Product.objects.filter(is_featured=True, is_available=True)[:6]
+    ]
+    special_products = [
+        product async for product in Product.objects.filter(is_special=True, is_available=True)[:6]
+    ]
+    tag_page(request, 'listing')
     
     context = {
         'categories': categories,
         'featured_products': featured_products,
         'special_products': special_products,
     }
-    return render(request, 'home.html', context)
+    return await render_async(request, 'home.html', context)
+
+
+def faceted_products(request, current_category):
+    """
+    Facet and search filtering for the product listing, from the cached
+    bitmap index and search cache. Returns (products, facets, selected);
+    products is None when neither narrows the listing.
+    """
+    from .facets import get_facet_index, selected_facets
+    from .search import hydrate, search_product_ids
+    index = get_facet_index()
+    base = index.categories.get(current_category.pk, 0) if current_category else index.all
 
+    # Search results are cached id lists (see core.search)
+    search_query = request.GET.get('q')
+    if search_query:
+        base &= index.bitmap_for_ids(search_product_ids(search_query, current_category))
+    selected = selected_facets(request.GET)
+    product_ids, facets = index.apply(selected, base)
+    products = hydrate(product_ids) if search_query or selected else None
+    return products, facets, selected
 
-def products(request):
+
+@read_from_replica
+@catalog_page
+async def products(request):
     """Product listing view"""
-    products = Product.objects.filter(is_available=True)
-    categories = Category.objects.filter(is_active=True)
+    categories = [category async for category in Category.objects.filter(is_active=True)]
 
     # Filter by category
     category_slug = request.GET.get('category')
     current_category = None
     if category_slug:
-        current_category = get_object_or_404(Category, slug=category_slug, is_active=True)
-        products = products.filter(category=current_category)
-
-    # Search
-    search_query = request.GET.get('q')
-    if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) | Q(description__icontains=search_query)
+        current_category = await get_object_or_404_async(
+            Category.objects.all(), slug=category_slug, is_active=True,
         )
 
+    tag_page(request, 'listing')
+
+    # Facets: counts and filtering come from the cached bitmap index
+    products, facets, selected = await sync_to_async(faceted_products)(request, current_category)
+    if products is None:
+        listing = Product.objects.filter(is_available=True).select_related('category')
+        if current_category:
+            listing = listing.filter(category=current_category)
+        products = [product async for product in listing]
+
     context = {
         'products': products,
         'categories': categories,
         'current_category': current_category,  # pass the object, not just the slug
-        'search_query': search_query,
+        'search_query': request.GET.get('q'),
+        'facets': facets,
+        'facets_selected': bool(selected),
     }
-    return render(request, 'core/products.html', context)
+    return await render_async(request, 'core/products.html', context)
+
+
+async def session_state(request):
+    """Per-visitor bits of pages served from the page cache (JSON)"""
+    from .context_processors import get_cart_count
+    response = JsonResponse({
+        'cart_count': await sync_to_async(get_cart_count)(request),
+        'csrf_token': get_token(request),
+    })
+    add_never_cache_headers(response)
+    return response
+
 
+@read_from_replica
+def search_suggest(request):
+    """Typeahead suggestions for the search box (JSON)"""
+    from .typeahead import suggest
 
-def product_detail(request, slug):
+    query = request.GET.get('q', '')[:100]
+    response = JsonResponse({'query': query, 'suggestions': suggest(query)})
+    # Short shared caching: repeated keystrokes and back-button edits are free
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
+@read_from_replica
+@product_page
+async def product_detail(request, slug):
     """Product detail view"""
-    product = get_object_or_404(Product, slug=slug, is_available=True)
-    related_products = Product.objects.filter(
-        category=product.category, is_available=True
-    ).exclude(id=product.id)[:4]
+    product = await get_object_or_404_async(
+        Product.objects.select_related('category'), slug=slug, is_available=True,
+    )
+    from .recommendations import recommended_products
+    related_products = await sync_to_async(recommended_products)(product)
+    tag_page(
+        request,
+        f'product:{product.pk}',
+        f'category:{product.category_id}',
+        *(f'product:{related.pk}' for related in related_products),
+    )
     
     context = {
         'product': product,
         'related_products': related_products,
     }
-    return render(request, 'core/product_detail.html', context)
+    return await render_async(request, 'core/product_detail.html', context)
 
 
-def category_detail(request, slug):
+@read_from_replica
+@catalog_page
+async def category_detail(request, slug):
     """Category detail view"""
-    category = get_object_or_404(Category, slug=slug, is_active=True)
-    products = category.products.filter(is_available=True)
+    category = await get_object_or_404_async(Category.objects.all(), slug=slug, is_active=True)
+    products = [product async for product in category.products.filter(is_available=True)]
+    tag_page(request, f'category:{category.pk}')
     
     context = {
         'category': category,
         'products': products,
     }
-    return render(request, 'core/category_detail.html', context)
+    return await render_async(request, 'core/category_detail.html', context)
 
 
+@read_from_replica
 def about(request):
     """About page"""
     return render(request, 'core/about.html')
@@ -97,18 +187,21 @@ def about(request):
 
 def contact(request):
     """Contact page"""
+    from .contact_ingest import RATE_LIMITED, submit_contact_message
+    from .forms import ContactForm
+
     if request.method == 'POST':
-        name = request.POST.get('name')
-        email = request.POST.get('email')
-        subject = request.POST.get('subject')
-        message = request.POST.get('message')
+        form = ContactForm(request.POST)
+        if not form.is_valid():
+            messages.error(request, 'Please fill in all fields with a valid email address.')
+            return render(request, 'core/contact.html', {'form': form}, status=400)
         
-        ContactMessage.objects.create(
-            name=name,
-            email=email,
-            subject=subject,
-            message=message
-        )
+        result = submit_contact_message(request.client_ip, **form.cleaned_data)
+        if result == RATE_LIMITED:
+            messages.error(request, 'You have sent too many messages. Please try again later.')
+            return render(request, 'core/contact.html', {'form': form}, status=429)
+        
+        # Duplicates get the same response so resubmitting bots learn nothing
         messages.success(request, 'Thank you for your message! We will get back to you soon.')
         return redirect('core:contact')
     
@@ -137,6 +230,7 @@ def add_to_cart(request, product_id):
     if not created:
         cart_item.quantity += 1
         cart_item.save()
+    record_cart('add')
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
@@ -158,8 +252,10 @@ def update_cart(request, item_id):
     if quantity > 0:
         cart_item.quantity = quantity
         cart_item.save()
+        record_cart('update')
     else:
         cart_item.delete()
+        record_cart('remove')
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
@@ -178,6 +274,7 @@ def remove_from_cart(request, item_id):
     cart_item = get_object_or_404(CartItem, id=item_id)
     cart = cart_item.cart
     cart_item.delete()
+    record_cart('remove')
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
@@ -233,6 +330,17 @@ def checkout(request):
                 quantity=item.quantity
             )
         
+        # Update the sales aggregate used by product reports
+        from .reports import record_order_sales
+        from .recommendations import record_order_copurchases
+        record_order_sales(order)
+        record_order_copurchases.delay(order_id=order.pk)
+        
+        # Confirmation email, sent by a background worker
+        from .notifications import send_order_confirmation
+        send_order_confirmation.delay(order_id=order.pk)
+        record_checkout('placed')
+        
         # Record order for rate limiting
         ip_address = get_client_ip(request)
         record_order(phone, ip_address)
@@ -7,4 +7,5 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('orders/', views.orders, name='orders'),
     path('orders/<int:order_id>/', views.order_detail, name='order_detail'),
+    path('orders/<int:order_id>/events/', views.order_events, name='order_events'),
 ]
@@ -1,9 +1,14 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.db.models import Sum
+from django.http import Http404, HttpResponseForbidden
 from core.models import Order
+from core.db_routing import read_from_replica
+from core.events import event_stream_response, long_poll_response, order_event
 
 
+@read_from_replica
 @login_required
 def index(request):
     """User dashboard home"""
@@ -28,6 +33,7 @@ def index(request):
     return render(request, 'dashboard/index.html', context)
 
 
+@read_from_replica
 @login_required
 def orders(request):
     """User orders list"""
@@ -48,3 +54,27 @@ def order_detail(request, order_id):
     order = get_object_or_404(Order, id=order_id, user=request.user)
     context = {'order': order}
     return render(request, 'dashboard/order_detail.html', context)
+
+
+async def order_events(request, order_id):
+    """
+    Live status of one of the customer's orders: a Server-Sent Events
+    stream, or with ?poll=1&status=<shown status> a long poll
+    """
+    if not await sync_to_async(lambda: request.user.is_authenticated)():
+        return HttpResponseForbidden()
+    orders = Order.objects.filter(pk=order_id, user_id=request.user.pk)
+    if not await orders.aexists():
+        raise Http404('No order matches the given query.')
+
+    async def current():
+        return [order_event(order, 'status') async for order in orders]
+
+    channels = [f'order:{order_id}']
+    if request.GET.get('poll'):
+        shown = request.GET.get('status')
+
+        async def changed():
+            return [event for event in await current() if event['status'] != shown]
+        return await long_poll_response(channels, changed)
+    return event_stream_response(channels, current)
@@ -0,0 +1,39 @@
+"""
+Gunicorn settings: gunicorn --config gunicorn.conf.py
+
+SERVER_MODE=wsgi (default) runs sync workers, one request at a time each.
+SERVER_MODE=asgi runs uvicorn workers on bakery_project.asgi: async
+catalog views wait on the database and slow clients without blocking the
+worker, so each worker serves many requests at once. Live order updates
+(core/events.py) need it: under wsgi, every open order page and admin order
+list reconnects every 15 seconds instead of holding a stream open.
+
+Workers share Prometheus metrics through PROMETHEUS_MULTIPROC_DIR (see
+core/metrics.py), emptied when gunicorn starts.
+"""
+
+import os
+import shutil
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', '3'))
+
+if os.environ.get('SERVER_MODE', 'wsgi') == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'bakery_project.asgi:application'
+else:
+    wsgi_app = 'bakery_project.wsgi:application'
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/bakery-metrics')
+
+
+def on_starting(server):
+    # Samples left by a previous run would be added to this one's
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -104,4 +104,55 @@ document.addEventListener('DOMContentLoaded', function () {
             }, 800);
         });
     }
+
+    // Live Order List: status changes and a banner for new orders
+    const orderList = document.querySelector('[data-order-events]');
+    if (orderList) {
+        const banner = document.getElementById('newOrdersBanner');
+        const newOrders = new Set();
+        let since = orderList.dataset.since;
+
+        followOrderEvents(orderList.dataset.orderEvents, function () {
+            return 'since=' + encodeURIComponent(since);
+        }, function (event) {
+            const row = orderList.querySelector('tr[data-order-id="' + event.id + '"]');
+            const badge = row && row.querySelector('.status-badge');
+            if (badge) {
+                badge.textContent = event.status_display;
+                badge.className = 'status-badge status-' + event.status;
+            }
+            if (event.type === 'created' && !row && !newOrders.has(event.id)) {
+                newOrders.add(event.id);
+                since = Math.max(since, event.id);
+                document.getElementById('newOrdersText').textContent =
+                    newOrders.size + (newOrders.size === 1 ? ' new order' : ' new orders');
+                banner.hidden = false;
+            }
+        });
+    }
 });
+
+// Order Events: Server-Sent Events, or long polling without EventSource
+function followOrderEvents(url, query, onEvent) {
+    if (window.EventSource) {
+        const source = new EventSource(url + '?' + query());
+        source.addEventListener('order', function (e) {
+            onEvent(JSON.parse(e.data));
+        });
+        return;
+    }
+    (function poll() {
+        fetch(url + '?poll=1&' + query(), { credentials: 'same-origin' })
+            .then(function (response) {
+                if (!response.ok) throw new Error(response.status);
+                return response.json();
+            })
+            .then(function (data) {
+                data.events.forEach(onEvent);
+                setTimeout(poll, data.retry);
+            })
+            .catch(function () {
+                setTimeout(poll, 15000);
+            });
+    })();
+}
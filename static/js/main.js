@@ -42,6 +42,72 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Cached pages: fill in the cart badge and CSRF token for this visitor
+    const sessionStateUrl = document.body.dataset.sessionState;
+    if (sessionStateUrl) {
+        fetch(sessionStateUrl, { credentials: 'same-origin' })
+            .then(function(response) { return response.json(); })
+            .then(function(state) {
+                document.querySelectorAll('input[name="csrfmiddlewaretoken"]').forEach(function(input) {
+                    input.value = state.csrf_token;
+                });
+                const cartBtn = document.querySelector('.cart-btn');
+                if (cartBtn && state.cart_count > 0) {
+                    let badge = cartBtn.querySelector('.cart-badge');
+                    if (!badge) {
+                        badge = document.createElement('span');
+                        badge.className = 'cart-badge';
+                        cartBtn.appendChild(badge);
+                    }
+                    badge.textContent = state.cart_count;
+                }
+            })
+            .catch(function() {});
+    }
+
+    // Search Suggestions
+    const suggestInput = document.querySelector('.search-input[data-suggest-url]');
+    const suggestList = document.getElementById('searchSuggestions');
+
+    if (suggestInput && suggestList) {
+        let suggestTimeout;
+        let suggestController;
+
+        suggestInput.addEventListener('input', function() {
+            clearTimeout(suggestTimeout);
+            const query = suggestInput.value.trim();
+            if (!query) {
+                suggestList.hidden = true;
+                return;
+            }
+            suggestTimeout = setTimeout(function() {
+                if (suggestController) suggestController.abort();
+                suggestController = new AbortController();
+                fetch(suggestInput.dataset.suggestUrl + '?q=' + encodeURIComponent(query), {
+                    signal: suggestController.signal
+                })
+                    .then(function(response) { return response.json(); })
+                    .then(function(data) {
+                        suggestList.innerHTML = '';
+                        data.suggestions.forEach(function(suggestion) {
+                            const item = document.createElement('li');
+                            const link = document.createElement('a');
+                            link.href = suggestion.url;
+                            link.textContent = suggestion.label;
+                            const type = document.createElement('span');
+                            type.className = 'suggestion-type';
+                            type.textContent = suggestion.type;
+                            link.appendChild(type);
+                            item.appendChild(link);
+                            suggestList.appendChild(item);
+                        });
+                        suggestList.hidden = data.suggestions.length === 0;
+                    })
+                    .catch(function() {});
+            }, 150);
+        });
+    }
+
     // Message Auto-dismiss
     const messages = document.querySelectorAll('.message');
     messages.forEach(function(message) {
@@ -192,8 +258,60 @@ document.addEventListener('DOMContentLoaded', function() {
             animateObserver.observe(el);
         });
     }
+
+    // Live Order Status
+    const orderStatus = document.querySelector('[data-order-events]');
+    if (orderStatus) {
+        followOrderEvents(orderStatus.dataset.orderEvents, function() {
+            return 'status=' + encodeURIComponent(orderStatus.dataset.status);
+        }, function(event) {
+            if (event.status === orderStatus.dataset.status) return;
+            orderStatus.dataset.status = event.status;
+            orderStatus.textContent = event.status_display;
+            orderStatus.className = 'status-badge-modern status-' + event.status;
+            updateOrderProgress(event.status);
+        });
+    }
 });
 
+// Order Events: Server-Sent Events, or long polling without EventSource
+function followOrderEvents(url, query, onEvent) {
+    if (window.EventSource) {
+        const source = new EventSource(url + '?' + query());
+        source.addEventListener('order', function(e) {
+            onEvent(JSON.parse(e.data));
+        });
+        return;
+    }
+    (function poll() {
+        fetch(url + '?poll=1&' + query(), { credentials: 'same-origin' })
+            .then(function(response) {
+                if (!response.ok) throw new Error(response.status);
+                return response.json();
+            })
+            .then(function(data) {
+                data.events.forEach(onEvent);
+                setTimeout(poll, data.retry);
+            })
+            .catch(function() {
+                setTimeout(poll, 15000);
+            });
+    })();
+}
+
+// Order Progress: steps before the current one are completed
+const ORDER_STEPS = ['pending', 'confirmed', 'preparing', 'delivered'];
+
+function updateOrderProgress(status) {
+    // Ready sits between preparing and delivered
+    const current = status === 'ready' ? 2.5 : ORDER_STEPS.indexOf(status);
+    document.querySelectorAll('.progress-step[data-step]').forEach(function(step) {
+        const index = ORDER_STEPS.indexOf(step.dataset.step);
+        step.classList.toggle('active', index === current);
+        step.classList.toggle('completed', index < current || (status === 'delivered' && index === current));
+    });
+}
+
 // Utility: Format Currency
 function formatCurrency(amount) {
     return new Intl.NumberFormat('en-US', {